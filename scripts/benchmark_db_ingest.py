@@ -0,0 +1,89 @@
+# scripts/benchmark_db_ingest.py
+
+"""
+Compare per-row INSERT + commit against the bulk COPY path on a scratch
+copy of ec2_instances (default: 20k synthetic scan records).
+
+Needs a reachable PostgreSQL (DB_HOST / DB_NAME / DB_USER / DB_PASSWORD).
+
+Usage: python scripts/benchmark_db_ingest.py [rows] [chunk_size]
+"""
+
+import sys
+import time
+import random
+import logging
+from datetime import datetime
+from src.core.serialization import dumps
+from src.core.db_handler import PostgresHandler, EC2_INSTANCE_COLUMNS, COPY_CHUNK_SIZE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BENCH_TABLE = "ec2_instances_bench"
+
+def synthetic_instances(count: int):
+    rng = random.Random(42)
+    timestamp = datetime.utcnow().isoformat()
+    return [{
+        "timestamp": timestamp,
+        "InstanceId": f"i-{i:017x}",
+        "Region": rng.choice(["us-east-1", "eu-west-1", "ap-south-1"]),
+        "InstanceType": rng.choice(["t3.micro", "m5.large", "c5.xlarge"]),
+        "State": "running",
+        "CPUUtilization": round(rng.uniform(0, 100), 2),
+        "NetworkIn": round(rng.uniform(0, 1e6), 2),
+        "NetworkOut": round(rng.uniform(0, 1e6), 2),
+        "HourlyRate": "0.0960",
+        "MonthlyCostEstimate": "70.08",
+        "MonthlyForecast": "28.03",
+        "Underutilized": rng.random() < 0.2,
+        "Tags": {"Name": f"bench-{i}", "Team": "platform\tops"},
+        "AccountId": rng.choice(["111111111111", "222222222222"])
+    } for i in range(count)]
+
+def reset_table(db: PostgresHandler):
+    with db.pool.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        cur.execute(f"CREATE TABLE {BENCH_TABLE} (LIKE ec2_instances INCLUDING DEFAULTS)")
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else COPY_CHUNK_SIZE
+    instances = synthetic_instances(rows)
+    columns = [column for column, _ in EC2_INSTANCE_COLUMNS]
+    tags = columns.index("tags")
+
+    db = PostgresHandler()
+    db.create_tables()
+
+    reset_table(db)
+    insert_sql = f"INSERT INTO {BENCH_TABLE} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    start = time.perf_counter()
+    with db.pool.connection() as conn, conn.cursor() as cur:
+        for inst in instances:
+            values = [inst.get(key) for _, key in EC2_INSTANCE_COLUMNS]
+            values[tags] = dumps(values[tags])
+            cur.execute(insert_sql, values)
+            conn.commit()
+    per_row_seconds = time.perf_counter() - start
+
+    reset_table(db)
+    start = time.perf_counter()
+    copied = db.copy_rows(BENCH_TABLE, columns,
+                          (tuple(inst.get(key) for _, key in EC2_INSTANCE_COLUMNS) for inst in instances), chunk_size)
+    copy_seconds = time.perf_counter() - start
+
+    with db.pool.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+
+    if copied != rows:
+        logger.error(f"[!] COPY wrote {copied} of {rows} row(s)")
+        sys.exit(1)
+
+    logger.info(f"[+] Per-row INSERT: {per_row_seconds:.2f}s ({rows / per_row_seconds:,.0f} rows/s)")
+    logger.info(f"[+] Bulk COPY:      {copy_seconds:.2f}s ({rows / copy_seconds:,.0f} rows/s, "
+                f"{per_row_seconds / copy_seconds:.1f}x faster, chunk size {chunk_size})")
+
+if __name__ == "__main__":
+    main()
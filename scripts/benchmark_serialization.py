@@ -0,0 +1,102 @@
+# scripts/benchmark_serialization.py
+
+"""
+Compare the old save_json encoding (json.dump, indent=4, Decimals stringified
+up front) with src.core.serialization on a synthetic scan (default: 100k
+records with Decimal costs, datetimes and numpy metrics), for both writing
+and reading the file back.
+
+Usage: python scripts/benchmark_serialization.py [records]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+import numpy as np
+from src.core import serialization
+from src.core.serialization import save_records, loads
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def synthetic_scan(count: int):
+    rng = random.Random(42)
+    cpus = np.random.default_rng(42).gamma(2.0, 10.0, size=count)
+    launched = datetime(2025, 1, 1)
+    return [{
+        "InstanceId": f"i-{i:017x}",
+        "Region": rng.choice(["us-east-1", "eu-west-1", "ap-south-1"]),
+        "InstanceType": rng.choice(["t3.micro", "m5.large", "c5.xlarge"]),
+        "State": "running",
+        "LaunchTime": launched + timedelta(minutes=i),
+        "CPUUtilization": cpus[i],
+        "NetworkIn": np.float64(rng.uniform(0, 1e6)),
+        "HourlyRate": Decimal("0.0960"),
+        "MonthlyCostEstimate": Decimal(rng.randint(100, 100000)) / 100,
+        "Underutilized": bool(cpus[i] < 10),
+        "CostImpactRank": np.int64(i % 100),
+        "Tags": {"Name": f"bench-{i}", "Team": "platform"}
+    } for i in range(count)]
+
+def legacy_save(records, path: str):
+    """What save_json did before: callers stringify, then json.dump with indent=4"""
+    prepared = [{k: (str(v) if isinstance(v, Decimal) else v.isoformat() if isinstance(v, datetime) else
+                     v.item() if isinstance(v, np.generic) else v) for k, v in r.items()} for r in records]
+    with open(path, "w") as f:
+        json.dump({"timestamp": datetime.utcnow().isoformat(), "data": prepared}, f, indent=4)
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    return result, seconds
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    records = synthetic_scan(count)
+    timestamp = datetime.utcnow().isoformat()
+    directory = tempfile.mkdtemp(prefix="tephron_bench_")
+    legacy_path = os.path.join(directory, "legacy.json")
+    fast_path = os.path.join(directory, "fast.json")
+    ndjson_path = os.path.join(directory, "fast.ndjson")
+
+    _, legacy_write = timed(lambda: legacy_save(records, legacy_path))
+    _, fast_write = timed(lambda: save_records(records, fast_path, timestamp))
+    _, ndjson_write = timed(lambda: save_records(records, ndjson_path, timestamp))
+
+    def read_legacy():
+        with open(legacy_path, "r") as f:
+            return json.load(f)["data"]
+
+    def read_fast():
+        with open(fast_path, "rb") as f:
+            return loads(f.read())["data"]
+
+    legacy_records, legacy_read = timed(read_legacy)
+    fast_records, fast_read = timed(read_fast)
+    if legacy_records != fast_records:
+        logger.error("[!] Encoded scans differ between the legacy and fast paths")
+        sys.exit(1)
+
+    backend = "orjson" if serialization.orjson is not None else "stdlib json"
+    size = lambda path: os.path.getsize(path) / 1e6
+    logger.info(f"[*] {count} records, encoder backend: {backend}")
+    logger.info(f"[+] Legacy write: {legacy_write:.3f}s ({size(legacy_path):.1f} MB)")
+    logger.info(f"[+] Fast write:   {fast_write:.3f}s ({size(fast_path):.1f} MB, "
+                f"{legacy_write / fast_write:.1f}x faster)")
+    logger.info(f"[+] NDJSON write: {ndjson_write:.3f}s ({size(ndjson_path):.1f} MB)")
+    logger.info(f"[+] Legacy read:  {legacy_read:.3f}s")
+    logger.info(f"[+] Fast read:    {fast_read:.3f}s ({legacy_read / fast_read:.1f}x faster)")
+
+    for path in (legacy_path, fast_path, ndjson_path):
+        os.remove(path)
+    os.rmdir(directory)
+
+if __name__ == "__main__":
+    main()
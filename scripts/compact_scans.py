@@ -0,0 +1,25 @@
+# scripts/compact_scans.py
+
+"""
+Compaction and retention for the scan output directory: merges each finished
+day's scan files into one indexed archive, downsamples archives older than
+SCAN_RAW_RETENTION_DAYS and deletes those older than SCAN_MAX_RETENTION_DAYS.
+
+Usage: python scripts/compact_scans.py [directory]
+"""
+
+import sys
+import logging
+from src.core.scan_archive import ScanCompactor, SCAN_DIR
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else SCAN_DIR
+    stats = ScanCompactor(directory).run()
+    logger.info(f"[+] {stats['compacted_days']} day(s) compacted, {stats['downsampled_days']} downsampled, "
+                f"{stats['expired_days']} expired in {directory}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+# scripts/detach_old_partitions.py
+
+"""
+Retention for ec2_instances: detach monthly partitions older than the
+retention window (default 180 days). Pass --drop to drop them instead.
+
+Usage: python scripts/detach_old_partitions.py [retention_days] [--drop]
+"""
+
+import sys
+import logging
+from datetime import datetime, timedelta
+from src.core.db_handler import PostgresHandler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != "--drop"]
+    retention_days = int(args[0]) if args else 180
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).date()
+
+    db = PostgresHandler()
+    db.create_tables()
+    detached = db.detach_partitions_before(cutoff, drop="--drop" in sys.argv)
+    logger.info(f"[+] {len(detached)} partition(s) older than {cutoff} removed from ec2_instances")
+
+if __name__ == "__main__":
+    main()
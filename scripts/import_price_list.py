@@ -0,0 +1,19 @@
+# scripts/import_price_list.py
+
+import sys
+import logging
+from src.aws.cost.price_index import EC2PriceIndex, OFFER_DIR
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main():
+    offer_dir = sys.argv[1] if len(sys.argv) > 1 else OFFER_DIR
+    logger.info(f"[*] Refreshing EC2 price index from {offer_dir}")
+
+    index = EC2PriceIndex()
+    imported = index.refresh(offer_dir)
+    logger.info(f"[+] Imported {imported} new or changed offer file(s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,54 @@
 # scripts/ingest_json_to_postgres.py
 
+"""
+Incrementally ingest scan JSON files into ec2_instances.
+
+Files already listed in ingest_manifest with the same size and mtime are
+skipped without being opened. Changed files are hashed, and only those with
+new content are parsed. Their rows are upserted on (instance_id, timestamp)
+in the same transaction that records the file in the manifest, so re-runs
+and partial failures never duplicate rows. Schema inference only looks at
+the new files and only adds columns ec2_instances does not have yet.
+
+A compacted archive records the raw files it absorbed. When every one of
+them was ingested already, the archive is recorded without being parsed.
+Manifest entries of files that are gone, e.g. raw files removed by
+compaction, are pruned once an archive covers them.
+"""
+
 import os
-import json
+import re
+import hashlib
 import logging
+from datetime import datetime
 from typing import Dict, Any, List, Optional, Union, Tuple, TypeVar
-from src.core.db_handler import PostgresHandler
-from src.core.utils.file_utils import load_json_files
+from src.core.db_handler import PostgresHandler, EC2_INSTANCE_COLUMNS, EC2_NATURAL_KEY
+from src.core.scan_archive import read_indexes, read_lock, visible_files
+from src.core.scan_loader import SCAN_EXTENSIONS, RecordFilter, load_task
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 INPUT_DIR = "/app/data/output/ec2/"
+TABLE = "ec2_instances"
+
+# Scan record keys whose column name is not simply the snake_case key
+KNOWN_COLUMNS = {key: column for column, key in EC2_INSTANCE_COLUMNS}
+
+def to_column(key: str) -> str:
+    """Map a CamelCase scan key to its ec2_instances column (InstanceId -> instance_id)"""
+    if key in KNOWN_COLUMNS:
+        return KNOWN_COLUMNS[key]
+    return re.sub(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])", "_", key).lower()
 
 def infer_schema(data: List[Dict[str, Any]]) -> Dict[str, str]:
-    """Infer schema based on JSON file structure"""
+    """Infer column types based on JSON record structure"""
     schema = {}
     for item in data:
         for key, value in item.items():
-            if isinstance(value, str):
+            if isinstance(value, bool):
+                schema[key] = "BOOLEAN"
+            elif isinstance(value, str):
                 schema[key] = "TEXT"
             elif isinstance(value, int):
                 schema[key] = "INTEGER"
@@ -26,40 +57,123 @@ def infer_schema(data: List[Dict[str, Any]]) -> Dict[str, str]:
             elif isinstance(value, dict) or isinstance(value, list):
                 schema[key] = "JSONB"
             elif value is None:
-                schema[key] = "TEXT"
+                schema.setdefault(key, "TEXT")
     return schema
 
-def serialize_dict_values(data: List[Dict], columns: List[str]) -> List[tuple]:
-    """Prepare data for PostgreSQL insertion"""
-    serialized = []
-    for item in data:
-        row = []
-        for col in columns:
-            val = item.get(col)
-            if isinstance(val, (dict, list)):
-                row.append(json.dumps(val))
-            else:
-                row.append(val)
-        serialized.append(tuple(row))
-    return serialized
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-def main():
-    pg = PostgresHandler()
-    raw_data = load_json_files(INPUT_DIR)
+def load_records(path: str) -> List[Dict[str, Any]]:
+    """Scan records of one file, with the file timestamp filled in and nested metric values flattened"""
+    records = []
+    for record in load_task((path, 0, -1), RecordFilter()):
+        for name, metric in (record.pop("Metrics", None) or {}).items():
+            if isinstance(metric, dict) and name not in record:
+                record[name] = metric.get("value")
+        if record.get("InstanceId") and record.get("timestamp"):
+            records.append(record)
+    return records
+
+def find_new_files(pg: PostgresHandler, directory: str) -> List[Tuple[str, int, float, str, Optional[List[str]]]]:
+    """
+    (path, size, mtime, sha256, archived sources) of files that are not in the
+    manifest with the same content. Archives whose sources were all ingested
+    are recorded right away instead.
+    """
+    if not os.path.exists(directory):
+        logger.warning(f"[!] Directory not found: {directory}")
+        return []
+
+    manifest = pg.get_ingest_manifest()
+    ingested = set(manifest) | {source for entry in manifest.values() for source in entry[3]}
+    archives = {index["data_file"]: index for index in read_indexes(directory).values()}
+    new_files = []
+    for filename in visible_files(directory, SCAN_EXTENSIONS):
+        path = os.path.join(directory, filename)
+        stat = os.stat(path)
+        known = manifest.get(path)
+        if known and (known[0], known[1]) == (stat.st_size, stat.st_mtime):
+            continue
+        sha256 = file_sha256(path)
+        if known and known[2] == sha256:
+            pg.touch_ingested_file(path, stat.st_size, stat.st_mtime)
+            continue
+
+        archive = archives.get(filename)
+        sources = [os.path.join(directory, source) for source in archive["sources"]] if archive else None
+        if not known and sources and ingested.issuperset(sources):
+            # Same rows as the files it absorbed (or fewer, once downsampled): nothing new to store
+            pg.record_ingested_file(path, stat.st_size, stat.st_mtime, sha256, archive["records"], sources)
+            logger.info(f"[+] {filename} only holds already ingested files, recorded without parsing")
+            continue
+        # Partly new archives are ingested in full; upserts make the overlap harmless
+        new_files.append((path, stat.st_size, stat.st_mtime, sha256, sources))
+    return new_files
 
-    if not raw_data:
-        logger.info("[!] No data found to ingest.")
-        return
+def prune_manifest(pg: PostgresHandler) -> int:
+    """Drop manifest entries of files that no longer exist (raw files absorbed by archives, expired archives)"""
+    gone = [path for path in pg.get_ingest_manifest() if not os.path.exists(path)]
+    pruned = pg.prune_ingest_manifest(gone)
+    if pruned:
+        logger.info(f"[+] Pruned {pruned} manifest entr{'y' if pruned == 1 else 'ies'} of removed files")
+    return pruned
 
-    schema = infer_schema(raw_data)
-    logger.info(f"[+] Creating or migrating table 'ec2_instances' with inferred schema")
+def ingest(pg: PostgresHandler, directory: str = INPUT_DIR) -> int:
+    """Ingest new or changed scan files from `directory`; returns the number of records stored"""
+    with read_lock(directory):  # the compactor removes no file between listing and parsing
+        new_files = find_new_files(pg, directory)
+        parsed = []
+        for path, size, mtime, sha256, sources in new_files:
+            try:
+                parsed.append((path, size, mtime, sha256, sources, load_records(path)))
+            except Exception as e:
+                logger.error(f"[!] Error loading {path}: {e}")
+    if not new_files:
+        logger.info("[+] No new scan files to ingest")
+        prune_manifest(pg)
+        return 0
 
-    pg.create_table("ec2_instances", schema)
+    # Only new files feed schema inference, and only missing columns are added
+    existing = pg.get_table_columns(TABLE)
+    schema = {to_column(key): sql_type for key, sql_type in
+              infer_schema([r for *_, records in parsed for r in records]).items()}
+    missing = {column: sql_type for column, sql_type in schema.items() if column not in existing}
+    if missing:
+        logger.info(f"[+] Adding {len(missing)} new column(s) to '{TABLE}': {', '.join(missing)}")
+        pg.create_table(TABLE, missing)
 
-    columns = list(schema.keys())
-    formatted_data = serialize_dict_values(raw_data, columns)
+    total = 0
+    oldest = None
+    for path, size, mtime, sha256, sources, records in parsed:
+        # One key per column: e.g. InstanceId and instance_id both map to instance_id
+        by_column = {}
+        for key in sorted({key for record in records for key in record}):
+            by_column.setdefault(to_column(key), key)
+        columns, keys = list(by_column), list(by_column.values())
+        rows = (tuple(record.get(key) for key in keys) for record in records)
+        try:
+            total += pg.ingest_file(path, size, mtime, sha256, TABLE, columns, rows, list(EC2_NATURAL_KEY),
+                                    sources=sources)
+            if records:
+                first = min(str(record["timestamp"]) for record in records)
+                oldest = first if oldest is None else min(oldest, first)
+        except Exception as e:
+            logger.error(f"[!] Failed to ingest {path}: {e}")
 
-    pg.insert_data("ec2_instances", columns, formatted_data)
+    if oldest:
+        pg.refresh_rollups(datetime.fromisoformat(oldest[:26]))
+    prune_manifest(pg)
+    logger.info(f"[+] Ingested {total} record(s) from {len(parsed)} new file(s) into '{TABLE}'")
+    return total
+
+def main():
+    pg = PostgresHandler()
+    pg.create_tables()
+    ingest(pg)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
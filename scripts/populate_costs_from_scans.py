@@ -2,7 +2,7 @@
 
 import logging
 import os
-import boto3
+from src.core.aws_clients import get_session
 from src.core.db_handler import PostgresHandler
 from src.aws.ec2.scanner import EC2Scanner
 from src.aws.ec2.cost_estimator import EC2CostEstimator
@@ -12,8 +12,8 @@ logger = logging.getLogger(__name__)
 
 def main():
     logger.info("[*] Starting cost population service")
-    session = boto3.Session()
-    scanner = EC2Scanner(session.region_name)
+    session = get_session()
+    scanner = EC2Scanner(session.region_name, session=session)
     instances = scanner.scan_instances()
 
     if not instances:
@@ -26,10 +26,9 @@ def main():
     db_handler = PostgresHandler()
     db_handler.create_tables()
 
-    for inst in enriched_instances:
-        db_handler.save_instance_cost_data(inst)
+    stored = db_handler.bulk_save_ec2_instances(enriched_instances)
 
-    logger.info(f"[+] Stored cost data for {len(enriched_instances)} instances")
+    logger.info(f"[+] Stored cost data for {stored} instances")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
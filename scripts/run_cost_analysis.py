@@ -1,7 +1,7 @@
 # scripts/run_cost_analysis.py
 
 import os
-import boto3
+from src.core.aws_clients import get_session
 import logging
 from datetime import datetime
 from src.aws.ec2.scanner import EC2Scanner
@@ -13,7 +13,7 @@ logger = logging.getLogger(__name__)
 def main():
     logger.info("[*] Starting Tephron AI – Cost Analysis Engine")
 
-    session = boto3.Session()
+    session = get_session()
     scanner = EC2Scanner(session.region_name)
     analyzer = EC2Analyzer(session=session)
 
@@ -24,9 +24,9 @@ def main():
 
     all_instances = []
     for region in regions:
-        scanner = EC2Scanner(region)
+        scanner = EC2Scanner(region, session=session)
         instances = scanner.scan_instances()
-        analyzed = [analyzer.analyze_instance(inst) for inst in instances]
+        analyzed = analyzer.analyze_instances(instances)
         all_instances.extend(analyzed)
         logger.info(f"[+] Analyzed {len(instances)} instance(s) in {region}")
 
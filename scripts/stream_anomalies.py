@@ -0,0 +1,63 @@
+# scripts/stream_anomalies.py
+
+"""
+Streaming anomaly pass, cheap enough to run every 15 minutes.
+
+Fetches only the CPU datapoints CloudWatch has produced since the detector's
+last datapoint per instance, straight from CloudWatch (the on-disk datapoint
+cache is bypassed, so a run costs O(new datapoints)), feeds them to the
+StreamingInstanceDetector, checkpoints its state and sends a Slack alert for
+every spike or newly sustained underutilization.
+"""
+
+import logging
+from src.aws.ec2.scanner import EC2Scanner, get_all_regions
+from src.aws.cloudwatch.metrics_collector import CloudWatchMetrics
+from src.ai.ml.anomaly_detector import StreamingInstanceDetector
+from src.slack.bot import SlackBot
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STREAM_PERIOD = 300  # 5-minute datapoints (basic monitoring resolution)
+
+def main():
+    logger.info("[*] Starting Tephron AI – Streaming Anomaly Detection")
+
+    detector = StreamingInstanceDetector()
+    detector.load()
+
+    events = []
+    for region in get_all_regions():
+        instance_ids = [inst["InstanceId"] for page in EC2Scanner(region).iter_instance_pages() for inst in page]
+        if not instance_ids:
+            continue
+
+        def observe(instance_id, metric_name, points, region=region):
+            events.extend(detector.observe(instance_id, metric_name, points, region))
+
+        since = {instance_id: detector.last_timestamp(instance_id) for instance_id in instance_ids}
+        CloudWatchMetrics(region=region).fetch_new_datapoints(since, observe, days=1, period=STREAM_PERIOD)
+
+    detector.checkpoint()
+    logger.info(f"[+] {len(events)} streaming event(s) across {len(detector.states)} tracked instance(s)")
+    if not events:
+        return
+
+    bot = SlackBot()
+    for event in events:
+        if event["Event"] == "Spike":
+            msg = (
+                f"🚨 CPU Spike Detected: `{event['InstanceId']}` in `{event['Region']}`\n"
+                f"• From: ~{event['BaselineCPU']:.2f}% → To: {event['CPUUtilization']:.2f}%"
+            )
+        else:
+            msg = (
+                f"⚠️ Underutilized Instance: `{event['InstanceId']}` in `{event['Region']}`\n"
+                f"• Low CPU on {event['LowCPUDays']} of the last {event['WindowDays']} days (avg {event['AvgCPU']:.2f}%)\n"
+                f"Type `/tephron confirm {event['InstanceId']}` to validate"
+            )
+        bot.send_alert(msg)
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,277 @@
-# src/ai/ml/analyzer.py
+# src/ai/ml/anomaly_detector.py
 
 import os
 import json
+import math
+import time
 import logging
+import joblib
+import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional, Union, Tuple, TypeVar
+from typing import Dict, Any, Iterable, List, Optional, Union, Tuple, TypeVar
+from sklearn.ensemble import IsolationForest
+from src.ai.ml.history_index import InstanceHistoryIndex
+from src.core.utils import generate_timestamp
 
 logger = logging.getLogger(__name__)
 DATA_DIR = "/app/data/output/ec2/"
 
-class InstancePolicyEvaluator:
+MODEL_PATH = os.getenv("ANOMALY_MODEL_PATH", "/app/data/models/isolation_forest.joblib")
+RETRAIN_INTERVAL_HOURS = int(os.getenv("ANOMALY_RETRAIN_HOURS", "24"))
+TRAINING_WINDOW_DAYS = int(os.getenv("ANOMALY_TRAINING_WINDOW_DAYS", "30"))
+MIN_HISTORY_SAMPLES = 3
+MIN_TRAINING_ROWS = 20
+UNDERUTILIZED_CPU_PERCENT = 10
+
+STREAM_STATE_PATH = os.getenv("STREAM_STATE_PATH", "/app/data/cache/streaming_detector.json")
+STREAM_STATE_VERSION = 1
+EWMA_ALPHA = 0.1          # weight of the newest datapoint
+LOW_CPU_WINDOW_DAYS = 7   # rolling window for counting low-CPU days
+STREAM_IDLE_DAYS = int(os.getenv("STREAM_IDLE_DAYS", "14"))  # drop state without datapoints for this long
+SPIKE_Z_SCORE = 3.0
+SPIKE_WARMUP_POINTS = 12  # datapoints before the EWMA is trusted for spikes
+
+# Bump FEATURE_SCHEMA_VERSION whenever FEATURE_SCHEMA or the feature math changes;
+# persisted models built for another version are discarded and retrained.
+FEATURE_SCHEMA_VERSION = 1
+FEATURE_SCHEMA = (
+    "cpu_mean", "cpu_std", "cpu_min", "cpu_max", "low_cpu_share",
+    "network_in_log_mean", "network_out_log_mean"
+)
+
+class InstanceStreamState:
+    """Constant-size running statistics for one instance's CPU stream"""
+
+    __slots__ = ("last_ts", "count", "mean", "var", "min", "max",
+                 "day", "day_sum", "day_count", "low_days_mask", "underutilized")
+
     def __init__(self):
+        self.last_ts = 0
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.day = -1           # UTC day number of the open day
+        self.day_sum = 0.0
+        self.day_count = 0
+        self.low_days_mask = 0  # bit n set = the day n days before the open day was low-CPU
+        self.underutilized = False
+
+    def to_list(self) -> List[Any]:
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_list(cls, values: List[Any]) -> "InstanceStreamState":
+        state = cls()
+        for name, value in zip(cls.__slots__, values):
+            setattr(state, name, value)
+        return state
+
+def build_features(columns: Dict[str, np.ndarray], min_samples: int = MIN_HISTORY_SAMPLES) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-instance feature matrix from InstanceHistoryIndex.to_columns() output.
+
+    Every statistic is a grouped numpy reduction over the flat columns, so the
+    cost is linear in samples with no per-instance Python loop. Returns
+    (features, positions): one FEATURE_SCHEMA row per instance with at least
+    `min_samples` CPU samples, and that instance's position in the request.
+    """
+    populated, offsets = columns["populated"], columns["offsets"]
+    if not len(populated):
+        return np.zeros((0, len(FEATURE_SCHEMA))), populated
+
+    cpus = columns["cpu"]
+    valid = ~np.isnan(cpus)
+    counts = np.add.reduceat(valid, offsets, dtype=np.int64)
+    sums = np.add.reduceat(np.where(valid, cpus, 0.0), offsets)
+    squares = np.add.reduceat(np.where(valid, cpus * cpus, 0.0), offsets)
+    low = np.add.reduceat(valid & (cpus < UNDERUTILIZED_CPU_PERCENT), offsets, dtype=np.int64)
+    cpu_min = np.minimum.reduceat(np.where(valid, cpus, np.inf), offsets)
+    cpu_max = np.maximum.reduceat(np.where(valid, cpus, -np.inf), offsets)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = sums / counts
+        std = np.sqrt(np.maximum(squares / counts - mean * mean, 0.0))
+        network = []
+        for name in ("network_in", "network_out"):
+            values = columns[name]
+            present = ~np.isnan(values)
+            totals = np.add.reduceat(np.where(present, np.log1p(np.maximum(values, 0.0)), 0.0), offsets)
+            network.append(np.nan_to_num(totals / np.add.reduceat(present, offsets, dtype=np.int64)))
+
+    features = np.column_stack((mean, std, cpu_min, cpu_max, low / np.maximum(counts, 1), *network))
+    keep = counts >= min_samples
+    return features[keep], populated[keep]
+
+class InstanceAnomalyDetector:
+    """
+    Isolation Forest over per-instance CPU/network history.
+
+    The model is trained on a sliding window of the scan history and
+    persisted with its feature schema version. It is only refit once it is
+    older than `retrain_interval_hours`; between refits every run reuses the
+    stored model and scores the fleet in one batched decision_function call.
+
+    Flagging itself follows InstancePolicyEvaluator's CPU threshold, so small
+    fleets without a model and mostly idle fleets (where idle instances are
+    inliers) still get alerts; the outlier score is reported alongside.
+    """
+
+    def __init__(self, history: Optional[InstanceHistoryIndex] = None, model_path: str = MODEL_PATH,
+                 retrain_interval_hours: int = RETRAIN_INTERVAL_HOURS,
+                 training_window_days: int = TRAINING_WINDOW_DAYS):
+        self.history = history or InstanceHistoryIndex(DATA_DIR)
+        self.policy = InstancePolicyEvaluator(self.history)
+        self.model_path = model_path
+        self.retrain_interval = retrain_interval_hours * 3600
+        self.training_window = training_window_days * 86400
+        self.model: Optional[IsolationForest] = None
+        self.trained_at: Optional[float] = None
+        self._history_loaded = False
+        self._untrainable_version: Optional[int] = None  # history version training last failed on
+
+    def refresh_history(self):
+        """Bring the history index up to date with the scan archive"""
+        self.history.refresh()
+        self._history_loaded = True
+        self.policy._history_loaded = True  # same index
+
+    def load_model(self) -> bool:
+        """Load the persisted model if it was built for the current feature schema"""
+        if not os.path.exists(self.model_path):
+            return False
+        try:
+            state = joblib.load(self.model_path)
+            if state.get("schema_version") != FEATURE_SCHEMA_VERSION or tuple(state.get("features", ())) != FEATURE_SCHEMA:
+                logger.info("[*] Persisted anomaly model uses an old feature schema, retraining")
+                return False
+            self.model, self.trained_at = state["model"], state["trained_at"]
+            return True
+        except Exception as e:
+            logger.warning(f"[!] Ignoring unreadable anomaly model {self.model_path}: {e}")
+            return False
+
+    def save_model(self, training_rows: int):
+        """Persist the model atomically together with its feature schema"""
+        try:
+            os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
+            tmp_path = f"{self.model_path}.{os.getpid()}.tmp"
+            joblib.dump({
+                "model": self.model,
+                "schema_version": FEATURE_SCHEMA_VERSION,
+                "features": FEATURE_SCHEMA,
+                "trained_at": self.trained_at,
+                "training_window_days": self.training_window // 86400,
+                "training_rows": training_rows
+            }, tmp_path)
+            os.replace(tmp_path, self.model_path)
+        except Exception as e:
+            logger.error(f"[!] Failed to save anomaly model: {e}")
+
+    def is_stale(self, now: Optional[float] = None) -> bool:
+        return self.trained_at is None or (now or time.time()) - self.trained_at >= self.retrain_interval
+
+    def train(self, now: Optional[float] = None) -> bool:
+        """Fit a new model on the last `training_window_days` of history for every known instance"""
+        now = now or time.time()
+        if not self._history_loaded:
+            self.refresh_history()
+
+        columns = self.history.to_columns(list(self.history.series), since=now - self.training_window)
+        features, _ = build_features(columns)
+        if len(features) < MIN_TRAINING_ROWS:
+            logger.warning(f"[!] Only {len(features)} instance(s) with enough history, need {MIN_TRAINING_ROWS} to train")
+            return False
+
+        model = IsolationForest(n_estimators=200, contamination="auto", random_state=42, n_jobs=-1)
+        model.fit(features)
+        self.model, self.trained_at = model, now
+        self.save_model(len(features))
+        logger.info(f"[+] Trained anomaly model on {len(features)} instance(s)")
+        return True
+
+    def ensure_model(self, now: Optional[float] = None) -> bool:
+        """
+        Load the persisted model and refit it only when it is missing or stale.
+
+        A failed fit (too little history) is not retried until the history
+        index changes, so batches scored meanwhile do not each rebuild the
+        training columns.
+        """
+        if self.model is None:
+            self.load_model()
+        if self.is_stale(now) and self._untrainable_version != self.history.version:
+            if not self.train(now):
+                self._untrainable_version = self.history.version
+        return self.model is not None
+
+    def score_instances(self, instances: List[Dict[str, Any]],
+                        now: Optional[float] = None) -> Tuple[List[Dict[str, Any]], np.ndarray, np.ndarray]:
+        """
+        Score a batch with one decision_function call.
+
+        Returns (scored instances, feature rows, scores); lower scores are
+        more anomalous and negative ones are outliers. Instances without
+        enough recent history are left out.
+        """
+        now = now or time.time()
+        if not self._history_loaded:
+            self.refresh_history()
+        if not instances or not self.ensure_model(now):
+            return [], np.zeros((0, len(FEATURE_SCHEMA))), np.zeros(0)
+
+        columns = self.history.to_columns([inst.get("InstanceId") for inst in instances],
+                                          since=now - self.training_window)
+        features, positions = build_features(columns)
+        if not len(features):
+            return [], features, np.zeros(0)
+        scores = self.model.decision_function(features)
+        return [instances[i] for i in positions], features, scores
+
+    def flag_underutilized_instances(self, instances: List[Dict[str, Any]],
+                                     now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Instances whose average CPU is below the policy threshold.
+
+        Each flagged instance carries its Isolation Forest score as
+        AnomalyScore (negative = outlier within the fleet), or None while
+        there is no model yet (fewer than MIN_TRAINING_ROWS instances with history).
+        """
+        if not self._history_loaded:
+            self.refresh_history()
+        evaluations = [result for result in self.policy.evaluate_fleet(instances, now) if result["Underutilized"]]
+        if not evaluations:
+            logger.info(f"[+] No underutilized instance among {len(instances)}")
+            return []
+
+        by_id = {inst.get("InstanceId"): inst for inst in instances}
+        flagged = [by_id[result["InstanceId"]] for result in evaluations]
+        scored, _, values = self.score_instances(flagged, now)
+        scores = {inst.get("InstanceId"): round(float(score), 4) for inst, score in zip(scored, values)}
+
+        anomalies = []
+        for result, inst in zip(evaluations, flagged):
+            anomalies.append({
+                "InstanceId": result["InstanceId"],
+                "Region": inst.get("Region"),
+                "AccountId": inst.get("AccountId"),
+                "InstanceType": inst.get("InstanceType"),
+                "CPUUtilization": result["AvgCPU"],
+                "AnomalyScore": scores.get(result["InstanceId"]),
+                "monthly_forecast": float(inst.get("MonthlyForecast") or inst.get("MonthlyCostEstimate") or 0),
+                "EvaluationTimestamp": result["EvaluationTimestamp"]
+            })
+        outliers = sum(1 for anomaly in anomalies if (anomaly["AnomalyScore"] or 0) < 0)
+        logger.info(f"[+] Flagged {len(anomalies)} of {len(instances)} instance(s) as underutilized "
+                    f"({outliers} also fleet outliers)")
+        return anomalies
+
+class InstancePolicyEvaluator:
+    def __init__(self, history: Optional[InstanceHistoryIndex] = None):
         self.data_dir = DATA_DIR
+        self.history = history or InstanceHistoryIndex(self.data_dir)
+        self._history_loaded = False
         self.policies = {
             "underutilized": {
                 "cpu_threshold_percent": 10,
@@ -24,25 +284,25 @@ class InstancePolicyEvaluator:
             }
         }
 
+    def refresh_history(self):
+        """Bring the history index up to date with the scan archive"""
+        self.history.refresh()
+        self._history_loaded = True
+
     def load_instance_history(self, instance_id: str) -> List[Dict]:
         """Load historical scan data for one instance"""
-        try:
-            history = []
-            for filename in os.listdir(DATA_DIR):
-                if filename.endswith(".json"):
-                    with open(os.path.join(DATA_DIR, filename), "r") as f:
-                        content = json.load(f)
-                        for record in content.get("data", []):
-                            if record.get("InstanceId") == instance_id:
-                                history.append(record)
-
-            history.sort(key=lambda x: x["timestamp"])
-            return history
-        except Exception as e:
-            logger.error(f"[!] Error loading history for {instance_id}: {e}")
-            return []
+        if not self._history_loaded:
+            self.refresh_history()
+        timestamps, cpus = self.history.get_series(instance_id)
+        return [
+            {
+                "timestamp": datetime.utcfromtimestamp(ts).isoformat(),
+                "CPUUtilization": None if math.isnan(cpu) else cpu
+            }
+            for ts, cpu in zip(timestamps, cpus)
+        ]
 
-    def evaluate_underutilization(self, instance_data: Dict[str, Any]) -> Dict[str, Any]:
+    def evaluate_underutilization(self, instance_data: Dict[str, Any], now: Optional[float] = None) -> Dict[str, Any]:
         """Evaluate instance based on multi-day utilization"""
         instance_id = instance_data.get("InstanceId")
         region = instance_data.get("Region")
@@ -51,10 +311,11 @@ class InstancePolicyEvaluator:
         if state in self.policies["underutilized"]["ignore_states"]:
             return {}
 
-        history = self.load_instance_history(instance_id)
-        timestamps = [h["timestamp"] for h in history]
-        cpus = [h.get("Metrics", {}).get("CPUUtilization", {}).get("value") for h in history]
-        cpus = [c for c in cpus if isinstance(c, (int, float))]
+        if not self._history_loaded:
+            self.refresh_history()
+        timestamps, all_cpus = self.history.get_series(instance_id)
+        samples = [(t, c) for t, c in zip(timestamps, all_cpus) if not math.isnan(c)]
+        cpus = [c for _, c in samples]
 
         if len(cpus) < self.policies["underutilized"]["min_days_to_flag"]:
             return {}
@@ -63,10 +324,10 @@ class InstancePolicyEvaluator:
         underutilized = avg_cpu < self.policies["underutilized"]["cpu_threshold_percent"]
 
         # Evaluate recent spike
-        recent = [c for t, c in zip(timestamps, cpus) if (
-            datetime.fromisoformat(t[:26]) > datetime.utcnow() - timedelta(hours=self.policies["spike_detection"]["lookback_hours"])
-        ]
+        cutoff = (now or time.time()) - self.policies["spike_detection"]["lookback_hours"] * 3600
+        recent = [c for t, c in samples if t > cutoff]
         spike_detected = False
+        jump = 0.0
         if len(recent) >= 2:
             jump = recent[-1] - recent[0]
             spike_detected = jump > self.policies["spike_detection"]["cpu_jump_threshold"]
@@ -80,16 +341,244 @@ class InstancePolicyEvaluator:
             "AvgCPU": round(avg_cpu, 2),
             "RecentCPUSpike": round(jump, 2) if spike_detected else None,
             "EvaluationTimestamp": generate_timestamp(),
-            "HistoryCount": len(history)
+            "HistoryCount": len(timestamps)
         }
 
         return result
 
+    def evaluate_fleet(self, instances: List[Dict[str, Any]], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Vectorized evaluate_underutilization over a whole batch.
+
+        Concatenates every instance history into flat timestamp/CPU arrays
+        and computes sample counts, average CPU and lookback-window spike
+        deltas with grouped numpy reductions. Returns the same result dicts,
+        in the same order, as the per-instance path.
+        """
+        if not self._history_loaded:
+            self.refresh_history()
+
+        ignore_states = self.policies["underutilized"]["ignore_states"]
+        candidates = [inst for inst in instances if inst.get("State", "").lower() not in ignore_states]
+        if not candidates:
+            return []
+
+        columns = self.history.to_columns([inst.get("InstanceId") for inst in candidates], network=False)
+        lengths, populated, offsets = columns["lengths"], columns["populated"], columns["offsets"]
+        if not len(populated):
+            return []
+        timestamps, cpus = columns["timestamp"], columns["cpu"]
+
+        # Grouped reductions over contiguous per-instance segments
+        valid = ~np.isnan(cpus)
+        counts = np.zeros(len(candidates), dtype=np.int64)
+        sums = np.zeros(len(candidates))
+        counts[populated] = np.add.reduceat(valid, offsets, dtype=np.int64)
+        sums[populated] = np.add.reduceat(np.where(valid, cpus, 0.0), offsets)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            avg_cpu = sums / counts
+
+        # First and last in-window sample per instance; rows are time-sorted within each segment
+        cutoff = (now or time.time()) - self.policies["spike_detection"]["lookback_hours"] * 3600
+        recent_rows = np.flatnonzero(valid & (timestamps > cutoff))
+        recent_groups = populated[np.searchsorted(offsets, recent_rows, side="right") - 1]
+        recent_counts = np.bincount(recent_groups, minlength=len(candidates))
+        jumps = np.zeros(len(candidates))
+        if len(recent_rows):
+            boundaries = np.flatnonzero(np.diff(recent_groups)) + 1
+            starts = recent_rows[np.concatenate(([0], boundaries))]
+            ends = recent_rows[np.concatenate((boundaries - 1, [len(recent_rows) - 1]))]
+            jumps[recent_groups[np.concatenate(([0], boundaries))]] = cpus[ends] - cpus[starts]
+
+        eligible = counts >= self.policies["underutilized"]["min_days_to_flag"]
+        underutilized = avg_cpu < self.policies["underutilized"]["cpu_threshold_percent"]
+        spikes = (recent_counts >= 2) & (jumps > self.policies["spike_detection"]["cpu_jump_threshold"])
+
+        evaluation_timestamp = generate_timestamp()
+        results = []
+        for i in np.flatnonzero(eligible):
+            inst = candidates[i]
+            results.append({
+                "InstanceId": inst.get("InstanceId"),
+                "Region": inst.get("Region"),
+                "InstanceType": inst.get("InstanceType"),
+                "Underutilized": bool(underutilized[i]),
+                "SpikeDetected": bool(spikes[i]),
+                "AvgCPU": round(float(avg_cpu[i]), 2),
+                "RecentCPUSpike": round(float(jumps[i]), 2) if spikes[i] else None,
+                "EvaluationTimestamp": evaluation_timestamp,
+                "HistoryCount": int(lengths[i])
+            })
+        return results
+
     def evaluate_all_instances(self, instances: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Evaluate all instances against defined policies"""
-        evaluations = []
-        for inst in instances:
-            evaluation = self.evaluate_underutilization(inst)
-            if evaluation:
-                evaluations.append(evaluation)
-        return evaluations
\ No newline at end of file
+        self.refresh_history()
+        return self.evaluate_fleet(instances)
+
+class StreamingInstanceDetector:
+    """
+    Online counterpart of InstancePolicyEvaluator.
+
+    Keeps an InstanceStreamState per instance (EWMA mean/variance, running
+    min/max and a bitmask of low-CPU days over LOW_CPU_WINDOW_DAYS) and
+    updates it in O(1) per CloudWatch datapoint, so each run only pays for
+    the datapoints that arrived since the last one. Spikes and sustained
+    underutilization are reported as events when the datapoint that
+    triggers them arrives. State is checkpointed to a JSON file; instances
+    without a datapoint for `idle_days` (terminated, or no longer scanned)
+    are evicted at each checkpoint.
+    """
+
+    def __init__(self, state_path: str = STREAM_STATE_PATH, alpha: float = EWMA_ALPHA,
+                 window_days: int = LOW_CPU_WINDOW_DAYS, idle_days: int = STREAM_IDLE_DAYS):
+        self.state_path = state_path
+        self.alpha = alpha
+        self.window_days = window_days
+        self.idle_seconds = idle_days * 86400
+        self.policies = {
+            "underutilized": {
+                "cpu_threshold_percent": 10,
+                "min_days_to_flag": 3
+            },
+            "spike_detection": {
+                "cpu_jump_threshold": 50
+            }
+        }
+        self.states: Dict[str, InstanceStreamState] = {}
+        self.regions: Dict[str, str] = {}
+
+    def load(self) -> bool:
+        """Restore the last checkpoint; returns False if there is none usable"""
+        if not os.path.exists(self.state_path):
+            return False
+        try:
+            with open(self.state_path, "r") as f:
+                checkpoint = json.load(f)
+            if checkpoint.get("version") != STREAM_STATE_VERSION or checkpoint.get("fields") != list(InstanceStreamState.__slots__):
+                return False
+            self.states = {instance_id: InstanceStreamState.from_list(values)
+                           for instance_id, values in checkpoint["states"].items()}
+            self.regions = checkpoint.get("regions", {})
+            logger.info(f"[+] Restored streaming state for {len(self.states)} instance(s)")
+            return True
+        except Exception as e:
+            logger.warning(f"[!] Ignoring unreadable streaming checkpoint {self.state_path}: {e}")
+            return False
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Drop the state of instances whose newest datapoint is older than the idle window"""
+        cutoff = (now or time.time()) - self.idle_seconds
+        idle = [instance_id for instance_id, state in self.states.items() if state.last_ts < cutoff]
+        for instance_id in idle:
+            del self.states[instance_id]
+            self.regions.pop(instance_id, None)
+        if idle:
+            logger.info(f"[+] Evicted streaming state of {len(idle)} idle instance(s)")
+        return len(idle)
+
+    def checkpoint(self, now: Optional[float] = None):
+        """Evict idle instances, then write all instance states atomically"""
+        self.evict_idle(now)
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({
+                    "version": STREAM_STATE_VERSION,
+                    "fields": list(InstanceStreamState.__slots__),
+                    "states": {instance_id: state.to_list() for instance_id, state in self.states.items()},
+                    "regions": self.regions
+                }, f)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logger.error(f"[!] Failed to checkpoint streaming state: {e}")
+
+    def last_timestamp(self, instance_id: str) -> Optional[int]:
+        """Epoch seconds of the newest datapoint applied for the instance, None if it is new"""
+        state = self.states.get(instance_id)
+        return state.last_ts if state is not None and state.count else None
+
+    def _close_day(self, instance_id: str, state: InstanceStreamState, day: int) -> Optional[Dict[str, Any]]:
+        """Fold the open day into the low-CPU bitmask and move to `day`"""
+        policy = self.policies["underutilized"]
+        window_mask = (1 << self.window_days) - 1
+
+        if state.day >= 0:
+            low = state.day_count and state.day_sum / state.day_count < policy["cpu_threshold_percent"]
+            state.low_days_mask |= 1 if low else 0
+            # Days without any datapoint shift in as "not low"
+            state.low_days_mask = (state.low_days_mask << min(day - state.day, self.window_days)) & window_mask
+        state.day, state.day_sum, state.day_count = day, 0.0, 0
+
+        low_days = bin(state.low_days_mask).count("1")
+        underutilized = low_days >= policy["min_days_to_flag"]
+        event = None
+        if underutilized and not state.underutilized:
+            event = {
+                "InstanceId": instance_id,
+                "Region": self.regions.get(instance_id),
+                "Event": "Underutilized",
+                "LowCPUDays": low_days,
+                "WindowDays": self.window_days,
+                "AvgCPU": round(state.mean, 2),
+                "Timestamp": datetime.utcfromtimestamp(day * 86400).isoformat()
+            }
+        state.underutilized = underutilized
+        return event
+
+    def update(self, instance_id: str, timestamp: int, cpu: float) -> List[Dict[str, Any]]:
+        """Apply one CPU datapoint; returns any events it triggers"""
+        state = self.states.get(instance_id)
+        if state is None:
+            state = self.states[instance_id] = InstanceStreamState()
+        if timestamp <= state.last_ts or cpu is None or math.isnan(cpu):
+            return []  # replayed, out of order or missing
+
+        events = []
+        day = int(timestamp // 86400)
+        if day != state.day:
+            event = self._close_day(instance_id, state, day)
+            if event:
+                events.append(event)
+
+        # Spike check against the state before this datapoint
+        deviation = cpu - state.mean
+        if (state.count >= SPIKE_WARMUP_POINTS
+                and deviation > self.policies["spike_detection"]["cpu_jump_threshold"]
+                and deviation > SPIKE_Z_SCORE * math.sqrt(state.var)):
+            events.append({
+                "InstanceId": instance_id,
+                "Region": self.regions.get(instance_id),
+                "Event": "Spike",
+                "CPUUtilization": round(cpu, 2),
+                "BaselineCPU": round(state.mean, 2),
+                "Timestamp": datetime.utcfromtimestamp(timestamp).isoformat()
+            })
+
+        # Exponentially weighted mean and variance
+        if state.count == 0:
+            state.mean, state.var = cpu, 0.0
+        else:
+            increment = self.alpha * deviation
+            state.mean += increment
+            state.var = (1 - self.alpha) * (state.var + deviation * increment)
+        state.min = min(state.min, cpu)
+        state.max = max(state.max, cpu)
+        state.count += 1
+        state.last_ts = timestamp
+        state.day_sum += cpu
+        state.day_count += 1
+        return events
+
+    def observe(self, instance_id: str, metric_name: str, points: Iterable[Tuple[int, float]],
+                region: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Feed (epoch, value) datapoints for one series; only CPUUtilization is tracked"""
+        if metric_name != "CPUUtilization":
+            return []
+        if region:
+            self.regions[instance_id] = region
+        events = []
+        for timestamp, value in sorted(points):
+            events.extend(self.update(instance_id, timestamp, value))
+        return events
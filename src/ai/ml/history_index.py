@@ -0,0 +1,291 @@
+# src/ai/ml/history_index.py
+
+import os
+import math
+import pickle
+import logging
+import numpy as np
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from src.core.scan_loader import SCAN_EXTENSIONS, RecordFilter, load_task
+from src.core.scan_archive import ARCHIVE_PREFIX, read_indexes, read_lock, visible_files
+from src.core.scan_store import PARQUET_DIR, use_parquet, pq
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = "/app/data/output/ec2/"
+INDEX_PATH = "/app/data/cache/instance_history.pkl"
+INDEX_VERSION = 2
+
+Series = Tuple[array, array]  # (epoch seconds, CPU %), sorted by time; NaN = no CPU sample
+Network = Tuple[array, array]  # (NetworkIn, NetworkOut) aligned with Series; NaN = no sample
+
+def parse_timestamp(value: str) -> float:
+    """Parse an ISO scan timestamp (naive values are UTC) to epoch seconds"""
+    parsed = datetime.fromisoformat(value[:26])
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def record_metric(record: Dict[str, Any], name: str) -> float:
+    """Metric value from a scan record, in either the nested Metrics or the flat layout"""
+    value = record.get("Metrics", {}).get(name, {}).get("value")
+    if value is None:
+        value = record.get(name)
+    return float(value) if isinstance(value, (int, float)) else math.nan
+
+def record_cpu(record: Dict[str, Any]) -> float:
+    """CPU % from a scan record"""
+    return record_metric(record, "CPUUtilization")
+
+class InstanceHistoryIndex:
+    """
+    Per-instance CPU/network history built in one pass over the scan archive.
+
+    Keeps sorted timestamp/CPU/network arrays per instance ID plus the (size, mtime)
+    of every file already indexed. update() only parses new files; a changed
+    or removed file triggers a full rebuild. Raw files absorbed by a compacted
+    archive are kept with meta None: an archive covering only indexed files
+    is adopted without parsing. The index is pickled between runs.
+    """
+
+    def __init__(self, data_dir: str = DATA_DIR, index_path: str = INDEX_PATH):
+        self.data_dir = data_dir
+        self.index_path = index_path
+        self.files: Dict[str, Optional[Tuple[int, float]]] = {}
+        self.series: Dict[str, Series] = {}
+        self.network: Dict[str, Network] = {}
+        self.version = 0  # bumped whenever the indexed content changes
+
+    def load(self) -> bool:
+        """Load the persisted index; returns False if there is none usable"""
+        if not os.path.exists(self.index_path):
+            return False
+        try:
+            with open(self.index_path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("version") != INDEX_VERSION or state.get("data_dir") != self.data_dir:
+                return False
+            self.files, self.series, self.network = state["files"], state["series"], state["network"]
+            self.version += 1
+            logger.info(f"[+] Loaded history index with {len(self.series)} instance(s)")
+            return True
+        except Exception as e:
+            logger.warning(f"[!] Ignoring unreadable history index {self.index_path}: {e}")
+            return False
+
+    def save(self):
+        """Persist the index atomically"""
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump({"version": INDEX_VERSION, "data_dir": self.data_dir,
+                             "files": self.files, "series": self.series, "network": self.network},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logger.error(f"[!] Failed to save history index: {e}")
+
+    def _scan_files(self) -> Dict[str, Tuple[int, float]]:
+        if not os.path.exists(self.data_dir):
+            logger.warning(f"[!] Directory not found: {self.data_dir}")
+            return {}
+        current = {}
+        for filename in visible_files(self.data_dir, SCAN_EXTENSIONS):
+            try:
+                stat = os.stat(os.path.join(self.data_dir, filename))
+            except FileNotFoundError:  # removed since the listing (e.g. by a run without read_lock)
+                continue
+            current[filename] = (stat.st_size, stat.st_mtime)
+        # Parquet segments are keyed by absolute path
+        if use_parquet() and os.path.isdir(PARQUET_DIR):
+            for root, _, files in os.walk(PARQUET_DIR):
+                for filename in files:
+                    if filename.endswith(".parquet"):
+                        path = os.path.join(root, filename)
+                        try:
+                            stat = os.stat(path)
+                        except FileNotFoundError:
+                            continue
+                        current[path] = (stat.st_size, stat.st_mtime)
+        return current
+
+    def _ingest_file(self, filename: str, pending: Dict[str, List[Tuple[float, float, float, float]]]):
+        path = os.path.join(self.data_dir, filename)
+        if path.endswith(".parquet"):
+            self._ingest_parquet(path, pending)
+            return
+        for record in load_task((path, 0, -1), RecordFilter()):
+            instance_id = record.get("InstanceId")
+            timestamp = record.get("timestamp")
+            if not instance_id or not timestamp:
+                continue
+            pending.setdefault(instance_id, []).append((
+                parse_timestamp(timestamp), record_cpu(record),
+                record_metric(record, "NetworkIn"), record_metric(record, "NetworkOut")
+            ))
+
+    def _ingest_parquet(self, path: str, pending: Dict[str, List[Tuple[float, float, float, float]]]):
+        """Read only the columns the index needs from one Parquet segment"""
+        table = pq.read_table(path, columns=["instance_id", "timestamp", "cpu_utilization", "network_in", "network_out"])
+        columns = table.to_pydict()
+        for instance_id, timestamp, cpu, network_in, network_out in zip(
+                columns["instance_id"], columns["timestamp"], columns["cpu_utilization"],
+                columns["network_in"], columns["network_out"]):
+            if not instance_id or timestamp is None:
+                continue
+            pending.setdefault(instance_id, []).append((
+                timestamp.replace(tzinfo=timezone.utc).timestamp(),
+                math.nan if cpu is None else cpu,
+                math.nan if network_in is None else network_in,
+                math.nan if network_out is None else network_out
+            ))
+
+    def _adopt_archives(self, current: Dict[str, Tuple[int, float]], archives: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        Account for newly compacted archives without re-reading them.
+
+        An archive whose sources (and previous generation) are all indexed
+        already holds exactly the indexed points, so it replaces those entries.
+        Returns False when an archive only partly overlaps the index (or was
+        downsampled), in which case the index must be rebuilt.
+        """
+        for name, index in sorted(archives.items()):
+            if name not in current or name in self.files:
+                continue
+            generation = index.get("generation", 1)
+            previous = f"{ARCHIVE_PREFIX}{index['day']}.{generation - 1}.ndjson" if generation > 1 else None
+            sources = index.get("sources", [])
+            known = [source for source in sources if source in self.files]
+            if previous in self.files and index.get("downsampled"):
+                return False
+            if len(known) == len(sources) and (previous is None or previous in self.files):
+                self.files.pop(previous, None)
+            elif known or previous in self.files:
+                return False
+            else:
+                continue  # nothing of it indexed yet: parsed as a new file
+            self.files[name] = current[name]
+            self.files.update((source, None) for source in sources)
+        return True
+
+    def _add_points(self, instance_id: str, points: List[Tuple[float, float, float, float]]):
+        """
+        Add new samples to one instance's history.
+
+        Scans arrive in time order, so the sorted new points are normally
+        appended in place; only an instance that gets points older than its
+        latest sample (e.g. a back-filled file) has its history re-sorted.
+        """
+        points.sort(key=lambda p: p[0])
+        new = [array("d", column) for column in zip(*points)]
+        timestamps, cpus = self.get_series(instance_id)
+        network_in, network_out = self.get_network(instance_id)
+        if len(network_in) != len(timestamps):
+            network_in = array("d", [math.nan]) * len(timestamps)
+            network_out = array("d", [math.nan]) * len(timestamps)
+        existing = [timestamps, cpus, network_in, network_out]
+
+        if not len(timestamps):
+            columns = new
+        elif new[0][0] >= timestamps[-1]:
+            length = len(timestamps)
+            try:
+                for column, values in zip(existing, new):
+                    column.extend(values)
+                columns = existing
+            except BufferError:  # a numpy view still holds an array: append to copies instead
+                columns = [column[:length] + values for column, values in zip(existing, new)]
+        else:
+            merged = sorted(list(zip(*existing)) + points, key=lambda p: p[0])
+            columns = [array("d", column) for column in zip(*merged)]
+        self.series[instance_id] = (columns[0], columns[1])
+        self.network[instance_id] = (columns[2], columns[3])
+
+    def update(self) -> int:
+        """Index scan files added since the last update; returns the number parsed"""
+        with read_lock(self.data_dir):  # keeps the listed files on disk until they are parsed
+            return self._update()
+
+    def _update(self) -> int:
+        current = self._scan_files()
+        archives = {index["data_file"]: index for index in read_indexes(self.data_dir).values()}
+        if not self._adopt_archives(current, archives) or any(
+                meta is not None and current.get(name) != meta for name, meta in self.files.items()):
+            logger.info("[*] Scan archive changed in place, rebuilding history index")
+            self.files, self.series, self.network = {}, {}, {}
+
+        new_files = sorted(name for name in current if name not in self.files)
+        pending: Dict[str, List[Tuple[float, float, float, float]]] = {}
+        for filename in new_files:
+            try:
+                self._ingest_file(filename, pending)
+            except Exception as e:
+                logger.error(f"[!] Error loading {filename}: {e}")
+            self.files[filename] = current[filename]
+            if filename in archives:
+                self.files.update((source, None) for source in archives[filename].get("sources", []))
+
+        for instance_id, points in pending.items():
+            self._add_points(instance_id, points)
+
+        if new_files:
+            self.version += 1
+            logger.info(f"[+] Indexed {len(new_files)} new scan file(s) for {len(pending)} instance(s)")
+        return len(new_files)
+
+    def refresh(self) -> int:
+        """Load the persisted index, index new files and persist it again"""
+        if not self.files:
+            self.load()
+        updated = self.update()
+        if updated:
+            self.save()
+        return updated
+
+    def get_series(self, instance_id: str) -> Series:
+        return self.series.get(instance_id, (array("d"), array("d")))
+
+    def get_network(self, instance_id: str) -> Network:
+        return self.network.get(instance_id, (array("d"), array("d")))
+
+    def to_columns(self, instance_ids: List[str], since: Optional[float] = None,
+                   network: bool = True) -> Dict[str, np.ndarray]:
+        """
+        Concatenate the histories of `instance_ids` into flat columnar arrays.
+
+        Returns timestamp, cpu and (unless `network` is False) network_in and
+        network_out columns, plus `lengths` (samples per requested instance,
+        0 if none), `populated` (positions of instances with samples) and
+        `offsets` (start row of each populated instance), ready for
+        np.*.reduceat. With `since`, only samples newer than that epoch are kept.
+        """
+        segments = []
+        lengths = np.zeros(len(instance_ids), dtype=np.int64)
+        for i, instance_id in enumerate(instance_ids):
+            timestamps, cpus = self.get_series(instance_id)
+            if not len(timestamps):
+                continue
+            network_in = network_out = None
+            if network:
+                network_in, network_out = self.get_network(instance_id)
+                if len(network_in) != len(timestamps):
+                    network_in = network_out = array("d", [math.nan]) * len(timestamps)
+            start = 0
+            if since is not None:
+                start = int(np.searchsorted(np.frombuffer(timestamps, dtype=np.float64), since, side="right"))
+            if start < len(timestamps):
+                segments.append((timestamps, cpus, network_in, network_out, start))
+                lengths[i] = len(timestamps) - start
+
+        populated = np.flatnonzero(lengths)
+        columns = {"lengths": lengths, "populated": populated,
+                   "offsets": np.concatenate(([0], np.cumsum(lengths[populated])[:-1])).astype(np.int64)}
+        names = ("timestamp", "cpu", "network_in", "network_out") if network else ("timestamp", "cpu")
+        for position, name in enumerate(names):
+            columns[name] = np.concatenate(
+                [np.frombuffer(segment[position], dtype=np.float64)[segment[4]:] for segment in segments]
+            ) if segments else np.zeros(0)
+        return columns
@@ -36,6 +36,12 @@ class FAISSVectorStore:
             logger.error(f"[!] Failed to build FAISS index: {e}")
             return faiss.read_index(self.index_path)
 
+    def rebuild(self):
+        """Reload the knowledge base and rebuild the index with the already loaded model"""
+        self.documents = self.load_documents()
+        self.index = self.build_index()
+        logger.info(f"[+] Rebuilt FAISS index with {len(self.documents)} document(s)")
+
     def search(self, query: str, k=5) -> list:
         """Search FAISS index using semantic similarity"""
         try:
@@ -0,0 +1,96 @@
+# src/aws/cloudwatch/datapoint_cache.py
+
+import os
+import struct
+import logging
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = "/app/data/cache/cloudwatch/"
+RETENTION_DAYS = 90
+
+# File layout: magic, point count, then int64 epoch seconds and float64 values
+_MAGIC = b"TPCW"
+_HEADER = struct.Struct("<4sQ")
+
+class DatapointCache:
+    """
+    On-disk CloudWatch datapoint cache.
+
+    One file per (region, instance, metric, period) holding two packed
+    arrays: sorted epoch-second timestamps and their values. Callers read
+    the last cached timestamp, fetch only newer datapoints and merge them in.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, retention_days: int = RETENTION_DAYS):
+        self.cache_dir = cache_dir
+        self.retention_seconds = retention_days * 86400
+        self._lock = threading.Lock()
+
+    def _path(self, region: str, instance_id: str, metric_name: str, period: int) -> str:
+        return os.path.join(self.cache_dir, region, instance_id, f"{metric_name}_{period}.bin")
+
+    def load(self, region: str, instance_id: str, metric_name: str, period: int) -> Tuple[array, array]:
+        """Return (timestamps, values) arrays; both empty if nothing is cached"""
+        timestamps, values = array("q"), array("d")
+        path = self._path(region, instance_id, metric_name, period)
+        if not os.path.exists(path):
+            return timestamps, values
+
+        try:
+            with open(path, "rb") as f:
+                magic, count = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != _MAGIC:
+                    raise ValueError("bad cache header")
+                timestamps.fromfile(f, count)
+                values.fromfile(f, count)
+        except Exception as e:
+            logger.warning(f"[!] Discarding unreadable datapoint cache {path}: {e}")
+            return array("q"), array("d")
+
+        return timestamps, values
+
+    def last_timestamp(self, region: str, instance_id: str, metric_name: str, period: int) -> Optional[int]:
+        """Epoch seconds of the newest cached datapoint, or None"""
+        timestamps, _ = self.load(region, instance_id, metric_name, period)
+        return timestamps[-1] if timestamps else None
+
+    def merge(self, region: str, instance_id: str, metric_name: str, period: int,
+              points: List[Tuple[int, float]], now: int,
+              cached: Optional[Tuple[array, array]] = None) -> Tuple[array, array]:
+        """
+        Merge new (epoch, value) points into the cache and return the full series.
+
+        `cached` is the series the caller already loaded for this key; the
+        file is only read when it is not given.
+        """
+        with self._lock:
+            timestamps, values = cached if cached is not None else self.load(region, instance_id, metric_name, period)
+            if not points:
+                return timestamps, values
+
+            # Newer fetches win: CloudWatch may revise the most recent, partial period
+            merged: Dict[int, float] = dict(zip(timestamps, values))
+            merged.update(points)
+
+            cutoff = now - self.retention_seconds
+            ordered = sorted(ts for ts in merged if ts >= cutoff)
+            timestamps = array("q", ordered)
+            values = array("d", (merged[ts] for ts in ordered))
+
+            path = self._path(region, instance_id, metric_name, period)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(_HEADER.pack(_MAGIC, len(timestamps)))
+                    timestamps.tofile(f)
+                    values.tofile(f)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                logger.warning(f"[!] Failed to write datapoint cache {path}: {e}")
+
+            return timestamps, values
@@ -1,61 +1,248 @@
 # src/aws/cloudwatch/metrics_collector.py
 
+import time
 import boto3
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
-from typing import Dict, List, Any, Optional, Union, Tuple, TypeVar
+from typing import Callable, Dict, Iterator, List, Any, Optional, Union, Tuple, TypeVar
 from src.core.logger import logger
+from src.core.aws_clients import get_client, get_session
+from src.core.rate_limiter import is_throttled
+from src.aws.cloudwatch.datapoint_cache import DatapointCache
+
+FLEET_METRICS = ("CPUUtilization", "NetworkIn", "NetworkOut")
+MAX_QUERIES_PER_REQUEST = 500  # GetMetricData hard limit
+MAX_DATAPOINTS_PER_CALL = 1440  # get_metric_statistics hard limit
+SERIES_PERIOD = 3600  # Hourly datapoints
+
+# Called with (instance_id, metric_name, [(epoch, value), ...]) for every fetched series
+DatapointListener = Callable[[str, str, List[Tuple[int, float]]], None]
+
+# Shared on-disk cache so repeated runs only fetch datapoints newer than the last one seen
+default_cache = DatapointCache()
+
+def _to_datetime(epoch: int) -> datetime:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
 
 class CloudWatchMetrics:
-    def __init__(self, session=None, region="us-east-1"):
-        self.session = session or boto3.Session()
+    def __init__(self, session=None, region="us-east-1", cache: Optional[DatapointCache] = None):
+        self.session = session or get_session()
         self.region = region
+        self.cache = cache or default_cache
         try:
-            self.cloudwatch = self.session.client("cloudwatch", region_name=region)
+            self.cloudwatch = get_client("cloudwatch", region, self.session)
         except Exception as e:
             logger.error(f"[!] Failed to initialize CloudWatch client in {region}: {e}")
             self.cloudwatch = None
 
-    def _fetch_metric(self, instance_id: str, metric_name: str, days: int = 7) -> Dict[str, Any]:
-        """Fetch latest value for a CloudWatch metric"""
-        if not self.cloudwatch:
-            logger.warning("[!] CloudWatch client not initialized")
-            return {"value": Decimal(0), "unit": "N/A"}
+    def _window(self, days: int, period: int) -> Tuple[int, int]:
+        """Return (start, end) epoch seconds aligned to the period boundary"""
+        now = int(time.time())
+        end = now - now % period + period
+        return end - days * 86400, end
 
-        try:
-            logger.debug(f"[+] Fetching {metric_name} for {instance_id} in {self.region}")
+    def _fetch_statistics(self, instance_id: str, metric_name: str, start: int, end: int,
+                          period: int) -> List[Tuple[int, float]]:
+        """Fetch hourly averages in windows that respect the per-call datapoint limit"""
+        points = []
+        step = MAX_DATAPOINTS_PER_CALL * period
+        for window_start in range(start, end, step):
             stats = self.cloudwatch.get_metric_statistics(
                 Namespace="AWS/EC2",
                 MetricName=metric_name,
                 Dimensions=[{"Name": "InstanceId", "Value": instance_id}],
-                StartTime=datetime.utcnow() - timedelta(days=days),
-                EndTime=datetime.utcnow(),
-                Period=604800,  # Weekly average
+                StartTime=_to_datetime(window_start),
+                EndTime=_to_datetime(min(window_start + step, end)),
+                Period=period,
                 Statistics=["Average"]
             )
-            datapoints = sorted(stats.get("Datapoints", []), key=lambda x: x["Timestamp"])
-            latest_value = datapoints[-1]["Average"] if datapoints else None
+            points.extend(
+                (int(dp["Timestamp"].timestamp()), dp["Average"]) for dp in stats.get("Datapoints", [])
+            )
+        return points
 
-            return {
-                "value": Decimal(latest_value).quantize(Decimal("0.00")) if latest_value else Decimal(0),
-                "unit": "percent" if "CPU" in metric_name else "bytes/sec"
-            }
+    def get_metric_series(self, instance_id: str, metric_name: str, days: int = 7,
+                          period: int = SERIES_PERIOD) -> List[Tuple[int, float]]:
+        """
+        Return (epoch, average) datapoints for the last `days`, oldest first.
 
-        except Exception as e:
-            logger.warning(f"[!] Error fetching {metric_name} for {instance_id}: {e}")
-            return {"value": Decimal(0), "unit": "N/A"}
+        Only the window after the last cached datapoint is requested from
+        CloudWatch; the latest cached period is re-fetched since it may have
+        been partial. On API errors (including throttling and open circuits)
+        the cached points are returned as-is.
+        """
+        start, end = self._window(days, period)
+        cached = self.cache.load(self.region, instance_id, metric_name, period)
+        fetch_start = max(start, cached[0][-1]) if cached[0] else start
+
+        points = []
+        if self.cloudwatch:
+            try:
+                logger.debug(f"[+] Fetching {metric_name} for {instance_id} in {self.region} since {fetch_start}")
+                points = self._fetch_statistics(instance_id, metric_name, fetch_start, end, period)
+            except Exception as e:
+                if is_throttled(e):
+                    logger.warning(f"[!] {metric_name} for {instance_id} not fetched, CloudWatch throttled in {self.region}: {e}")
+                else:
+                    logger.warning(f"[!] Error fetching {metric_name} for {instance_id}: {e}")
+        else:
+            logger.warning("[!] CloudWatch client not initialized")
+
+        timestamps, values = self.cache.merge(self.region, instance_id, metric_name, period, points, end, cached)
+        return [(ts, value) for ts, value in zip(timestamps, values) if ts >= start]
+
+    def _fetch_metric(self, instance_id: str, metric_name: str, days: int = 7) -> Dict[str, Any]:
+        """Average a CloudWatch metric over the last `days` from its hourly series; value is None without data"""
+        series = self.get_metric_series(instance_id, metric_name, days)
+        if not series:
+            return {"value": None, "unit": "N/A"}
+
+        average = sum(value for _, value in series) / len(series)
+        return {
+            "value": Decimal(average).quantize(Decimal("0.00")),
+            "unit": "percent" if "CPU" in metric_name else "bytes/sec"
+        }
 
-    def get_cpu_utilization(self, instance_id: str) -> float:
-        """Get latest CPU utilization (weekly average)"""
+    def get_cpu_utilization(self, instance_id: str) -> Optional[float]:
+        """Get latest CPU utilization (weekly average), None without datapoints"""
         metric = self._fetch_metric(instance_id, "CPUUtilization")
-        return round(float(metric["value"]), 2)
+        return round(float(metric["value"]), 2) if metric["value"] is not None else None
 
-    def get_network_io(self, instance_id: str) -> Dict[str, float]:
-        """Get network traffic metrics"""
+    def get_network_io(self, instance_id: str) -> Dict[str, Optional[float]]:
+        """Get network traffic metrics, None without datapoints"""
         in_metric = self._fetch_metric(instance_id, "NetworkIn")
         out_metric = self._fetch_metric(instance_id, "NetworkOut")
 
         return {
-            "network_in_bytes": float(in_metric["value"]),
-            "network_out_bytes": float(out_metric["value"])
-        }
\ No newline at end of file
+            "network_in_bytes": float(in_metric["value"]) if in_metric["value"] is not None else None,
+            "network_out_bytes": float(out_metric["value"]) if out_metric["value"] is not None else None
+        }
+
+    def _fetch_metric_data(self, queries: List[Tuple[int, str, str]], period: int,
+                           end: int) -> Iterator[Dict[Tuple[str, str], List[Tuple[int, float]]]]:
+        """
+        Run (start, instance_id, metric_name) queries through batched GetMetricData calls.
+
+        Packs up to 500 queries into each request and follows NextToken.
+        Queries are sorted by start so each request covers a similar window,
+        and points older than a query's own start are dropped. Yields
+        {(instance_id, metric_name): [(epoch, value), ...]} per request; a
+        failed request (throttled, circuit open) yields its series empty.
+        """
+        queries = sorted(queries, key=lambda q: q[0])
+        paginator = self.cloudwatch.get_paginator("get_metric_data")
+        for offset in range(0, len(queries), MAX_QUERIES_PER_REQUEST):
+            batch = queries[offset:offset + MAX_QUERIES_PER_REQUEST]
+            # Ids must start with a lowercase letter
+            index = {f"m{i}": query for i, query in enumerate(batch)}
+            fetched = {(instance_id, metric_name): [] for _, instance_id, metric_name in batch}
+            try:
+                pages = paginator.paginate(
+                    MetricDataQueries=[{
+                        "Id": query_id,
+                        "MetricStat": {
+                            "Metric": {
+                                "Namespace": "AWS/EC2",
+                                "MetricName": metric_name,
+                                "Dimensions": [{"Name": "InstanceId", "Value": instance_id}]
+                            },
+                            "Period": period,
+                            "Stat": "Average"
+                        },
+                        "ReturnData": True
+                    } for query_id, (_, instance_id, metric_name) in index.items()],
+                    StartTime=_to_datetime(batch[0][0]),
+                    EndTime=_to_datetime(end)
+                )
+                for page in pages:
+                    for series in page.get("MetricDataResults", []):
+                        query_start, instance_id, metric_name = index[series["Id"]]
+                        fetched[(instance_id, metric_name)].extend(
+                            (epoch, value)
+                            for epoch, value in ((int(ts.timestamp()), value) for ts, value in
+                                                 zip(series.get("Timestamps", []), series.get("Values", [])))
+                            if epoch >= query_start
+                        )
+            except Exception as e:
+                if is_throttled(e):
+                    logger.warning(f"[!] GetMetricData batch of {len(batch)} series shed in {self.region}, "
+                                   f"they are reported as missing: {e}")
+                else:
+                    logger.warning(f"[!] GetMetricData batch failed in {self.region}: {e}")
+            yield fetched
+
+    def get_fleet_metrics(self, instance_ids: List[str], metric_names: Tuple[str, ...] = FLEET_METRICS,
+                          days: int = 7, period: int = SERIES_PERIOD,
+                          on_datapoints: Optional[DatapointListener] = None) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        Fetch weekly averages for many instances with batched GetMetricData calls.
+
+        A region needs len(ids) * len(metrics) / 500 calls instead of one
+        get_metric_statistics call per instance per metric. Each series is
+        only fetched from its last cached datapoint on. `on_datapoints`
+        receives each freshly fetched series.
+
+        Returns {instance_id: {metric_name: value}}. Series without datapoints
+        in the window, e.g. because CloudWatch was throttled or the region's
+        circuit is open, are reported as None rather than 0.0 so that missing
+        data is never mistaken for an idle instance.
+        """
+        results = {instance_id: {name: None for name in metric_names} for instance_id in instance_ids}
+        start, end = self._window(days, period)
+
+        queries = []
+        for instance_id in instance_ids:
+            for metric_name in metric_names:
+                last = self.cache.last_timestamp(self.region, instance_id, metric_name, period)
+                queries.append((max(start, last) if last is not None else start, instance_id, metric_name))
+
+        def average(timestamps, values):
+            window = [value for ts, value in zip(timestamps, values) if ts >= start]
+            return float(Decimal(sum(window) / len(window)).quantize(Decimal("0.00"))) if window else None
+
+        # Averages come from the merged series, so each cache file is read at most twice
+        if not self.cloudwatch:
+            logger.warning("[!] CloudWatch client not initialized")
+            for instance_id, metrics in results.items():
+                for metric_name in metrics:
+                    metrics[metric_name] = average(*self.cache.load(self.region, instance_id, metric_name, period))
+        else:
+            for fetched in self._fetch_metric_data(queries, period, end):
+                for (instance_id, metric_name), points in fetched.items():
+                    series = self.cache.merge(self.region, instance_id, metric_name, period, points, end)
+                    results[instance_id][metric_name] = average(*series)
+                    if on_datapoints and points:
+                        on_datapoints(instance_id, metric_name, points)
+
+        missing = sum(value is None for metrics in results.values() for value in metrics.values())
+        if missing:
+            logger.warning(f"[!] {missing} of {len(queries)} metric series have no datapoints in {self.region}")
+        logger.info(f"[+] Fetched {len(queries)} metric series for {len(instance_ids)} instance(s) in {self.region}")
+        return results
+
+    def fetch_new_datapoints(self, since: Dict[str, Optional[int]], on_datapoints: DatapointListener,
+                             metric_names: Tuple[str, ...] = ("CPUUtilization",), days: int = 1,
+                             period: int = SERIES_PERIOD) -> int:
+        """
+        Stream datapoints newer than since[instance_id] (epoch seconds) to `on_datapoints`.
+
+        Bypasses the on-disk cache: consumers that keep their own running
+        state (e.g. the StreamingInstanceDetector) only pay for the datapoints
+        that arrived since their last one. Instances without a position, or
+        with one older than `days`, start `days` back. Returns the number of
+        datapoints delivered.
+        """
+        if not self.cloudwatch:
+            logger.warning("[!] CloudWatch client not initialized")
+            return 0
+        start, end = self._window(days, period)
+        queries = [(max(start, last + period) if last else start, instance_id, metric_name)
+                   for instance_id, last in since.items() for metric_name in metric_names]
+        delivered = 0
+        for fetched in self._fetch_metric_data(queries, period, end):
+            for (instance_id, metric_name), points in fetched.items():
+                if points:
+                    on_datapoints(instance_id, metric_name, points)
+                    delivered += len(points)
+        logger.info(f"[+] Streamed {delivered} new datapoint(s) for {len(since)} instance(s) in {self.region}")
+        return delivered
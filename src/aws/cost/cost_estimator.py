@@ -7,11 +7,16 @@ from decimal import Decimal
 from typing import Dict, Any, List, Optional
 from src.core.logger import logger
 from src.aws.cloudwatch.metrics_collector import CloudWatchMetrics
+from src.core.aws_clients import get_session
+from src.aws.cost.pricing import InstancePricing
+from src.aws.cost.engine import FleetCostEngine
+from src.core.utils import generate_timestamp
 
 class EC2CostEstimator:
     def __init__(self, session=None):
-        self.session = session or boto3.Session()
-        self.pricing_client = self.session.client('pricing', region_name='us-east-1')
+        self.session = session or get_session()
+        self.pricing = InstancePricing(self.session)
+        self.cost_engine = FleetCostEngine()
         self.cache_file = "/app/data/cache/ec2_pricing_cache.json"
         self.instance_cost_cache = self._load_cache()
         self.cloudwatch = CloudWatchMetrics(session=self.session)
@@ -37,37 +42,16 @@ class EC2CostEstimator:
             logger.error(f"[!] Failed to save pricing cache: {e}")
 
     def _get_hourly_rate_from_api(self, instance_type: str, region: str) -> Decimal:
-        """Get real-time hourly rate from AWS Pricing API"""
-        try:
-            response = self.pricing_client.get_products(
-                ServiceCode="AmazonEC2",
-                Filters=[
-                    {"Type": "TERM_MATCH", "Field": "instanceType", "Value": instance_type},
-                    {"Type": "TERM_MATCH", "Field": "operatingSystem", "Value": "Linux"},
-                    {"Type": "TERM_MATCH", "Field": "tenancy", "Value": "shared"},
-                    {"Type": "TERM_MATCH", "Field": "preInstalledSw", "Value": "No"}
-                ],
-                MaxResults=1
-            )
-
-            if not response["PriceList"]:
-                logger.warning(f"[!] No pricing found for {instance_type}")
-                return Decimal("0.0")
-
-            product = json.loads(response["PriceList"][0])
-            terms = product.get("terms", {}).get("OnDemand", {})
-            price_per_unit = list(terms.values())[0]["priceDimensions"].values().__next__()["pricePerUnit"]
-
-            hourly_rate = Decimal(price_per_unit.get("USD", "0.0"))
-            cache_key = f"{region}:{instance_type}"
-            self.instance_cost_cache[cache_key] = float(hourly_rate)
-            self._save_cache()
-            return hourly_rate.quantize(Decimal("0.0000"))
-
-        except Exception as e:
-            logger.error(f"[!] Error fetching price for {instance_type}: {e}")
+        """Get hourly rate from the offline price index, or the AWS Pricing API"""
+        hourly_rate = self.pricing.get_on_demand_hourly_rate(instance_type, region)
+        if hourly_rate == 0:
             return Decimal("0.0")
 
+        cache_key = f"{region}:{instance_type}"
+        self.instance_cost_cache[cache_key] = float(hourly_rate)
+        self._save_cache()
+        return hourly_rate.quantize(Decimal("0.0000"))
+
     def _get_hourly_rate(self, instance_data: Dict[str, Any]) -> Decimal:
         """Get accurate hourly rate using AWS Pricing API"""
         instance_type = instance_data.get("InstanceType")
@@ -87,46 +71,38 @@ class EC2CostEstimator:
         - HourlyRate
         - DailyCostEstimate
         - WeeklyCostEstimate
-        - MonthlyCostEstimate
+        - MonthlyCostEstimate (hourly rate x 730 hours)
+        - MonthlyForecast (utilization-adjusted, plus network surcharge)
         - UptimeHours
         - Underutilized flag
         """
-        instance_id = instance_data.get("InstanceId")
-        instance_type = instance_data.get("InstanceType")
-        region = instance_data.get("Region", "us-east-1")
-
-        # Get hourly rate
-        hourly_rate = self._get_hourly_rate(instance_data)
-
-        # Ensure numeric comparison
-        cpu_utilization = instance_data.get("CPUUtilization", 0)
-        network_in = instance_data.get("NetworkIn", 0)
-        network_out = instance_data.get("NetworkOut", 0)
-
-        if isinstance(cpu_utilization, str):
-            try:
-                cpu_utilization = float(cpu_utilization)
-            except ValueError:
-                cpu_utilization = 0.0
-
-        daily_cost = hourly_rate * 24
-        weekly_cost = daily_cost * 7
-        monthly_cost = daily_cost * 30
-
-        underutilized = cpu_utilization < 10 and hourly_rate > Decimal("0.02")
-
-        result = {
-            "HourlyRate": float(hourly_rate),
-            "DailyCostEstimate": float(daily_cost),
-            "WeeklyCostEstimate": float(weekly_cost),
-            "MonthlyCostEstimate": float(monthly_cost),
-            "Underutilized": underutilized,
-            "timestamp": generate_timestamp(),
-            "instance_id": instance_id,
-            "region": region,
-            "network_in_bytes_sec": network_in,
-            "network_out_bytes_sec": network_out
-        }
-
-        logger.info(f"[+] Analyzed {instance_id} | CPU: {cpu_utilization:.2f}% | Monthly: ${monthly_cost:.2f}")
-        return {**instance_data, **result}
\ No newline at end of file
+        return self.get_fleet_costs([instance_data])[0]
+
+    def get_fleet_costs(self, instances: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Cost a whole batch of instances in one FleetCostEngine pass"""
+        hourly_rates = {}
+        for inst in instances:
+            key = (inst.get("Region") or "us-east-1", inst.get("InstanceType") or "")
+            if key not in hourly_rates:
+                hourly_rates[key] = self._get_hourly_rate(inst)
+
+        frame = self.cost_engine.to_frame(instances)
+        frame["Region"] = frame["Region"].fillna("").replace("", "us-east-1")
+        costs = self.cost_engine.compute(frame, hourly_rates)
+        timestamp = generate_timestamp()
+
+        # Write results back whole columns at a time
+        result_columns = ["HourlyRate", "DailyCostEstimate", "WeeklyCostEstimate", "MonthlyCostEstimate",
+                          "MonthlyForecast"]
+        updates = costs[result_columns].astype(float)
+        updates["Underutilized"] = costs["Underutilized"].astype(bool)
+        updates["timestamp"] = timestamp
+        updates["region"] = costs["Region"]
+        results = [{**instance_data, **update,
+                    "instance_id": instance_data.get("InstanceId"),
+                    "network_in_bytes_sec": instance_data.get("NetworkIn", 0),
+                    "network_out_bytes_sec": instance_data.get("NetworkOut", 0)}
+                   for instance_data, update in zip(instances, updates.to_dict("records"))]
+
+        logger.info(f"[+] Analyzed {len(results)} instance(s) | Monthly: ${costs['MonthlyCostEstimate'].sum():.2f}")
+        return results
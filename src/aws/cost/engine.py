@@ -0,0 +1,161 @@
+# src/aws/cost/engine.py
+
+"""
+engine.py
+
+Vectorized cost engine shared by every EC2 cost estimator.
+
+Takes the whole fleet as one columnar frame and computes hourly, daily,
+weekly and monthly costs, utilization factors, network surcharges and
+CostImpactRank in a single pass. Money is carried as int64 fixed-point
+(1e-8 USD) so results stay exact, and is rounded half-up to cents for
+anything that gets persisted.
+"""
+
+import logging
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_DAY = 24
+HOURS_PER_WEEK = 24 * 7
+HOURS_PER_MONTH = 730  # AWS billing convention (8760 / 12)
+
+UNDERUTILIZED_CPU_PERCENT = 10
+MIN_BILLABLE_RATE = Decimal("0.01")
+
+# (minimum average CPU %, share of the month the instance is expected to bill at full load)
+UTILIZATION_BANDS = ((75, 100), (25, 60), (0, 40))  # percent
+
+# $0.01 per 1000 units of average NetworkOut
+NETWORK_SURCHARGE_PER_UNIT = Decimal("0.00001")
+
+IMPACT_RANKS = ((Decimal("50"), "high"), (Decimal("10"), "medium"))
+
+_SCALE = 10 ** 8          # fixed-point units per USD
+_CENT = _SCALE // 100     # fixed-point units per cent
+
+COST_COLUMNS = (
+    "DailyCostEstimate", "WeeklyCostEstimate", "MonthlyCostEstimate",
+    "NetworkSurcharge", "WeeklyForecast", "MonthlyForecast"
+)
+
+RateKey = Tuple[str, str]
+
+def _to_fixed(value: Union[Decimal, float, str, None]) -> int:
+    """Convert a USD amount to exact fixed-point units"""
+    if value is None or value == "":
+        return 0
+    return int((Decimal(str(value)) * _SCALE).to_integral_value(ROUND_HALF_UP))
+
+def _round_cents(fixed: np.ndarray) -> np.ndarray:
+    """Round fixed-point amounts half-up (away from zero) to whole cents"""
+    return np.sign(fixed) * ((np.abs(fixed) + _CENT // 2) // _CENT)
+
+def cents_to_decimal(cents: int) -> Decimal:
+    return (Decimal(int(cents)) / 100).quantize(Decimal("0.01"))
+
+class FleetCostEngine:
+    def __init__(self, hours_per_month: int = HOURS_PER_MONTH):
+        self.hours_per_month = hours_per_month
+
+    @staticmethod
+    def to_frame(instances: Union[pd.DataFrame, List[Dict[str, Any]]]) -> pd.DataFrame:
+        """Build the columnar fleet frame from scan records"""
+        frame = instances if isinstance(instances, pd.DataFrame) else pd.DataFrame.from_records(instances)
+        for column in ("Region", "InstanceType"):
+            if column not in frame:
+                frame[column] = ""
+        if "CPUUtilization" not in frame:
+            frame["CPUUtilization"] = np.nan
+        if "NetworkOut" not in frame:
+            frame["NetworkOut"] = 0.0
+        return frame
+
+    def compute(self, instances: Union[pd.DataFrame, List[Dict[str, Any]]],
+                hourly_rates: Optional[Mapping[RateKey, Decimal]] = None) -> pd.DataFrame:
+        """
+        Return a copy of the fleet frame with cost columns added.
+
+        Hourly rates come from `hourly_rates` keyed by (region, instance type),
+        or from an existing HourlyRate column. Float columns are for analysis;
+        the matching *Cents int64 columns are exact and meant for persistence.
+        """
+        frame = self.to_frame(instances).copy()
+        n = len(frame)
+
+        # Convert each distinct rate to fixed point once, then broadcast
+        if hourly_rates is not None:
+            region_codes, regions = pd.factorize(frame["Region"].fillna(""))
+            type_codes, types = pd.factorize(frame["InstanceType"].fillna(""))
+            lookup = np.array(
+                [[_to_fixed(hourly_rates.get((region, instance_type))) for instance_type in types] for region in regions],
+                dtype=np.int64
+            ).reshape(len(regions), len(types))
+            rate_fixed = lookup[region_codes, type_codes]
+        elif "HourlyRate" in frame:
+            codes, uniques = pd.factorize(frame["HourlyRate"].astype(str))
+            lookup = np.array([_to_fixed(u) if u not in ("nan", "None") else 0 for u in uniques] or [0], dtype=np.int64)
+            rate_fixed = lookup[codes] if n else np.zeros(0, dtype=np.int64)
+        else:
+            rate_fixed = np.zeros(n, dtype=np.int64)
+
+        # Missing CPU (no CloudWatch data) is costed at full load and never counted as underutilized
+        cpu = pd.to_numeric(frame["CPUUtilization"], errors="coerce").to_numpy(dtype=np.float64)
+        cpu_known = ~np.isnan(cpu)
+        network_out = pd.to_numeric(frame["NetworkOut"], errors="coerce").fillna(0.0).to_numpy(dtype=np.float64)
+
+        factor_percent = np.select(
+            [~cpu_known] + [cpu >= floor for floor, _ in UTILIZATION_BANDS[:-1]],
+            [UTILIZATION_BANDS[0][1]] + [percent for _, percent in UTILIZATION_BANDS[:-1]],
+            default=UTILIZATION_BANDS[-1][1]
+        ).astype(np.int64)
+
+        daily = rate_fixed * HOURS_PER_DAY
+        weekly = rate_fixed * HOURS_PER_WEEK
+        monthly = rate_fixed * self.hours_per_month
+        surcharge = np.rint(network_out * float(NETWORK_SURCHARGE_PER_UNIT * _SCALE)).astype(np.int64)
+        weekly_forecast = (weekly * factor_percent + 50) // 100
+        monthly_forecast = (monthly * factor_percent + 50) // 100 + surcharge
+
+        fixed_columns = {
+            "DailyCostEstimate": daily,
+            "WeeklyCostEstimate": weekly,
+            "MonthlyCostEstimate": monthly,
+            "NetworkSurcharge": surcharge,
+            "WeeklyForecast": weekly_forecast,
+            "MonthlyForecast": monthly_forecast,
+        }
+
+        frame["HourlyRate"] = rate_fixed / _SCALE
+        frame["UtilizationFactor"] = factor_percent / 100
+        for column, values in fixed_columns.items():
+            cents = _round_cents(values)
+            frame[f"{column}Cents"] = cents
+            frame[column] = cents / 100
+
+        monthly_cents = frame["MonthlyForecastCents"].to_numpy()
+        frame["CostImpactRank"] = np.select(
+            [monthly_cents > int(threshold * 100) for threshold, _ in IMPACT_RANKS],
+            [rank for _, rank in IMPACT_RANKS],
+            default="low"
+        )
+        frame["Underutilized"] = cpu_known & (cpu < UNDERUTILIZED_CPU_PERCENT) & (rate_fixed > _to_fixed(MIN_BILLABLE_RATE))
+
+        logger.info(f"[+] Computed costs for {n} instance(s)")
+        return frame
+
+    @staticmethod
+    def to_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Materialize rows with exact Decimal cost values (cents) for storage"""
+        records = frame.drop(columns=[f"{c}Cents" for c in COST_COLUMNS]).to_dict("records")
+        cents = {c: frame[f"{c}Cents"].to_numpy() for c in COST_COLUMNS}
+        for i, record in enumerate(records):
+            record["HourlyRate"] = Decimal(str(record["HourlyRate"]))
+            record["Underutilized"] = bool(record["Underutilized"])
+            for column in COST_COLUMNS:
+                record[column] = cents_to_decimal(cents[column][i])
+        return records
@@ -6,14 +6,19 @@ from datetime import datetime
 from decimal import Decimal
 from typing import Dict, Any, List, Optional, Union, Tuple, TypeVar
 from src.aws.cost.explorer import CostExplorerAPI
+from src.aws.cost.pricing import InstancePricing
+from src.aws.cost.engine import FleetCostEngine, cents_to_decimal
+from src.core.aws_clients import get_session
 from src.core.db_handler import PostgresHandler
 
 logger = logging.getLogger(__name__)
 
 class CostEstimator:
     def __init__(self, session=None):
-        self.session = session or boto3.Session()
+        self.session = session or get_session()
         self.cost_explorer = CostExplorerAPI(self.session)
+        self.pricing = InstancePricing(self.session)
+        self.cost_engine = FleetCostEngine()
         self.db_handler = PostgresHandler()
 
     def estimate_instance_cost(self, instance_id: str, region: str = "us-east-1") -> Dict[str, Any]:
@@ -37,7 +42,7 @@ class CostEstimator:
         """
         try:
             from src.aws.ec2.scanner import EC2Scanner
-            scanner = EC2Scanner(region)
+            scanner = EC2Scanner(region, session=self.session)
             instance_data = scanner.scan_instances()[0]
 
             hourly_rate = self._get_hourly_rate(instance_data)
@@ -68,54 +73,28 @@ class CostEstimator:
         """Get accurate hourly rate using AWS Pricing API"""
         instance_type = instance_data.get("InstanceType")
         region = instance_data.get("Region", "us-east-1")
-
-        from src.aws.cost.pricing import InstancePricing
-        ip = InstancePricing(boto3.Session())
-        return ip.get_on_demand_hourly_rate(instance_type, region)
+        return self.pricing.get_on_demand_hourly_rate(instance_type, region)
 
     def _get_today_cost(self, instance_data: Dict[str, Any]) -> Decimal:
         """Use Cost Explorer to get today's actual cost"""
         instance_id = instance_data.get("InstanceId")
         return self.cost_explorer.get_daily_cost_per_instance([instance_id]).get(instance_id, Decimal(0))
 
+    def _forecast(self, instance_data: Dict[str, Any], hourly_rate: Decimal):
+        """Run the shared cost engine for one instance"""
+        row = {**instance_data, "HourlyRate": hourly_rate}
+        return self.cost_engine.compute([row]).iloc[0]
+
     def _forecast_weekly_cost(self, instance_data: Dict[str, Any], hourly_rate: Decimal) -> Decimal:
         """Forecast weekly cost based on CPU utilization"""
-        avg_cpu = instance_data.get("CPUUtilization", 0)
-        utilization_factor = 1.0 if avg_cpu >= 75 else 0.6 if avg_cpu >= 25 else 0.4
-        weekly_cost = hourly_rate * 24 * 7 * utilization_factor
-        return weekly_cost.quantize(Decimal("0.00"))
+        return cents_to_decimal(self._forecast(instance_data, hourly_rate)["WeeklyForecastCents"])
 
     def _forecast_monthly_cost(self, instance_data: Dict[str, Any], hourly_rate: Decimal) -> Decimal:
         """Monthly forecast based on CPU and network activity"""
-        avg_cpu = instance_data.get("CPUUtilization", 0)
-        network_out = instance_data.get("NetworkOut", 0)
-
-        utilization_factor = 1.0 if avg_cpu >= 75 else 0.6 if avg_cpu >= 25 else 0.4
-        network_surcharge = Decimal(0.01) * (network_out / 1000)  # $0.01 per GB over 1TB/month
-
-        base_monthly = hourly_rate * 24 * 30
-        final_monthly = base_monthly * utilization_factor + network_surcharge
-        return final_monthly.quantize(Decimal("0.00"))
+        return cents_to_decimal(self._forecast(instance_data, hourly_rate)["MonthlyForecastCents"])
 
-    def _store_cost_data(self, cost_data: Dict[str, Any]):
-        """Save cost data into PostgreSQL"""
-        insert_sql = """
-            INSERT INTO ec2_costs (
-                instance_id, region, today_cost, weekly_forecast, monthly_forecast, underutilized
-            ) VALUES (%s, %s, %s, %s, %s, %s);
-        """
-        try:
-            values = (
-                cost_data["instance_id"],
-                cost_data["region"],
-                cost_data["today_cost"],
-                cost_data["weekly_forecast"],
-                cost_data["monthly_forecast"],
-                cost_data["underutilized"]
-            )
-            self.db_handler.cur.execute(insert_sql, values)
-            self.db_handler.conn.commit()
-            logger.info(f"[+] Stored cost data for {cost_data['instance_id']}")
-        except Exception as e:
-            logger.error(f"[!] Failed to store cost data: {e}")
-            self.db_handler.conn.rollback()
\ No newline at end of file
+    def _store_cost_data(self, cost_data: Union[Dict[str, Any], List[Dict[str, Any]]]):
+        """Save one or many cost estimates into PostgreSQL with a single bulk COPY"""
+        rows = [cost_data] if isinstance(cost_data, dict) else cost_data
+        if self.db_handler.bulk_save_ec2_costs(rows):
+            logger.info(f"[+] Stored cost data for {len(rows)} instance(s)")
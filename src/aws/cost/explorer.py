@@ -5,16 +5,18 @@ from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import Dict, Any, List, Optional, Union, Tuple, TypeVar
 from src.core.logger import setup_logger
+from src.core.aws_clients import get_client, get_session
+from src.core.rate_limiter import is_throttled
 
 logger = setup_logger(__name__)
 
 class CostExplorerAPI:
     def __init__(self, session=None):
-        self.session = session or boto3.Session()
-        self.ce_client = self.session.client("ce", region_name="us-east-1")
+        self.session = session or get_session()
+        self.ce_client = get_client("ce", "us-east-1", self.session)
 
     def get_daily_cost_per_instance(self, instance_ids: List[str], days: int = 7) -> Dict[str, Decimal]:
-        """Get daily unblended cost per instance using AWS Cost Explorer"""
+        """Get daily unblended cost per instance using AWS Cost Explorer; throttling errors are raised"""
         try:
             start_date = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")
             end_date = datetime.utcnow().strftime("%Y-%m-%d")
@@ -48,5 +50,8 @@ class CostExplorerAPI:
             return cost_data
 
         except Exception as e:
+            if is_throttled(e):
+                logger.error(f"[!] Cost Explorer throttled: {e}")
+                raise
             logger.error(f"[!] Cost Explorer API error: {e}")
             return {}
\ No newline at end of file
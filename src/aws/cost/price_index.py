@@ -0,0 +1,263 @@
+# src/aws/cost/price_index.py
+
+"""
+Offline EC2 on-demand price index.
+
+Imports AWS bulk price-list offer files (the AmazonEC2 offer in JSON or CSV
+format) dropped into OFFER_DIR and stores one row per
+(region, instance type, OS, tenancy, capacity status) in a local SQLite file,
+so rate lookups need no Pricing API call. Use per-region offer files
+(.../AmazonEC2/current/<region>/index.json|csv): the CSV variant is streamed
+row by row, the JSON variant is loaded whole.
+"""
+
+import os
+import csv
+import json
+import time
+import sqlite3
+import logging
+import threading
+from decimal import Decimal
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+OFFER_DIR = os.getenv("EC2_OFFER_DIR", "/app/data/pricing/")
+INDEX_PATH = os.getenv("EC2_PRICE_INDEX", "/app/data/cache/ec2_price_index.sqlite")
+CHECK_INTERVAL = float(os.getenv("EC2_PRICE_INDEX_CHECK_INTERVAL", "60"))  # seconds between OFFER_DIR checks
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS on_demand_prices (
+        region TEXT NOT NULL,
+        instance_type TEXT NOT NULL,
+        operating_system TEXT NOT NULL,
+        tenancy TEXT NOT NULL,
+        capacity_status TEXT NOT NULL,
+        price_per_hour TEXT NOT NULL,
+        source TEXT NOT NULL,
+        PRIMARY KEY (region, instance_type, operating_system, tenancy, capacity_status)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS offer_files (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime REAL NOT NULL,
+        publication_date TEXT,
+        row_count INTEGER NOT NULL
+    );
+"""
+
+PriceKey = Tuple[str, str, str, str, str]
+
+def _key(region: str, instance_type: str, operating_system: str, tenancy: str, capacity_status: str) -> PriceKey:
+    """Normalize lookup keys; the Pricing API matches terms case-insensitively"""
+    return (region.lower(), instance_type.lower(), operating_system.lower(), tenancy.lower(), capacity_status.lower())
+
+def _is_plain_compute(product_family: str, pre_installed_sw: str, license_model: str) -> bool:
+    """Keep plain instances: no SQL Server images, no BYOL licensing"""
+    return (product_family == "Compute Instance"
+            and pre_installed_sw in ("NA", "")
+            and license_model != "Bring your own license")
+
+def _iter_json_offer(path: str) -> Iterator[Tuple[PriceKey, str]]:
+    with open(path, "r") as f:
+        offer = json.load(f)
+
+    on_demand = offer.get("terms", {}).get("OnDemand", {})
+    for sku, product in offer.get("products", {}).items():
+        attrs = product.get("attributes", {})
+        if not _is_plain_compute(product.get("productFamily", ""), attrs.get("preInstalledSw", "NA"),
+                                 attrs.get("licenseModel", "")):
+            continue
+        for term in on_demand.get(sku, {}).values():
+            for dimension in term.get("priceDimensions", {}).values():
+                if dimension.get("unit") != "Hrs":
+                    continue
+                yield (_key(attrs.get("regionCode", ""), attrs.get("instanceType", ""),
+                            attrs.get("operatingSystem", ""), attrs.get("tenancy", ""),
+                            attrs.get("capacitystatus", "Used")),
+                       dimension["pricePerUnit"]["USD"])
+
+def _iter_csv_offer(path: str) -> Iterator[Tuple[PriceKey, str]]:
+    with open(path, "r", newline="") as f:
+        # Offer CSVs start with metadata lines (FormatVersion, Disclaimer, Publication Date, ...)
+        reader = csv.reader(f)
+        for row in reader:
+            if row and row[0] == "SKU":
+                header = {name: i for i, name in enumerate(row)}
+                break
+        else:
+            return
+
+        def col(row, name, default=""):
+            i = header.get(name)
+            return row[i] if i is not None and i < len(row) else default
+
+        for row in reader:
+            if col(row, "TermType") != "OnDemand" or col(row, "Unit") != "Hrs" or col(row, "Currency") != "USD":
+                continue
+            if not _is_plain_compute(col(row, "Product Family"), col(row, "Pre Installed S/W", "NA"),
+                                     col(row, "License Model")):
+                continue
+            yield (_key(col(row, "Region Code"), col(row, "Instance Type"), col(row, "Operating System"),
+                        col(row, "Tenancy"), col(row, "Capacity Status", "Used")),
+                   col(row, "PricePerUnit"))
+
+def _offer_files(offer_dir: str) -> Iterator[str]:
+    for root, _, files in os.walk(offer_dir):
+        for filename in sorted(files):
+            if filename.endswith((".json", ".csv")):
+                yield os.path.join(root, filename)
+
+def offer_signature(offer_dir: str = OFFER_DIR) -> Tuple:
+    """(path, size, mtime) of every offer file; changes when one is added, replaced or removed"""
+    if not os.path.isdir(offer_dir):
+        return ()
+    entries = []
+    for path in _offer_files(offer_dir):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((path, stat.st_size, stat.st_mtime))
+    return tuple(entries)
+
+def _publication_date(path: str) -> Optional[str]:
+    """Read the publication date from an offer file header without parsing it all"""
+    try:
+        with open(path, "r") as f:
+            head = f.read(4096)
+        if path.endswith(".csv"):
+            for row in csv.reader(head.splitlines()):
+                if row and row[0] == "Publication Date":
+                    return row[1]
+        else:
+            marker = '"publicationDate"'
+            start = head.find(marker)
+            if start != -1:
+                return head[start:].split('"')[3]
+    except Exception as e:
+        logger.debug(f"[!] Could not read publication date from {path}: {e}")
+    return None
+
+class EC2PriceIndex:
+    def __init__(self, index_path: str = INDEX_PATH):
+        self.index_path = index_path
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(index_path, check_same_thread=False)
+        self._conn.executescript(SCHEMA_SQL)
+        self._memo: Dict[PriceKey, Optional[Decimal]] = {}
+
+    def import_offer_file(self, path: str) -> int:
+        """Replace all prices sourced from `path` with its current content"""
+        iterator = _iter_csv_offer(path) if path.endswith(".csv") else _iter_json_offer(path)
+        stat = os.stat(path)
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM on_demand_prices WHERE source = ?", (path,))
+            count = 0
+            for key, price in iterator:
+                # Skip zero-priced rows (e.g. the AllocatedCapacityReservation capacity status)
+                if not key[0] or not key[1] or Decimal(price) == 0:
+                    continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO on_demand_prices VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (*key, price, path)
+                )
+                count += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO offer_files VALUES (?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime, _publication_date(path), count)
+            )
+            self._memo.clear()
+
+        logger.info(f"[+] Indexed {count} on-demand prices from {path}")
+        return count
+
+    def refresh(self, offer_dir: str = OFFER_DIR) -> int:
+        """Import new or changed offer files and drop prices of removed ones"""
+        if not os.path.isdir(offer_dir):
+            return 0
+
+        with self._lock:
+            known = {row[0]: (row[1], row[2]) for row in self._conn.execute("SELECT path, size, mtime FROM offer_files")}
+
+        seen = set()
+        imported = 0
+        for path in _offer_files(offer_dir):
+            seen.add(path)
+            stat = os.stat(path)
+            if known.get(path) == (stat.st_size, stat.st_mtime):
+                continue
+            try:
+                self.import_offer_file(path)
+                imported += 1
+            except Exception as e:
+                logger.error(f"[!] Failed to import offer file {path}: {e}")
+
+        removed = [path for path in known if path not in seen]
+        if removed:
+            with self._lock, self._conn:
+                for path in removed:
+                    self._conn.execute("DELETE FROM on_demand_prices WHERE source = ?", (path,))
+                    self._conn.execute("DELETE FROM offer_files WHERE path = ?", (path,))
+                self._memo.clear()
+            logger.info(f"[+] Dropped prices from {len(removed)} removed offer file(s)")
+
+        return imported
+
+    def clear_memo(self):
+        """Forget memoized lookups, e.g. after another process updated the index file"""
+        with self._lock:
+            self._memo.clear()
+
+    def get_on_demand_rate(self, region: str, instance_type: str, operating_system: str = "Linux",
+                           tenancy: str = "Shared", capacity_status: str = "Used") -> Optional[Decimal]:
+        """Hourly on-demand USD rate, or None if the index has no matching entry"""
+        key = _key(region, instance_type, operating_system, tenancy, capacity_status)
+        if key in self._memo:
+            return self._memo[key]
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT price_per_hour FROM on_demand_prices WHERE region = ? AND instance_type = ? "
+                "AND operating_system = ? AND tenancy = ? AND capacity_status = ?",
+                key
+            ).fetchone()
+
+        rate = Decimal(row[0]) if row else None
+        self._memo[key] = rate
+        return rate
+
+_shared_index = None
+_shared_signature: Optional[Tuple] = None
+_shared_checked_at = 0.0
+_shared_lock = threading.Lock()
+
+def get_price_index() -> Optional[EC2PriceIndex]:
+    """
+    Shared index; None if unavailable.
+
+    OFFER_DIR is checked at most every CHECK_INTERVAL seconds, and the index
+    is refreshed whenever an offer file was added, replaced or removed, so a
+    long-running process picks up new offer files without a restart.
+    """
+    global _shared_index, _shared_signature, _shared_checked_at
+    with _shared_lock:
+        now = time.monotonic()
+        if _shared_signature is not None and now - _shared_checked_at < CHECK_INTERVAL:
+            return _shared_index
+        _shared_checked_at = now
+        signature = offer_signature(OFFER_DIR)
+        if signature == _shared_signature:
+            return _shared_index
+        try:
+            index = _shared_index or EC2PriceIndex(INDEX_PATH)
+            index.refresh(OFFER_DIR)
+            index.clear_memo()
+            _shared_index = index
+        except Exception as e:
+            logger.warning(f"[!] Offline price index unavailable: {e}")
+        _shared_signature = signature  # a failed refresh is retried once the offer files change
+        return _shared_index
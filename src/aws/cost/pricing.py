@@ -1,17 +1,26 @@
 # src/aws/cost/pricing.py
 
+import json
 import boto3
 import logging
 from decimal import Decimal
 from typing import Optional
 from typing import Dict, Any, List, Optional, Union, Tuple, TypeVar
+from src.core.aws_clients import get_client, get_session
+from src.core.rate_limiter import is_throttled
+from src.aws.cost.price_index import get_price_index
 
 logger = logging.getLogger(__name__)
 
 class InstancePricing:
     def __init__(self, session=None):
-        self.session = session or boto3.Session()
-        self.pricing_client = self.session.client('pricing', region_name='us-east-1')  # Global endpoint
+        self.session = session or get_session()
+        self.pricing_client = get_client('pricing', 'us-east-1', self.session)  # Global endpoint
+
+    @property
+    def price_index(self):
+        # Looked up per call, so a warm estimator sees offer files dropped after it was created
+        return get_price_index()
 
     def _parse_price(self, price_string: str) -> Decimal:
         """Convert AWS price string to numeric value"""
@@ -24,14 +33,25 @@ class InstancePricing:
     def get_on_demand_hourly_rate(self, instance_type: str, region: str = "us-east-1") -> Decimal:
         """
         Get hourly on-demand rate for EC2 instance
-        
+
+        Served from the offline price index when it has the entry; falls
+        back to the Pricing API otherwise.
+
         Args:
         - instance_type: e.g., 't3.micro'
         - region: AWS region name
         
         Returns:
         - Hourly rate in USD (Decimal)
+
+        Raises the underlying error when the Pricing API is throttled or its
+        circuit is open, rather than reporting a $0 rate.
         """
+        if self.price_index:
+            hourly_rate = self.price_index.get_on_demand_rate(region, instance_type)
+            if hourly_rate is not None:
+                return hourly_rate
+
         try:
             logger.info(f"[+] Fetching pricing for {instance_type} in {region}")
 
@@ -39,9 +59,11 @@ class InstancePricing:
                 ServiceCode="AmazonEC2",
                 Filters=[
                     {'Type': 'TERM_MATCH', 'Field': 'instanceType', 'Value': instance_type},
+                    {'Type': 'TERM_MATCH', 'Field': 'regionCode', 'Value': region},
                     {'Type': 'TERM_MATCH', 'Field': 'operatingSystem', 'Value': 'Linux'},
                     {'Type': 'TERM_MATCH', 'Field': 'tenancy', 'Value': 'shared'},
-                    {'Type': 'TERM_MATCH', 'Field': 'preInstalledSw', 'Value': 'No'}
+                    {'Type': 'TERM_MATCH', 'Field': 'capacitystatus', 'Value': 'Used'},
+                    {'Type': 'TERM_MATCH', 'Field': 'preInstalledSw', 'Value': 'NA'}
                 ],
                 MaxResults=1
             )
@@ -59,5 +81,8 @@ class InstancePricing:
             return hourly_rate
 
         except Exception as e:
+            if is_throttled(e):
+                logger.error(f"[!] Pricing API throttled for {instance_type} in {region}: {e}")
+                raise
             logger.error(f"[!] Pricing fetch failed: {e}")
             return Decimal(0)
\ No newline at end of file
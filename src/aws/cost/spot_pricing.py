@@ -0,0 +1,109 @@
+# src/aws/cost/spot_pricing.py
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+from src.core.aws_clients import get_client, get_session
+from src.core.rate_limiter import is_throttled
+
+logger = logging.getLogger(__name__)
+
+SPOT_PRICE_TTL = int(os.getenv("SPOT_PRICE_TTL", "900"))  # seconds
+TYPES_PER_REQUEST = 50
+
+class SpotPriceService:
+    """
+    Region-batched, memoized spot price lookups.
+
+    prefetch() pulls the current spot price of every requested instance type
+    across all availability zones of a region in paginated bulk requests;
+    results are kept per (region, instance type) for `ttl` seconds.
+    """
+
+    def __init__(self, session=None, ttl: int = SPOT_PRICE_TTL, product_description: str = "Linux/UNIX"):
+        self.session = session or get_session()
+        self.ttl = ttl
+        self.product_description = product_description
+        self._lock = threading.Lock()
+        self._cache: Dict[Tuple[str, str], Tuple[float, Optional[Dict[str, Decimal]]]] = {}
+
+    def _is_fresh(self, key: Tuple[str, str], now: float) -> bool:
+        entry = self._cache.get(key)
+        return entry is not None and entry[0] > now
+
+    def prefetch(self, region: str, instance_types: Iterable[str]):
+        """Fetch current spot prices for all types not already cached for this region"""
+        now = time.time()
+        with self._lock:
+            missing = sorted({t for t in instance_types if not self._is_fresh((region, t), now)})
+        if not missing:
+            return
+
+        ec2 = get_client("ec2", region, self.session)
+        paginator = ec2.get_paginator("describe_spot_price_history")
+        priced = 0
+        for offset in range(0, len(missing), TYPES_PER_REQUEST):
+            chunk = missing[offset:offset + TYPES_PER_REQUEST]
+            latest: Dict[Tuple[str, str], Tuple[datetime, Decimal]] = {}
+            try:
+                # StartTime=now returns the price currently in effect in each AZ
+                pages = paginator.paginate(
+                    InstanceTypes=chunk,
+                    ProductDescriptions=[self.product_description],
+                    StartTime=datetime.utcnow()
+                )
+                for page in pages:
+                    for entry in page.get("SpotPriceHistory", []):
+                        key = (entry["InstanceType"], entry["AvailabilityZone"])
+                        if key not in latest or entry["Timestamp"] > latest[key][0]:
+                            latest[key] = (entry["Timestamp"], Decimal(entry["SpotPrice"]))
+            except Exception as e:
+                if is_throttled(e):
+                    # Not a missing offer: caching it would silently price the region on-demand until the TTL expires
+                    logger.warning(f"[!] Spot price lookup throttled in {region}: {e}")
+                    raise
+                # Remember the miss too, so callers fall back to on-demand instead of retrying per instance
+                logger.warning(f"[!] Spot pricing not available in {region} for {len(chunk)} instance type(s): {e}")
+                latest = {}
+            # Memoize each chunk as it arrives, so a later failure keeps what was already fetched
+            priced += self._store(region, chunk, latest)
+
+        logger.info(f"[+] Fetched spot prices for {priced}/{len(missing)} instance type(s) in {region}")
+
+    def _store(self, region: str, instance_types: List[str],
+               latest: Dict[Tuple[str, str], Tuple[datetime, Decimal]]) -> int:
+        """Cache per-type price stats across AZs; types without an offer are cached as None"""
+        by_type: Dict[str, List[Decimal]] = {}
+        for (instance_type, _), (_, price) in latest.items():
+            by_type.setdefault(instance_type, []).append(price)
+
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            for instance_type in instance_types:
+                prices = by_type.get(instance_type)
+                stats = None
+                if prices:
+                    stats = {
+                        "min": min(prices),
+                        "avg": (sum(prices) / len(prices)).quantize(Decimal("0.000001")),
+                        "zones": Decimal(len(prices))
+                    }
+                self._cache[(region, instance_type)] = (expires_at, stats)
+        return len(by_type)
+
+    def get_price_stats(self, region: str, instance_type: str) -> Optional[Dict[str, Decimal]]:
+        """Return {"min", "avg", "zones"} across AZs, or None when the type has no spot offer"""
+        key = (region, instance_type)
+        if not self._is_fresh(key, time.time()):
+            self.prefetch(region, [instance_type])
+        entry = self._cache.get(key)
+        return entry[1] if entry else None
+
+    def get_spot_hourly_rate(self, region: str, instance_type: str, statistic: str = "avg") -> Decimal:
+        """Spot hourly rate across AZs (average by default), Decimal(0) if unavailable"""
+        stats = self.get_price_stats(region, instance_type)
+        return stats[statistic] if stats else Decimal(0)
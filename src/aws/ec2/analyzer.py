@@ -1,33 +1,57 @@
 # src/aws/ec2/analyzer.py
 
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
 from src.aws.cloudwatch.metrics_collector import CloudWatchMetrics
 from src.core.logger import logger
+from src.core.aws_clients import get_session
 from decimal import Decimal
 
 class EC2Analyzer:
     def __init__(self, session=None):
-        self.session = session or boto3.Session()
+        self.session = session or get_session()
 
-    def analyze_instance(self, instance_data: dict) -> dict:
-        """Add metrics to instance data using CloudWatch"""
+    def analyze_instance(self, instance_data: dict, metrics: Optional[Dict[str, float]] = None) -> dict:
+        """
+        Add metrics to instance data using CloudWatch
+
+        If `metrics` was already fetched in bulk (see analyze_instances),
+        no CloudWatch call is made. Metrics without datapoints stay None and
+        such instances are never reported as underutilized.
+        """
         instance_id = instance_data.get("InstanceId")
         region = instance_data.get("Region", "us-east-1")
 
-        cw = CloudWatchMetrics(self.session, region)
-
-        cpu_utilization = cw.get_cpu_utilization(instance_id)
-        network = cw.get_network_io(instance_id)
+        if metrics is None:
+            cw = CloudWatchMetrics(self.session, region)
+            metrics = cw.get_fleet_metrics([instance_id])[instance_id]
 
-        network_in = network.get("network_in_bytes", 0.0)
-        network_out = network.get("network_out_bytes", 0.0)
+        cpu_utilization = metrics.get("CPUUtilization")
+        network_in = metrics.get("NetworkIn")
+        network_out = metrics.get("NetworkOut")
 
         analyzed = {
             **instance_data,
             "CPUUtilization": cpu_utilization,
             "NetworkIn": network_in,
             "NetworkOut": network_out,
-            "Underutilized": cpu_utilization < 10 and network_in < 100000
+            "Underutilized": cpu_utilization is not None and network_in is not None
+                             and cpu_utilization < 10 and network_in < 100000
         }
 
-        logger.info(f"[+] Analyzed {instance_id} | CPU: {cpu_utilization:.2f}% | Monthly: ${analyzed.get('MonthlyCostEstimate', 0):.2f}")
-        return analyzed
\ No newline at end of file
+        cpu_text = f"{cpu_utilization:.2f}%" if cpu_utilization is not None else "no data"
+        logger.info(f"[+] Analyzed {instance_id} | CPU: {cpu_text} | Monthly: ${analyzed.get('MonthlyCostEstimate', 0):.2f}")
+        return analyzed
+
+    def analyze_instances(self, instances: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Analyze a whole batch with one GetMetricData sweep per region"""
+        by_region = defaultdict(list)
+        for inst in instances:
+            by_region[inst.get("Region", "us-east-1")].append(inst["InstanceId"])
+
+        fleet_metrics = {}
+        for region, instance_ids in by_region.items():
+            cw = CloudWatchMetrics(self.session, region)
+            fleet_metrics.update(cw.get_fleet_metrics(instance_ids))
+
+        return [self.analyze_instance(inst, fleet_metrics.get(inst["InstanceId"], {})) for inst in instances]
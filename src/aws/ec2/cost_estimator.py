@@ -4,7 +4,7 @@
 cost_estimator.py
 
 Enterprise-grade cost estimation engine for EC2 instances.
-Uses AWS Pricing API to fetch accurate hourly rates and determines if underutilized based on metrics.
+Uses the offline price index (or AWS Pricing API) to fetch accurate hourly rates and determines if underutilized based on metrics.
 
 Key Features:
 - Dynamic region + instance-type pricing lookup
@@ -18,12 +18,18 @@ import json
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional, Union, Tuple, TypeVar
 import boto3
+import pandas as pd
 import logging
 import decimal
 from decimal import Decimal
 from src.core.logger import setup_logger
 from src.aws.cloudwatch.metrics_collector import CloudWatchMetrics
+from src.aws.cost.pricing import InstancePricing
+from src.aws.cost.spot_pricing import SpotPriceService
+from src.aws.cost.engine import FleetCostEngine, cents_to_decimal
 from src.core.utils import save_json
+from src.core.aws_clients import get_client, get_session
+from src.core.rate_limiter import is_throttled
 
 logger = logging.getLogger(__name__)
 OUTPUT_DIR = "/app/data/output/ec2/"
@@ -34,69 +40,38 @@ decimal.getcontext().prec = 10
 def generate_timestamp():
     return datetime.utcnow().isoformat()
 
+def _cents_to_decimals(cents: pd.Series) -> List[Decimal]:
+    """Whole-cent column as Decimals, converting each distinct amount once"""
+    codes, uniques = pd.factorize(cents)
+    amounts = [cents_to_decimal(value) for value in uniques]
+    return [amounts[code] for code in codes]
+
 class EC2CostEstimator:
-    def __init__(self, session: boto3.Session):
-        self.session = session
-        self.pricing_client = session.client('pricing', region_name='us-east-1')  # Global endpoint
-        self.costexplorer_client = session.client('ce', region_name='us-east-1')
-        self.ec2_client = session.client('ec2', region_name=session.region_name)
+    def __init__(self, session: Optional[boto3.Session] = None):
+        self.session = session or get_session()
+        self.pricing = InstancePricing(self.session)
+        self.spot_prices = SpotPriceService(self.session)
+        self.cost_engine = FleetCostEngine()
+        self.costexplorer_client = get_client('ce', 'us-east-1', self.session)
+        self.ec2_client = get_client('ec2', self.session.region_name, self.session)
 
     def _get_on_demand_hourly_rate(self, instance_type: str, region: str) -> Decimal:
-        """Fetches on-demand hourly rate from AWS Pricing API"""
-        try:
-            response = self.pricing_client.get_products(
-                ServiceCode="AmazonEC2",
-                Filters=[
-                    {'Type': 'TERM_MATCH', 'Field': 'instanceType', 'Value': instance_type},
-                    {'Type': 'TERM_MATCH', 'Field': 'operatingSystem', 'Value': 'Linux'},
-                    {'Type': 'TERM_MATCH', 'Field': 'tenancy', 'Value': 'shared'},
-                    {'Type': 'TERM_MATCH', 'Field': 'capacitystatus', 'Value': 'Used'}
-                ],
-                MaxResults=1
-            )
-
-            if response['PriceList']:
-                price_data = json.loads(response['PriceList'][0])
-                hourly_cost = Decimal(price_data['terms']['OnDemand'].popitem()[1]['priceDimensions'].popitem()[1]['pricePerUnit']['USD'])
-                logger.info(f"[+] Fetched on-demand rate for {instance_type} in {region}: ${hourly_cost}/hr")
-                return hourly_cost
-            else:
-                logger.warning(f"[!] No pricing data found for {instance_type}")
-                return Decimal(0)
-        except Exception as e:
-            logger.error(f"[!] Error fetching pricing for {instance_type}: {e}")
-            return Decimal(0)
+        """Fetches on-demand hourly rate from the offline price index, or the Pricing API"""
+        return self.pricing.get_on_demand_hourly_rate(instance_type, region)
 
     def _get_spot_hourly_rate(self, instance_type: str, region: str) -> Decimal:
-        """Fetches current spot price from CloudWatch"""
-        try:
-            ec2_regional = self.session.client('ec2', region_name=region)
-            response = ec2_regional.describe_spot_price_history(
-                InstanceTypes=[instance_type],
-                ProductDescriptions=["Linux/UNIX"],
-                MaxResults=1
-            )
-            if response['SpotPriceHistory']:
-                logger.info(f"[+] Fetched spot rate for {instance_type} in {region}: ${response['SpotPriceHistory'][0]['SpotPrice']}/hr")
-                return Decimal(response['SpotPriceHistory'][0]['SpotPrice'])
-            else:
-                return Decimal(0)
-        except Exception as e:
-            logger.warning(f"[!] Spot pricing not available for {instance_type} in {region}: {e}")
-            return Decimal(0)
+        """Average current spot price across the region's AZs (memoized per region and type)"""
+        return self.spot_prices.get_spot_hourly_rate(region, instance_type)
 
-    def estimate_monthly_cost_from_metrics(self, instance_id: str, avg_cpu: float, hourly_rate: Decimal) -> Decimal:
+    def estimate_monthly_cost_from_metrics(self, instance_id: str, avg_cpu: Optional[float], hourly_rate: Decimal) -> Decimal:
         """
         Estimate monthly cost using average CPU utilization and known hourly rate.
-        Assumes ~730 hours/month for simplification.
+        Uses the shared FleetCostEngine formula (730 hours/month, utilization bands).
         """
         try:
-            # Heuristic: If CPU < 10%, suggest downsizing
-            if avg_cpu < 10:
-                logger.warning(f"[!] Low CPU Utilization: {avg_cpu}% for {instance_id}")
-                return hourly_rate * Decimal(730) * Decimal(0.5)  # Assume 50% usage
-            else:
-                return hourly_rate * Decimal(730)
+            frame = self.cost_engine.compute([{"InstanceId": instance_id, "CPUUtilization": avg_cpu,
+                                               "HourlyRate": hourly_rate}])
+            return cents_to_decimal(frame["MonthlyForecastCents"].iloc[0])
         except Exception as e:
             logger.error(f"[!] Error calculating cost for {instance_id}: {e}")
             return Decimal(0)
@@ -105,44 +80,85 @@ class EC2CostEstimator:
         """
         Main method to enrich scanned EC2 instances with cost data
         """
-        result = []
-        cw_clients = {}
+        return self.price_instances(self.enrich_cpu(instances))
+
+    def enrich_cpu(self, instances: List[Dict[str, Any]], session: Optional[boto3.Session] = None) -> List[Dict[str, Any]]:
+        """
+        Set CPUUtilization on each instance, one GetMetricData sweep per region;
+        None when CloudWatch has no data. `session` holds the credentials of the
+        instances' account when it is not the default one.
+        """
+        ids_by_region = {}
+        for inst in instances:
+            if "Region" in inst and "InstanceId" in inst:
+                ids_by_region.setdefault(inst["Region"], []).append(inst["InstanceId"])
+
+        fleet_metrics = {}
+        for region, instance_ids in ids_by_region.items():
+            cloudwatch_agent = CloudWatchMetrics(session or self.session, region)
+            fleet_metrics.update(cloudwatch_agent.get_fleet_metrics(instance_ids, ("CPUUtilization",)))
 
         for inst in instances:
-            try:
-                region = inst["Region"]
-                instance_type = inst["InstanceType"]
-                instance_id = inst["InstanceId"]
+            cpu = fleet_metrics.get(inst.get("InstanceId"), {}).get("CPUUtilization")
+            inst["CPUUtilization"] = round(cpu, 2) if cpu is not None else None
+        return instances
 
-                # Get CloudWatch client per region
-                if region not in cw_clients:
-                    cw_clients[region] = CloudWatchMetrics(self.session, region)
+    def price_instances(self, instances: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Add hourly rate, monthly estimate, underutilization and cost rank to CPU-enriched instances.
+
+        An instance whose rate cannot be looked up stays in the batch at a zero
+        rate (never flagged as underutilized) with the reason in PricingError.
+        """
+        # One bulk spot price request per region for every type in the batch
+        types_by_region = {}
+        for inst in instances:
+            if "Region" in inst and "InstanceType" in inst:
+                types_by_region.setdefault(inst["Region"], set()).add(inst["InstanceType"])
+        for region, instance_types in types_by_region.items():
+            self.spot_prices.prefetch(region, instance_types)
 
-                # Get CPU utilization from CloudWatch
-                cloudwatch_agent = cw_clients[region]
-                cpu_utilization = cloudwatch_agent.get_cpu_utilization(instance_id) or 0
+        hourly_rates = {}
+        pricing_errors = {}
 
-                # Try spot first, then fall back to on-demand
+        for inst in instances:
+            key = (inst.get("Region"), inst.get("InstanceType"))
+            # Try spot first, then fall back to on-demand; one lookup per (region, type)
+            if key in hourly_rates or key in pricing_errors:
+                continue
+            try:
+                region, instance_type = inst["Region"], inst["InstanceType"]
                 hourly_rate = self._get_spot_hourly_rate(instance_type, region)
                 if hourly_rate == 0:
                     hourly_rate = self._get_on_demand_hourly_rate(instance_type, region)
-
-                # Estimate monthly bill
-                monthly_forecast = self.estimate_monthly_cost_from_metrics(instance_id, cpu_utilization, hourly_rate)
-
-                # Enrich instance dict with cost data
-                inst["HourlyRate"] = str(hourly_rate)
-                inst["MonthlyCostEstimate"] = str(monthly_forecast)
-                inst["Underutilized"] = bool(cpu_utilization < 10 and hourly_rate > Decimal("0.01"))
-                inst["CPUUtilization"] = round(cpu_utilization, 2)
-                inst["CostImpactRank"] = "high" if monthly_forecast > Decimal("50") else "medium" if monthly_forecast > Decimal("10") else "low"
-
-                result.append(inst)
-
+                hourly_rates[key] = hourly_rate
             except Exception as e:
-                logger.error(f"[!] Failed to enrich instance {inst.get('InstanceId', 'unknown')}: {e}")
+                if is_throttled(e):
+                    raise  # fail the whole batch so it is priced again later
+                logger.error(f"[!] Failed to price instance {inst.get('InstanceId', 'unknown')}: {e}")
+                pricing_errors[key] = f"{type(e).__name__}: {e}"
+
+        if not instances:
+            return instances
+
+        # Cost the whole batch in one vectorized pass, then write back whole columns
+        costs = self.cost_engine.compute(instances, hourly_rates)
+        updates = pd.DataFrame({
+            "MonthlyCostEstimate": _cents_to_decimals(costs["MonthlyCostEstimateCents"]),
+            "MonthlyForecast": _cents_to_decimals(costs["MonthlyForecastCents"]),
+            "Underutilized": costs["Underutilized"].astype(bool),
+            "CostImpactRank": costs["CostImpactRank"]
+        }).to_dict("records")
+        for inst, update in zip(instances, updates):
+            key = (inst.get("Region"), inst.get("InstanceType"))
+            inst["HourlyRate"] = hourly_rates.get(key, Decimal(0))
+            inst.update(update)
+            if key in pricing_errors:
+                inst["PricingError"] = pricing_errors[key]
+            else:
+                inst.pop("PricingError", None)
 
-        return result
+        return instances
 
     def get_current_month_cost_explorer_report(self) -> Dict[str, Decimal]:
         """
@@ -168,19 +184,22 @@ class EC2CostEstimator:
             logger.info("[+] Got month-to-date cost report via Cost Explorer API")
             return costs_by_instance_type
         except Exception as e:
+            if is_throttled(e):
+                logger.error(f"[!] Cost Explorer throttled, month-to-date report not available: {e}")
+                raise
             logger.error(f"[!] Failed to fetch cost explorer data: {e}")
             return {}
 
     def flag_expensive_underutilized_instances(self, instances: List[Dict]) -> List[Dict]:
         """
         Returns list of instances that:
-        - Are costing more than $10/month
+        - Are costing more than $10/month (MonthlyCostEstimate, the undiscounted 730-hour cost)
         - Have less than 10% CPU utilization
         """
         enriched_instances = self.estimate_and_enhance_instances(instances)
         flagged = [
             inst for inst in enriched_instances
-            if inst.get("Underutilized") and inst.get("MonthlyCostEstimate") > Decimal("10")
+            if inst.get("Underutilized") and Decimal(inst.get("MonthlyCostEstimate", "0")) > Decimal("10")
         ]
         logger.info(f"[+] Flagged {len(flagged)} expensive underutilized instances")
         return flagged
\ No newline at end of file
@@ -1,61 +1,148 @@
 # src/aws/ec2/scanner.py
 
-import boto3
-from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime
 import logging
 from decimal import Decimal
-from typing import Dict, List, Any, Optional, Union, Tuple, TypeVar
+from typing import Dict, List, Any, Optional, Union, Tuple, TypeVar, Iterator
+from src.core.aws_clients import get_client, get_session, scoped_session
+from src.core.rate_limiter import RATE_LIMIT_SCALE, guard, is_throttled
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_PAGE_SIZE = 500  # describe_instances accepts 5-1000 results per page
+SCAN_PROCESSES = int(os.getenv("SCAN_PROCESSES", "8"))  # worker processes for multi-account scans
+
 def get_all_regions(session=None):
     """Get list of active AWS regions using Boto3"""
-    session = session or boto3.Session()
-    ec2 = session.client("ec2", region_name="us-east-1")
+    ec2 = get_client("ec2", "us-east-1", session)
     try:
         response = ec2.describe_regions()
         return [r["RegionName"] for r in response["Regions"]]
     except Exception as e:
+        if is_throttled(e):
+            # Falling back to one region here would quietly skip every other region
+            logger.error(f"[!] Region list throttled: {e}")
+            raise
         logger.error(f"[!] Failed to fetch region list: {e}")
         return ["us-east-1"]
 
 class EC2Scanner:
-    def __init__(self, region="us-east-1"):
+    def __init__(self, region="us-east-1", page_size: int = DEFAULT_PAGE_SIZE, session=None,
+                 account_id: Optional[str] = None):
         self.region = region
-        self.session = boto3.Session()
-        self.ec2_client = self.session.client("ec2", region_name=region)
+        self.page_size = page_size
+        self.account_id = account_id
+        self.session = session or get_session()
+        self.ec2_client = get_client("ec2", region, self.session)
+
+    def _to_record(self, instance: Dict[str, Any]) -> Dict[str, Any]:
+        """Flatten a describe_instances entry into the scan record format"""
+        record = {
+            "InstanceId": instance["InstanceId"],
+            "InstanceType": instance["InstanceType"],
+            "State": instance["State"]["Name"],
+            "LaunchTime": str(instance["LaunchTime"]),
+            "Region": self.region,
+            "Tags": {t["Key"]: t["Value"] for t in instance.get("Tags", [])}
+        }
+        if self.account_id:
+            record["AccountId"] = self.account_id
+        return record
+
+    def iter_instance_pages(self, page_size: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield running instances one API page at a time.
+
+        Follows NextToken via the describe_instances paginator, so only a
+        single page of records is held in memory by the scanner.
+        """
+        paginator = self.ec2_client.get_paginator("describe_instances")
+        pages = paginator.paginate(
+            Filters=[{"Name": "instance-state-name", "Values": ["running"]}],
+            PaginationConfig={"PageSize": page_size or self.page_size}
+        )
+
+        for page_number, response in enumerate(pages, start=1):
+            instances = [
+                self._to_record(instance)
+                for reservation in response.get("Reservations", [])
+                for instance in reservation["Instances"]
+            ]
+            logger.debug(f"[+] Page {page_number} returned {len(instances)} instance(s) in {self.region}")
+            if instances:
+                yield instances
 
     def scan_instances(self) -> List[Dict[str, Any]]:
         """Scan all running EC2 instances in current region"""
         try:
             logger.info(f"[+] Scanning EC2 instances in {self.region}")
-            response = self.ec2_client.describe_instances(Filters=[{"Name": "instance-state-name", "Values": ["running"]}])
-            reservations = response.get("Reservations", [])
             instances = []
-
-            for reservation in reservations:
-                for instance in reservation["Instances"]:
-                    inst_data = {
-                        "InstanceId": instance["InstanceId"],
-                        "InstanceType": instance["InstanceType"],
-                        "State": instance["State"]["Name"],
-                        "LaunchTime": str(instance["LaunchTime"]),
-                        "Region": self.region,
-                        "Tags": {t["Key"]: t["Value"] for t in instance.get("Tags", [])}
-                    }
-                    instances.append(inst_data)
+            for page in self.iter_instance_pages():
+                instances.extend(page)
 
             logger.info(f"[+] Found {len(instances)} instance(s) in {self.region}")
 
             # Save raw scan data
             filename = f"/app/data/output/ec2/instances_{self.region}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
-            from src.core.utils import save_json
-            save_json(instances, filename)
+            from src.core.scan_store import save_scan
+            save_scan(instances, filename)
 
             return instances
         except Exception as e:
+            if is_throttled(e):
+                logger.error(f"[!] Scan throttled in {self.region}: {e}")
+                raise
             logger.error(f"[!] Scan failed in {self.region}: {e}")
             return []
-        
-__all__ = ['EC2Scanner', 'get_all_regions']
\ No newline at end of file
+
+def scan_unit(region: str, page_size: int = DEFAULT_PAGE_SIZE, credentials: Optional[Dict[str, str]] = None,
+              account_id: Optional[str] = None, quota_share: float = 1.0) -> List[List[Dict[str, Any]]]:
+    """
+    Process pool entry point: every page of one (account, region) unit.
+
+    `credentials` are boto3.Session keyword arguments (assumed-role keys) or
+    None for the default chain. `quota_share` is this process's share of the
+    account's API quota, since each worker process has its own rate limiter.
+    """
+    guard.set_scale(RATE_LIMIT_SCALE * quota_share)
+    # Reused while the credentials stay the same, so units of one account share their clients
+    session = scoped_session(account_id or "", credentials, region, account_id) if credentials else None
+    return list(EC2Scanner(region, page_size=page_size, session=session, account_id=account_id).iter_instance_pages())
+
+class AccountScanPool:
+    """
+    Process pool for (account, region) scan units.
+
+    At most `max_workers` units run at once overall and at most an account's
+    max_concurrency per account, so a large account cannot take every worker
+    or exceed its own API quota. Workers are spawned rather than forked
+    because the parent runs threads holding locks.
+    """
+
+    def __init__(self, max_workers: int = SCAN_PROCESSES):
+        self.executor = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn"))
+        self._lock = threading.Lock()
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+
+    def _slot(self, account_id: str, max_concurrency: int) -> threading.BoundedSemaphore:
+        with self._lock:
+            slot = self._slots.get(account_id)
+            if slot is None:
+                slot = self._slots[account_id] = threading.BoundedSemaphore(max_concurrency)
+            return slot
+
+    def scan(self, region: str, account_id: str, max_concurrency: int, page_size: int = DEFAULT_PAGE_SIZE,
+             credentials: Optional[Dict[str, str]] = None) -> List[List[Dict[str, Any]]]:
+        """Run one unit in a worker process once the account has a free slot; blocks until it finishes"""
+        with self._slot(account_id, max_concurrency):
+            future = self.executor.submit(scan_unit, region, page_size, credentials, account_id, 1 / max_concurrency)
+            return future.result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+__all__ = ['EC2Scanner', 'AccountScanPool', 'get_all_regions', 'scan_unit']
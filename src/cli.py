@@ -0,0 +1,80 @@
+# src/cli.py
+
+"""
+Tephron command line.
+
+  python -m src.cli daemon [--jobs scan,cost,anomaly,knowledge_base]
+  python -m src.cli scan [--resume RUN_ID|latest]
+  python -m src.cli worker [--stages scan,enrich] [--concurrency N] [--drain]
+  python -m src.cli queue enqueue [--run-id RUN_ID] | status [RUN_ID] | retry RUN_ID
+"""
+
+import sys
+import logging
+import argparse
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="tephron")
+    commands = parser.add_subparsers(dest="command", required=True)
+    daemon = commands.add_parser("daemon", help="run the scheduled jobs in one long-running process")
+    daemon.add_argument("--jobs", help="comma-separated jobs to run (default: DAEMON_JOBS or all)")
+    scan = commands.add_parser("scan", help="run one scan → detect → alert pass and exit")
+    scan.add_argument("--resume", metavar="RUN_ID",
+                      help="continue a checkpointed run (a run_id, or 'latest' for the newest unfinished one)")
+    worker = commands.add_parser("worker", help="claim and run scan jobs from the PostgreSQL job queue")
+    worker.add_argument("--stages", help="comma-separated stages to take (default: WORKER_STAGES or all)")
+    worker.add_argument("--concurrency", type=int, help="jobs to work on at once (default: WORKER_CONCURRENCY)")
+    worker.add_argument("--drain", action="store_true", help="exit once no job is queued or running instead of polling")
+    queue = commands.add_parser("queue", help="queue scan runs for workers and inspect them")
+    queue_commands = queue.add_subparsers(dest="queue_command", required=True)
+    enqueue = queue_commands.add_parser("enqueue", help="queue every (account, region) unit as a new run")
+    enqueue.add_argument("--run-id", help="run_id to use (default: current UTC time)")
+    status = queue_commands.add_parser("status", help="job counts per stage and status")
+    status.add_argument("run_id", nargs="?", help="run to show (default: the newest)")
+    retry = queue_commands.add_parser("retry", help="give a run's failed jobs a fresh set of attempts")
+    retry.add_argument("run_id")
+    args = parser.parse_args(argv)
+
+    if args.command == "daemon":
+        from src.daemon import TephronDaemon
+        jobs = [job.strip() for job in args.jobs.split(",") if job.strip()] if args.jobs else None
+        TephronDaemon(jobs).run()
+    elif args.command == "scan":
+        from src.main import main as run_scan
+        run_scan(resume=args.resume)
+    elif args.command == "worker":
+        from src.worker import ScanWorker, WORKER_CONCURRENCY
+        stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()] if args.stages else None
+        ScanWorker(stages=stages, concurrency=args.concurrency or WORKER_CONCURRENCY, drain=args.drain).run()
+    elif args.command == "queue":
+        return run_queue_command(args)
+    return 0
+
+def run_queue_command(args) -> int:
+    from src.daemon import WarmResources
+    from src.worker import enqueue_scan, open_queue
+    resources = WarmResources()
+    try:
+        if args.queue_command == "enqueue":
+            print(enqueue_scan(resources, args.run_id))
+            return 0
+        queue = open_queue(resources)
+        if args.queue_command == "retry":
+            logger.info(f"[+] Requeued {queue.retry_failed(args.run_id)} failed job(s) of run {args.run_id}")
+            return 0
+        run_id = args.run_id or queue.latest_run()
+        if run_id is None:
+            logger.info("[*] No runs queued yet")
+            return 0
+        print(f"run {run_id}")
+        for stage, counts in queue.status(run_id).items():
+            print(f"  {stage:<8} " + " ".join(f"{name}={count}" for name, count in sorted(counts.items())))
+        return 0
+    finally:
+        resources.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# src/core/accounts.py
+
+"""
+Account inventory and assumed-role credentials for multi-account scans.
+
+config/accounts.json (see config/accounts.example.json) lists the accounts
+to scan; `regions` and `max_concurrency` are optional per account:
+
+    {"accounts": [{"account_id": "111122223333", "name": "prod",
+                   "role_arn": "arn:aws:iam::111122223333:role/TephronReadOnly",
+                   "external_id": "...", "regions": ["us-east-1"], "max_concurrency": 4}]}
+
+Without the file only the account of the default credentials is scanned.
+Role credentials come from sts.assume_role and are reused until
+STS_REFRESH_MARGIN seconds before they expire.
+"""
+
+import os
+import time
+import threading
+import boto3
+from typing import Any, Dict, List, Optional, Tuple
+from src.core.logger import logger
+from src.core.aws_clients import get_client, get_session, scoped_session
+from src.core.serialization import loads
+
+ACCOUNTS_FILE = os.getenv("TEPHRON_ACCOUNTS_FILE", "/app/config/accounts.json")
+ACCOUNT_MAX_CONCURRENCY = int(os.getenv("ACCOUNT_MAX_CONCURRENCY", "4"))  # scan units in flight per account
+STS_REGION = os.getenv("STS_REGION", "us-east-1")
+STS_SESSION_DURATION = int(os.getenv("STS_SESSION_DURATION", "3600"))  # seconds
+STS_REFRESH_MARGIN = int(os.getenv("STS_REFRESH_MARGIN", "900"))  # renew credentials this long before expiry
+ROLE_SESSION_NAME = "tephron-scan"
+
+class Account:
+    __slots__ = ("account_id", "name", "role_arn", "external_id", "regions", "max_concurrency")
+
+    def __init__(self, account_id: Optional[str], name: Optional[str] = None, role_arn: Optional[str] = None,
+                 external_id: Optional[str] = None, regions: Optional[List[str]] = None,
+                 max_concurrency: int = ACCOUNT_MAX_CONCURRENCY):
+        self.account_id = account_id
+        self.name = name or account_id
+        self.role_arn = role_arn
+        self.external_id = external_id
+        self.regions = regions
+        self.max_concurrency = max(1, int(max_concurrency))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Account":
+        account_id = str(data["account_id"])
+        return cls(
+            account_id=account_id,
+            name=data.get("name"),
+            role_arn=data.get("role_arn") or f"arn:aws:iam::{account_id}:role/{data['role_name']}",
+            external_id=data.get("external_id"),
+            regions=data.get("regions"),
+            max_concurrency=data.get("max_concurrency", ACCOUNT_MAX_CONCURRENCY)
+        )
+
+def load_accounts(path: str = ACCOUNTS_FILE) -> List[Account]:
+    """Accounts from the inventory file; an empty list means "default credentials only\""""
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb") as f:
+        entries = loads(f.read()).get("accounts", [])
+
+    accounts, seen = [], set()
+    for entry in entries:
+        try:
+            account = Account.from_dict(entry)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"[!] Skipping account entry without account_id and role_arn/role_name: {entry} ({e})")
+            continue
+        if account.account_id in seen:
+            logger.warning(f"[!] Account {account.account_id} is listed twice in {path}, keeping the first entry")
+            continue
+        seen.add(account.account_id)
+        accounts.append(account)
+    logger.info(f"[+] Loaded {len(accounts)} account(s) from {path}")
+    return accounts
+
+def unit_label(account_id: Optional[str], region: str) -> str:
+    """Checkpoint and log name of an (account, region) scan unit; plain region for the default account"""
+    return f"{account_id}:{region}" if account_id else region
+
+def split_unit(label: str) -> Tuple[Optional[str], str]:
+    account_id, _, region = label.rpartition(":")
+    return account_id or None, region
+
+class CredentialCache:
+    """
+    assume_role credentials and sessions per role, shared by every thread.
+
+    credentials() returns boto3.Session keyword arguments that can be sent to
+    worker processes; they are renewed once they are within `refresh_margin`
+    seconds of expiring, so a unit never starts with credentials about to lapse.
+    Renewals take a per-role lock, so a slow STS call for one role does not
+    hold up threads working with other accounts.
+    """
+
+    def __init__(self, session: Optional[boto3.Session] = None, duration: int = STS_SESSION_DURATION,
+                 refresh_margin: int = STS_REFRESH_MARGIN):
+        self.base_session = session or get_session()
+        self.duration = duration
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()  # guards _entries and _role_locks only, never held across STS calls
+        self._role_locks: Dict[str, threading.Lock] = {}
+        self._entries: Dict[str, Tuple[Dict[str, str], float, boto3.Session]] = {}
+        self._default_account_id: Optional[str] = None
+
+    def _assume(self, account: Account) -> Tuple[Dict[str, str], float, boto3.Session]:
+        params = {"RoleArn": account.role_arn, "RoleSessionName": ROLE_SESSION_NAME,
+                  "DurationSeconds": self.duration}
+        if account.external_id:
+            params["ExternalId"] = account.external_id
+        response = get_client("sts", STS_REGION, self.base_session).assume_role(**params)
+        issued = response["Credentials"]
+        credentials = {
+            "aws_access_key_id": issued["AccessKeyId"],
+            "aws_secret_access_key": issued["SecretAccessKey"],
+            "aws_session_token": issued["SessionToken"],
+        }
+        expires_at = issued["Expiration"].timestamp()
+        logger.info(f"[+] Assumed {account.role_arn} for account {account.name} "
+                    f"(valid for {int(expires_at - time.time())}s)")
+        # Replacing the account's session also drops the clients built on the expiring credentials
+        session = scoped_session(account.account_id or account.role_arn, credentials,
+                                 self.base_session.region_name, account.account_id)
+        return credentials, expires_at, session
+
+    def _fresh(self, role_arn: str) -> Optional[Tuple[Dict[str, str], float, boto3.Session]]:
+        entry = self._entries.get(role_arn)
+        return entry if entry is not None and entry[1] - time.time() >= self.refresh_margin else None
+
+    def _entry(self, account: Account) -> Tuple[Dict[str, str], float, boto3.Session]:
+        with self._lock:
+            entry = self._fresh(account.role_arn)
+            if entry is not None:
+                return entry
+            role_lock = self._role_locks.setdefault(account.role_arn, threading.Lock())
+        # One assume_role per role at a time; other roles (and fresh entries) are not held up by it
+        with role_lock:
+            with self._lock:
+                entry = self._fresh(account.role_arn)  # renewed while we waited for the role lock
+            if entry is not None:
+                return entry
+            entry = self._assume(account)
+            with self._lock:
+                self._entries[account.role_arn] = entry
+            return entry
+
+    def credentials(self, account: Account) -> Optional[Dict[str, str]]:
+        """boto3.Session keyword arguments for the account, None for the default credentials"""
+        if not account.role_arn:
+            return None
+        return self._entry(account)[0]
+
+    def session(self, account: Optional[Account]) -> boto3.Session:
+        if account is None or not account.role_arn:
+            return self.base_session
+        return self._entry(account)[2]
+
+    def default_account_id(self) -> Optional[str]:
+        """Account ID of the default credentials (one STS call, then cached)"""
+        if self._default_account_id is None:
+            try:
+                self._default_account_id = get_client("sts", STS_REGION, self.base_session).get_caller_identity()["Account"]
+            except Exception as e:
+                logger.warning(f"[!] Could not resolve the default account ID, records stay untagged: {e}")
+        return self._default_account_id
@@ -0,0 +1,129 @@
+# src/core/aws_clients.py
+
+import os
+import logging
+import threading
+import boto3
+from botocore.config import Config
+from typing import Dict, Any, Optional, Tuple
+from src.core.rate_limiter import AWSCallGuard, guard as default_guard, install_hooks
+
+logger = logging.getLogger(__name__)
+
+# One pool slot per concurrent caller; main.py runs up to 20 region workers
+MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50"))
+CONNECT_TIMEOUT = int(os.getenv("AWS_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = int(os.getenv("AWS_READ_TIMEOUT", "60"))
+# Same variables botocore reads itself; "adaptive" adds botocore's client-side send-rate control
+RETRY_MODE = os.getenv("AWS_RETRY_MODE", "standard")
+MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "5"))
+
+class AWSClientRegistry:
+    """
+    Process-wide cache of boto3 clients.
+
+    Holds one client per (service, region, session) so every scanner,
+    CloudWatch, pricing and cost module shares the same connection pools.
+    boto3 clients are thread-safe once built, but sessions are not, so all
+    session and client construction happens under a lock.
+
+    Sessions for assumed-role credentials come from scoped_session(): one
+    current session per scope (an account ID), reused while its credentials
+    stay the same. Renewed credentials replace the session, and the clients
+    built on the old one are dropped instead of piling up.
+
+    Every client is hooked into the shared AWSCallGuard (src.core.rate_limiter):
+    calls are paced by per-(account, service, region) token buckets and fail
+    fast with CircuitOpenError while the service's circuit in that region is open.
+    """
+
+    def __init__(self, max_pool_connections: int = MAX_POOL_CONNECTIONS, guard: Optional[AWSCallGuard] = None):
+        self._lock = threading.Lock()
+        self.guard = guard or default_guard
+        self._session: Optional[boto3.Session] = None
+        self._clients: Dict[Tuple[str, str, int], Any] = {}
+        # Sessions with cached clients, by id(); holding them keeps the ids unique
+        self._sessions: Dict[int, boto3.Session] = {}
+        self._scoped: Dict[str, Tuple[Dict[str, str], boto3.Session]] = {}  # scope -> (credentials, session)
+        self._accounts: Dict[int, str] = {}  # id(session) -> account its calls are rate limited under
+        self.config = Config(
+            max_pool_connections=max_pool_connections,
+            connect_timeout=CONNECT_TIMEOUT,
+            read_timeout=READ_TIMEOUT,
+            retries={"mode": RETRY_MODE, "total_max_attempts": MAX_ATTEMPTS}
+        )
+
+    def get_session(self) -> boto3.Session:
+        """Return the shared default session, creating it on first use"""
+        with self._lock:
+            if self._session is None:
+                self._session = boto3.Session()
+            return self._session
+
+    def scoped_session(self, scope: str, credentials: Dict[str, str], region_name: Optional[str] = None,
+                       account_id: Optional[str] = None) -> boto3.Session:
+        """
+        Session for static `credentials` (boto3.Session keyword arguments) under `scope`.
+
+        The same credentials return the same session; new ones replace it and
+        drop the clients of the replaced session. Calls made with it are rate
+        limited under `account_id`.
+        """
+        with self._lock:
+            current = self._scoped.get(scope)
+            if current is not None and current[0] == credentials:
+                return current[1]
+            if current is not None:
+                self._drop(current[1])
+            session = boto3.Session(region_name=region_name, **credentials)
+            self._scoped[scope] = (dict(credentials), session)
+            if account_id:
+                self._accounts[id(session)] = account_id
+            return session
+
+    def _drop(self, session: boto3.Session):
+        """Forget a session and its clients; call with the lock held"""
+        session_id = id(session)
+        for key in [key for key in self._clients if key[2] == session_id]:
+            del self._clients[key]
+        self._sessions.pop(session_id, None)
+        self._accounts.pop(session_id, None)
+
+    def get_client(self, service: str, region: Optional[str] = None, session: Optional[boto3.Session] = None):
+        """Return a cached client for (service, region, session)"""
+        session = session or self.get_session()
+        region = region or session.region_name or "us-east-1"
+
+        with self._lock:
+            key = (service, region, id(session))
+            client = self._clients.get(key)
+            if client is None:
+                client = session.client(service, region_name=region, config=self.config)
+                install_hooks(client, service, region, self.guard, adaptive_retries=RETRY_MODE == "adaptive",
+                              account_id=self._accounts.get(id(session)))
+                self._clients[key] = client
+                self._sessions[id(session)] = session
+                logger.debug(f"[+] Created {service} client in {region}")
+            return client
+
+    def clear(self):
+        """Drop all cached clients and sessions"""
+        with self._lock:
+            self._clients.clear()
+            self._sessions.clear()
+            self._scoped.clear()
+            self._accounts.clear()
+            self._session = None
+
+# Export shared registry
+registry = AWSClientRegistry()
+
+def get_session() -> boto3.Session:
+    return registry.get_session()
+
+def get_client(service: str, region: Optional[str] = None, session: Optional[boto3.Session] = None):
+    return registry.get_client(service, region, session)
+
+def scoped_session(scope: str, credentials: Dict[str, str], region_name: Optional[str] = None,
+                   account_id: Optional[str] = None) -> boto3.Session:
+    return registry.scoped_session(scope, credentials, region_name, account_id)
@@ -0,0 +1,181 @@
+# src/core/checkpoint.py
+
+"""
+Checkpoints for multi-region scan runs.
+
+A run is split into (region, stage) units. Each page batch that leaves a
+stage is written to <checkpoint dir>/<run_id>/pages/<region>.<page>.json
+together with the name of the last stage it completed, and state.json
+records which units are done (every page of the region has passed that
+stage) or failed, with their output location. In multi-account runs the
+region key is the unit label "<account_id>:<region>" (batch["unit"]).
+
+A restarted run with the same run_id replays each region from its page
+files: stages a page already completed are skipped, so finished regions cost
+no further API calls, alerts are not sent twice and only the failed or
+unfinished units are redone. A region whose scan never finished is scanned
+again from scratch. Page files are removed once the run completes.
+"""
+
+import os
+import re
+import shutil
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from src.core.logger import logger
+from src.core.serialization import atomic_writer, dumps_bytes, loads
+
+CHECKPOINT_DIR = os.getenv("SCAN_CHECKPOINT_DIR", "/app/data/checkpoints/")
+
+_PAGE_FILE = re.compile(r"^(?P<region>.+)\.(?P<page>\d+)\.json$")
+
+class RunCheckpoint:
+    def __init__(self, run_id: str, stages: List[str], directory: str = CHECKPOINT_DIR):
+        self.run_id = run_id
+        self.stages = list(stages)
+        self.run_dir = os.path.join(directory, run_id)
+        self.pages_dir = os.path.join(self.run_dir, "pages")
+        self._lock = threading.Lock()
+        self._progress: Dict[Tuple[str, str], int] = {}  # pages past each (region, stage)
+        self.state: Dict[str, Any] = {"run_id": run_id, "status": "running", "regions": {}, "units": {}}
+        self.resumed = self._load()
+
+    @staticmethod
+    def new_run_id() -> str:
+        return datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+
+    @staticmethod
+    def latest_unfinished(directory: str = CHECKPOINT_DIR) -> Optional[str]:
+        """run_id of the most recent run that did not complete, if any"""
+        if not os.path.isdir(directory):
+            return None
+        for run_id in sorted(os.listdir(directory), reverse=True):
+            try:
+                with open(os.path.join(directory, run_id, "state.json"), "rb") as f:
+                    if loads(f.read()).get("status") != "completed":
+                        return run_id
+            except (OSError, ValueError):
+                continue
+        return None
+
+    @property
+    def state_path(self) -> str:
+        return os.path.join(self.run_dir, "state.json")
+
+    def _load(self) -> bool:
+        if not os.path.exists(self.state_path):
+            return False
+        try:
+            with open(self.state_path, "rb") as f:
+                self.state = loads(f.read())
+            logger.info(f"[+] Resuming scan run {self.run_id}: "
+                        f"{sum(u['status'] == 'done' for u in self.state['units'].values())} unit(s) already done")
+            return True
+        except Exception as e:
+            logger.warning(f"[!] Ignoring unreadable checkpoint {self.state_path}: {e}")
+            return False
+
+    def _save(self):
+        """Persist state.json; call with the lock held"""
+        with atomic_writer(self.state_path) as f:
+            f.write(dumps_bytes(self.state, pretty=True))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.state.get(key, default)
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self.state[key] = value
+            self._save()
+
+    def _unit_key(self, region: str, stage: str) -> str:
+        return f"{region}/{stage}"
+
+    def unit_done(self, region: str, stage: str) -> bool:
+        return self.state["units"].get(self._unit_key(region, stage), {}).get("status") == "done"
+
+    def _mark(self, region: str, stage: str, status: str, **details):
+        self.state["units"][self._unit_key(region, stage)] = {
+            "status": status, "updated_at": datetime.utcnow().isoformat(), **details
+        }
+
+    def _page_path(self, region: str, page: int) -> str:
+        return os.path.join(self.pages_dir, f"{region}.{page:05d}.json")
+
+    def save_page(self, batch: Dict[str, Any]):
+        """Record that `batch` completed batch["stage"], then update unit completion"""
+        region, stage = batch.get("unit", batch["region"]), batch["stage"]
+        with atomic_writer(self._page_path(region, batch["page"])) as f:
+            f.write(dumps_bytes(batch))
+        with self._lock:
+            key = (region, stage)
+            self._progress[key] = self._progress.get(key, 0) + 1
+            self._check_region(region)
+
+    def _check_region(self, region: str):
+        """Mark every stage whose pages are all through as done; call with the lock held"""
+        pages = self.state["regions"].get(region, {}).get("pages")
+        if pages is None:
+            return  # still scanning
+        changed = False
+        for stage in self.stages:
+            if not self.unit_done(region, stage) and self._progress.get((region, stage), 0) >= pages:
+                self._mark(region, stage, "done", pages=pages, output=os.path.join(self.pages_dir, f"{region}.*.json"))
+                changed = True
+        if changed:
+            self._save()
+
+    def scan_finished(self, region: str, pages: int):
+        with self._lock:
+            self.state["regions"][region] = {"pages": pages}
+            self._check_region(region)
+            self._save()
+
+    def unit_failed(self, region: str, stage: str, error: str):
+        with self._lock:
+            self._mark(region, stage, "failed", error=error)
+            self._save()
+
+    def discard_region(self, region: str):
+        """Forget a region whose scan has to start over"""
+        with self._lock:
+            self.state["regions"].pop(region, None)
+            for stage in self.stages:
+                self.state["units"].pop(self._unit_key(region, stage), None)
+                self._progress.pop((region, stage), None)
+            self._save()
+        for _, path in self._page_files(region):
+            os.remove(path)
+
+    def _page_files(self, region: str) -> List[Tuple[int, str]]:
+        if not os.path.isdir(self.pages_dir):
+            return []
+        files = []
+        for name in os.listdir(self.pages_dir):
+            match = _PAGE_FILE.match(name)
+            if match and match.group("region") == region:
+                files.append((int(match.group("page")), os.path.join(self.pages_dir, name)))
+        return sorted(files)
+
+    def load_pages(self, region: str) -> List[Dict[str, Any]]:
+        """Checkpointed batches of a fully scanned region, counting them towards the stages they passed"""
+        batches = []
+        for _, path in self._page_files(region):
+            with open(path, "rb") as f:
+                batch = loads(f.read())
+            batches.append(batch)
+            passed = self.stages[:self.stages.index(batch["stage"]) + 1]
+            with self._lock:
+                for stage in passed:
+                    self._progress[(region, stage)] = self._progress.get((region, stage), 0) + 1
+        return batches
+
+    def complete(self):
+        """Mark the run completed and drop its page files"""
+        with self._lock:
+            self.state["status"] = "completed"
+            self.state["completed_at"] = datetime.utcnow().isoformat()
+            self._save()
+        shutil.rmtree(self.pages_dir, ignore_errors=True)
+        logger.info(f"[+] Scan run {self.run_id} completed")
@@ -1,51 +1,212 @@
 # src/core/db_handler.py
 
 import os
+import io
+import time
 import logging
+import threading
 import psycopg2
+from contextlib import contextmanager
+from datetime import datetime
 from psycopg2.extras import execute_batch
-from typing import Dict, Any, List, Optional, Union, Tuple, TypeVar
+from psycopg2.pool import ThreadedConnectionPool
+from src.core.db_schema import migrate, refresh_rollups, detach_partitions_before
+from src.core.serialization import dumps
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Union, Tuple, TypeVar
 
 logger = logging.getLogger(__name__)
 
+COPY_CHUNK_SIZE = int(os.getenv("DB_COPY_CHUNK_SIZE", "5000"))  # rows per COPY statement
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+POOL_CHECKOUT_TIMEOUT = float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "30"))  # seconds
+HEALTH_CHECK_IDLE_SECONDS = 30  # ping connections that sat idle longer than this
+
+# (column, scan record key) pairs for ec2_instances
+EC2_INSTANCE_COLUMNS = (
+    ("timestamp", "timestamp"),
+    ("instance_id", "InstanceId"),
+    ("region", "Region"),
+    ("instance_type", "InstanceType"),
+    ("state", "State"),
+    ("cpu_utilization", "CPUUtilization"),
+    ("network_in", "NetworkIn"),
+    ("network_out", "NetworkOut"),
+    ("hourly_rate", "HourlyRate"),
+    ("monthly_forecast", "MonthlyForecast"),
+    ("underutilized", "Underutilized"),
+    ("tags", "Tags"),
+    ("account_id", "AccountId")
+)
+
+EC2_NATURAL_KEY = ("instance_id", "timestamp")
+
+EC2_COST_COLUMNS = ("instance_id", "region", "today_cost", "weekly_forecast", "monthly_forecast", "underutilized")
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+def _copy_value(value: Any) -> str:
+    """Encode one value in COPY text format; dicts and lists become JSON (for JSONB columns)"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (dict, list)):
+        value = dumps(value)
+    return str(value).translate(_COPY_ESCAPES)
+
+def _copy_chunks(rows: Iterable[Tuple], chunk_size: int) -> Iterator[Tuple[io.StringIO, int]]:
+    """Encode rows lazily into COPY text buffers of at most `chunk_size` rows"""
+    lines = []
+    for row in rows:
+        lines.append("\t".join(map(_copy_value, row)) + "\n")
+        if len(lines) >= chunk_size:
+            yield io.StringIO("".join(lines)), len(lines)
+            lines = []
+    if lines:
+        yield io.StringIO("".join(lines)), len(lines)
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _copy_into(cur, table: str, columns: List[str], rows: Iterable[Tuple], chunk_size: int) -> int:
+    copy_sql = f"COPY {_quote_ident(table)} ({', '.join(map(_quote_ident, columns))}) FROM STDIN"
+    written = 0
+    for buffer, count in _copy_chunks(rows, chunk_size):
+        cur.copy_expert(copy_sql, buffer)
+        written += count
+    return written
+
+def _copy_upsert(cur, table: str, columns: List[str], rows: Iterable[Tuple],
+                 key_columns: List[str], chunk_size: int) -> int:
+    """COPY rows into a temporary staging table, then merge them into `table` on `key_columns`"""
+    stage = f"{table}_stage"
+    cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS {_quote_ident(stage)} "
+                f"(LIKE {_quote_ident(table)} INCLUDING DEFAULTS) ON COMMIT DROP;")
+    staged = _copy_into(cur, stage, columns, rows, chunk_size)
+
+    column_list = ", ".join(map(_quote_ident, columns))
+    key_list = ", ".join(map(_quote_ident, key_columns))
+    updates = ", ".join(f"{_quote_ident(c)} = EXCLUDED.{_quote_ident(c)}" for c in columns if c not in key_columns)
+    # Within one batch the last staged row for a key wins
+    cur.execute(f"""
+        INSERT INTO {_quote_ident(table)} ({column_list})
+        SELECT DISTINCT ON ({key_list}) {column_list} FROM {_quote_ident(stage)}
+        ORDER BY {key_list}, ctid DESC
+        ON CONFLICT ({key_list}) DO {f"UPDATE SET {updates}" if updates else "NOTHING"};
+    """)
+    cur.execute(f"DROP TABLE {_quote_ident(stage)};")
+    return staged
+
+def _connect_kwargs() -> Dict[str, Any]:
+    return {
+        "host": os.getenv("DB_HOST", "tephron-db"),
+        "database": os.getenv("DB_NAME", "tephron"),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "postgres")
+    }
+
+class ConnectionPool:
+    """
+    Thread-safe PostgreSQL connection pool.
+
+    Wraps psycopg2's ThreadedConnectionPool with a bounded checkout (callers
+    wait up to `timeout` seconds instead of failing when all connections are
+    busy), a liveness check on connections that sat idle, and context
+    managers that hand every checkout its own transaction and cursor.
+    """
+
+    def __init__(self, min_size: int = POOL_MIN_SIZE, max_size: int = POOL_MAX_SIZE,
+                 timeout: float = POOL_CHECKOUT_TIMEOUT, **connect_kwargs):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._pool = ThreadedConnectionPool(min_size, max_size, **(connect_kwargs or _connect_kwargs()))
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._last_used: Dict[int, float] = {}
+        logger.info(f"[+] Connected to PostgreSQL (pool size {min_size}-{max_size})")
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - self._last_used.get(id(conn), 0.0) < HEALTH_CHECK_IDLE_SECONDS:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _checkout(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No PostgreSQL connection available within {self.timeout}s")
+        try:
+            conn = self._pool.getconn()
+            if not self._is_healthy(conn):
+                logger.warning("[!] Replacing dead PostgreSQL connection")
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _checkin(self, conn):
+        try:
+            self._last_used[id(conn)] = time.monotonic()
+            self._pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for one transaction: commit on success, roll back on error"""
+        conn = self._checkout()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self._checkin(conn)
+
+    @contextmanager
+    def cursor(self):
+        """Cursor on a checked-out connection, in its own transaction"""
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                yield cur
+
+    def close(self):
+        self._pool.closeall()
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Process-wide connection pool, created on first use"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None or _shared_pool._pool.closed:
+            _shared_pool = ConnectionPool()
+        return _shared_pool
+
 class PostgresHandler:
-    def __init__(self):
-        self.conn = psycopg2.connect(
-            host=os.getenv("DB_HOST", "tephron-db"),
-            database=os.getenv("DB_NAME", "tephron"),
-            user=os.getenv("DB_USER", "postgres"),
-            password=os.getenv("DB_PASSWORD", "postgres")
-        )
-        self.cur = self.conn.cursor()
-        logger.info("[+] Connected to PostgreSQL")
+    """Table-level helpers on top of the shared connection pool; safe to share across threads"""
+
+    def __init__(self, pool: Optional[ConnectionPool] = None):
+        self.pool = pool or get_pool()
 
     def create_tables(self):
-        """Create required tables if they don't exist"""
+        """Bring the schema up to date (idempotent, see src/core/db_schema.py)"""
         try:
-            ec2_table_sql = """
-                CREATE TABLE IF NOT EXISTS ec2_instances (
-                    id SERIAL PRIMARY KEY,
-                    timestamp TIMESTAMP,
-                    instance_id TEXT,
-                    region TEXT,
-                    instance_type TEXT,
-                    state TEXT,
-                    cpu_utilization REAL,
-                    network_in REAL,
-                    network_out REAL,
-                    hourly_rate NUMERIC(10, 5),
-                    monthly_forecast NUMERIC(10, 2),
-                    underutilized BOOLEAN,
-                    tags JSONB
-                );
-            """
-
-            self.cur.execute(ec2_table_sql)
-            self.conn.commit()
-            logger.info("[+] Verified/created ec2_instances table")
+            applied = migrate(self.pool)
+            logger.info(f"[+] Verified schema ({len(applied)} migration(s) applied)")
         except Exception as e:
             logger.error(f"[!] Failed to initialize DB schema: {e}")
-            self.conn.rollback()
 
     def save_ec2_instance(self, instance_data: Dict[str, Any]):
         """Insert EC2 instance data into PostgreSQL"""
@@ -68,13 +229,184 @@ class PostgresHandler:
                 instance_data.get("NetworkIn"),
                 instance_data.get("NetworkOut"),
                 instance_data.get("HourlyRate"),
-                instance_data.get("MonthlyCostEstimate"),
+                instance_data.get("MonthlyForecast"),
                 instance_data.get("Underutilized"),
-                json.dumps(instance_data.get("Tags", {}))
+                dumps(instance_data.get("Tags", {}))
             )
 
-            self.cur.execute(insert_sql, values)
-            self.conn.commit()
+            with self.pool.cursor() as cur:
+                cur.execute(insert_sql, values)
         except Exception as e:
             logger.error(f"[!] DB Insert failed: {e}")
-            self.conn.rollback()
\ No newline at end of file
+
+    def copy_rows(self, table: str, columns: List[str], rows: Iterable[Tuple],
+                  chunk_size: int = COPY_CHUNK_SIZE) -> int:
+        """
+        Stream rows into `table` with COPY FROM STDIN.
+
+        Rows are encoded lazily and sent in chunks of `chunk_size`, all inside
+        one transaction: either every row lands or none does. Dict and list
+        values are serialized to JSON while encoding, for JSONB columns.
+        Returns the number of rows written (0 on failure).
+        """
+        try:
+            with self.pool.cursor() as cur:
+                written = _copy_into(cur, table, columns, rows, chunk_size)
+            logger.info(f"[+] Copied {written} row(s) into {table}")
+            return written
+        except Exception as e:
+            logger.error(f"[!] Bulk copy into {table} failed, rolled back: {e}")
+            return 0
+
+    def upsert_rows(self, table: str, columns: List[str], rows: Iterable[Tuple], key_columns: List[str],
+                    chunk_size: int = COPY_CHUNK_SIZE) -> int:
+        """
+        Bulk insert-or-update on a natural key in one transaction.
+
+        Rows are COPYed into a temporary staging table and merged with
+        INSERT ... ON CONFLICT (key_columns) DO UPDATE, so replaying the same
+        rows is a no-op. Returns the number of rows staged (0 on failure).
+        """
+        try:
+            with self.pool.cursor() as cur:
+                written = _copy_upsert(cur, table, columns, rows, key_columns, chunk_size)
+            logger.info(f"[+] Upserted {written} row(s) into {table}")
+            return written
+        except Exception as e:
+            logger.error(f"[!] Bulk upsert into {table} failed, rolled back: {e}")
+            return 0
+
+    def bulk_save_ec2_instances(self, instances: Iterable[Dict[str, Any]], chunk_size: int = COPY_CHUNK_SIZE,
+                                refresh: bool = True) -> int:
+        """
+        COPY many scan records into ec2_instances in one transaction, upserting on (instance_id, timestamp).
+
+        Rollups are refreshed afterwards unless `refresh` is False; callers
+        saving a run batch by batch pass False and refresh once at the end.
+        """
+        scanned_at = datetime.utcnow().isoformat()
+        oldest = [scanned_at]
+
+        def rows():
+            for inst in instances:
+                row = tuple(inst.get(key) for _, key in EC2_INSTANCE_COLUMNS)
+                timestamp = row[0] or scanned_at
+                oldest[0] = min(oldest[0], str(timestamp))
+                yield (timestamp,) + row[1:]
+
+        written = self.upsert_rows("ec2_instances", [column for column, _ in EC2_INSTANCE_COLUMNS], rows(),
+                                   list(EC2_NATURAL_KEY), chunk_size)
+        if written and refresh:
+            self.refresh_rollups(datetime.fromisoformat(oldest[0][:26]))
+        return written
+
+    def refresh_rollups(self, since: datetime):
+        """Recompute hourly/daily rollups from `since` onwards"""
+        try:
+            refresh_rollups(self.pool, since)
+        except Exception as e:
+            logger.error(f"[!] Failed to refresh rollups: {e}")
+
+    def detach_partitions_before(self, cutoff, drop: bool = False) -> List[str]:
+        """Detach (or drop) ec2_instances partitions older than `cutoff` for cheap retention"""
+        try:
+            return detach_partitions_before(self.pool, cutoff, drop)
+        except Exception as e:
+            logger.error(f"[!] Failed to detach partitions: {e}")
+            return []
+
+    def bulk_save_ec2_costs(self, costs: Iterable[Dict[str, Any]], chunk_size: int = COPY_CHUNK_SIZE) -> int:
+        """COPY many cost estimates into ec2_costs in one transaction"""
+        rows = (tuple(cost.get(column) for column in EC2_COST_COLUMNS) for cost in costs)
+        return self.copy_rows("ec2_costs", list(EC2_COST_COLUMNS), rows, chunk_size)
+
+    def create_table(self, table: str, schema: Dict[str, str]):
+        """Create `table` from a {column: type} schema and add any columns it is missing"""
+        try:
+            columns = ", ".join(f"{_quote_ident(name)} {sql_type}" for name, sql_type in schema.items())
+            with self.pool.cursor() as cur:
+                cur.execute(f"CREATE TABLE IF NOT EXISTS {_quote_ident(table)} ({columns});")
+                for name, sql_type in schema.items():
+                    cur.execute(
+                        f"ALTER TABLE {_quote_ident(table)} ADD COLUMN IF NOT EXISTS {_quote_ident(name)} {sql_type};"
+                    )
+            logger.info(f"[+] Verified/created {table} table")
+        except Exception as e:
+            logger.error(f"[!] Failed to create table {table}: {e}")
+
+    def insert_data(self, table: str, columns: List[str], rows: Iterable[Tuple],
+                    chunk_size: int = COPY_CHUNK_SIZE) -> int:
+        """Bulk insert rows (dict/list values are stored as JSON) via COPY"""
+        return self.copy_rows(table, columns, rows, chunk_size)
+
+    def get_table_columns(self, table: str) -> Dict[str, str]:
+        """{column: data type} of an existing table (empty if it does not exist)"""
+        try:
+            with self.pool.cursor() as cur:
+                cur.execute(
+                    "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = %s;",
+                    (table,)
+                )
+                return dict(cur.fetchall())
+        except Exception as e:
+            logger.error(f"[!] Failed to read columns of {table}: {e}")
+            return {}
+
+    def get_ingest_manifest(self) -> Dict[str, Tuple[int, float, str, List[str]]]:
+        """{path: (size, mtime, sha256, archived source paths)} of every file ingested so far"""
+        with self.pool.cursor() as cur:
+            cur.execute("SELECT path, size, mtime, sha256, sources FROM ingest_manifest;")
+            return {path: (size, mtime, sha256, sources or [])
+                    for path, size, mtime, sha256, sources in cur.fetchall()}
+
+    def ingest_file(self, path: str, size: int, mtime: float, sha256: str, table: str,
+                    columns: List[str], rows: Iterable[Tuple], key_columns: List[str],
+                    chunk_size: int = COPY_CHUNK_SIZE, sources: Optional[List[str]] = None) -> int:
+        """Upsert one file's rows and record it in ingest_manifest, atomically"""
+        with self.pool.cursor() as cur:
+            written = _copy_upsert(cur, table, columns, rows, key_columns, chunk_size) if columns else 0
+            self._record_ingested(cur, path, size, mtime, sha256, written, sources)
+        return written
+
+    def record_ingested_file(self, path: str, size: int, mtime: float, sha256: str, row_count: int,
+                             sources: Optional[List[str]] = None):
+        """Record a file whose rows are already stored (e.g. an archive of ingested files) without reading it"""
+        with self.pool.cursor() as cur:
+            self._record_ingested(cur, path, size, mtime, sha256, row_count, sources)
+
+    @staticmethod
+    def _record_ingested(cur, path: str, size: int, mtime: float, sha256: str, row_count: int,
+                         sources: Optional[List[str]]):
+        cur.execute("""
+            INSERT INTO ingest_manifest (path, size, mtime, sha256, row_count, sources)
+            VALUES (%s, %s, %s, %s, %s, %s::jsonb)
+            ON CONFLICT (path) DO UPDATE SET size = EXCLUDED.size, mtime = EXCLUDED.mtime,
+                sha256 = EXCLUDED.sha256, row_count = EXCLUDED.row_count, sources = EXCLUDED.sources,
+                ingested_at = NOW();
+        """, (path, size, mtime, sha256, row_count, dumps(sources) if sources else None))
+
+    def touch_ingested_file(self, path: str, size: int, mtime: float):
+        """Refresh size/mtime of a manifest entry whose content hash did not change"""
+        with self.pool.cursor() as cur:
+            cur.execute("UPDATE ingest_manifest SET size = %s, mtime = %s WHERE path = %s;", (size, mtime, path))
+
+    def prune_ingest_manifest(self, paths: List[str]) -> int:
+        """Forget manifest entries of files that no longer exist"""
+        if not paths:
+            return 0
+        with self.pool.cursor() as cur:
+            cur.execute("DELETE FROM ingest_manifest WHERE path = ANY(%s);", (list(paths),))
+            return cur.rowcount
+
+    def record_confirmation(self, instance_id: str, confirmed_by: Optional[str] = None) -> bool:
+        """Store a user confirmation that an instance is underutilized"""
+        try:
+            with self.pool.cursor() as cur:
+                cur.execute(
+                    "INSERT INTO instance_confirmations (instance_id, confirmed_by) VALUES (%s, %s);",
+                    (instance_id, confirmed_by)
+                )
+            return True
+        except Exception as e:
+            logger.error(f"[!] Failed to record confirmation for {instance_id}: {e}")
+            return False
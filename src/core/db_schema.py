@@ -0,0 +1,347 @@
+# src/core/db_schema.py
+
+"""
+Versioned PostgreSQL schema for Tephron.
+
+Migrations are applied in order and recorded in schema_migrations; each one
+runs in its own transaction under an advisory lock, so running migrate()
+again (or from several processes at once) is a no-op once it is applied.
+
+ec2_instances is range-partitioned by month on `timestamp`, with a default
+partition catching out-of-range rows; creating a month's partition later
+moves that month's rows out of the default partition. Hourly and daily per-instance rollups
+of CPU, network and cost are kept in ec2_instance_hourly / ec2_instance_daily
+and refreshed for the time range a write touched.
+"""
+
+import os
+import logging
+from datetime import datetime, date
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("DB_PARTITION_MONTHS_AHEAD", "2"))
+MIGRATION_LOCK_ID = 74192024  # pg_advisory_xact_lock key shared by all migrators
+ROLLUP_LOCK_ID = 74192025  # serializes rollup refreshes, whose upserts would otherwise deadlock
+
+def _month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+def _add_months(value: date, months: int) -> date:
+    month = value.month - 1 + months
+    return date(value.year + month // 12, month % 12 + 1, 1)
+
+DEFAULT_PARTITION = "ec2_instances_default"
+
+def partition_name(month: date) -> str:
+    return f"ec2_instances_p{month:%Y%m}"
+
+def _create_partition(cur, month: date):
+    """
+    Create one month's partition. Rows the default partition caught for that
+    month (back-filled files, skewed clocks) would make CREATE ... PARTITION OF
+    fail, so they are moved into the new partition in the same transaction.
+    """
+    bounds = (month, _add_months(month, 1))
+    cur.execute(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= %s AND timestamp < %s);",
+                bounds)
+    stranded = cur.fetchone()[0]
+    if stranded:
+        cur.execute(f"CREATE TEMP TABLE ec2_instances_moved ON COMMIT DROP AS "
+                    f"SELECT * FROM {DEFAULT_PARTITION} WHERE timestamp >= %s AND timestamp < %s;", bounds)
+        cur.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= %s AND timestamp < %s;", bounds)
+    cur.execute(f"CREATE TABLE {partition_name(month)} PARTITION OF ec2_instances FOR VALUES FROM (%s) TO (%s);",
+                bounds)
+    if stranded:
+        # The temp table has the default partition's column order, so name the columns
+        cur.execute("SELECT * FROM ec2_instances_moved LIMIT 0;")
+        columns = ", ".join(f'"{column[0]}"' for column in cur.description)
+        cur.execute(f"INSERT INTO ec2_instances ({columns}) SELECT {columns} FROM ec2_instances_moved;")
+        logger.info(f"[+] Moved {cur.rowcount} row(s) for {month:%Y-%m} out of {DEFAULT_PARTITION}")
+        cur.execute("DROP TABLE ec2_instances_moved;")
+
+def ensure_partitions(cur, start: date, end: date):
+    """Create monthly ec2_instances partitions covering [start month, end month]"""
+    month = _month_start(start)
+    while month <= end:
+        cur.execute("SELECT to_regclass(%s);", (partition_name(month),))
+        if cur.fetchone()[0] is None:
+            _create_partition(cur, month)
+        month = _add_months(month, 1)
+
+def _baseline(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS ec2_instances (
+            id SERIAL PRIMARY KEY,
+            timestamp TIMESTAMP,
+            instance_id TEXT,
+            region TEXT,
+            instance_type TEXT,
+            state TEXT,
+            cpu_utilization REAL,
+            network_in REAL,
+            network_out REAL,
+            hourly_rate NUMERIC(10, 5),
+            monthly_forecast NUMERIC(10, 2),
+            underutilized BOOLEAN,
+            tags JSONB
+        );
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS ec2_costs (
+            id SERIAL PRIMARY KEY,
+            timestamp TIMESTAMP DEFAULT NOW(),
+            instance_id TEXT,
+            region TEXT,
+            today_cost NUMERIC(10, 2),
+            weekly_forecast NUMERIC(10, 2),
+            monthly_forecast NUMERIC(10, 2),
+            underutilized BOOLEAN
+        );
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS instance_confirmations (
+            id SERIAL PRIMARY KEY,
+            timestamp TIMESTAMP DEFAULT NOW(),
+            instance_id TEXT,
+            confirmed_by TEXT
+        );
+    """)
+
+def _partition_ec2_instances(cur):
+    """Rebuild ec2_instances as a monthly range-partitioned table, keeping existing rows"""
+    cur.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'ec2_instances'::regclass;")
+    if cur.fetchone():
+        return
+
+    cur.execute("ALTER TABLE ec2_instances RENAME TO ec2_instances_legacy;")
+    cur.execute("""
+        CREATE TABLE ec2_instances (
+            id BIGSERIAL,
+            timestamp TIMESTAMP NOT NULL DEFAULT NOW(),
+            instance_id TEXT,
+            region TEXT,
+            instance_type TEXT,
+            state TEXT,
+            cpu_utilization REAL,
+            network_in REAL,
+            network_out REAL,
+            hourly_rate NUMERIC(10, 5),
+            monthly_forecast NUMERIC(10, 2),
+            underutilized BOOLEAN,
+            tags JSONB,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp);
+    """)
+    cur.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF ec2_instances DEFAULT;")
+    cur.execute("CREATE INDEX ec2_instances_instance_ts_idx ON ec2_instances (instance_id, timestamp);")
+    cur.execute("CREATE INDEX ec2_instances_region_ts_idx ON ec2_instances (region, timestamp);")
+
+    cur.execute("SELECT MIN(timestamp) FROM ec2_instances_legacy;")
+    oldest = cur.fetchone()[0]
+    today = datetime.utcnow().date()
+    ensure_partitions(cur, oldest.date() if oldest else today, _add_months(today, PARTITION_MONTHS_AHEAD))
+
+    cur.execute("""
+        INSERT INTO ec2_instances (
+            id, timestamp, instance_id, region, instance_type, state, cpu_utilization,
+            network_in, network_out, hourly_rate, monthly_forecast, underutilized, tags
+        )
+        SELECT id, COALESCE(timestamp, NOW()), instance_id, region, instance_type, state, cpu_utilization,
+               network_in, network_out, hourly_rate, monthly_forecast, underutilized, tags
+        FROM ec2_instances_legacy;
+    """)
+    cur.execute("SELECT setval(pg_get_serial_sequence('ec2_instances', 'id'), COALESCE(MAX(id), 0) + 1, false) "
+                "FROM ec2_instances;")
+    cur.execute("DROP TABLE ec2_instances_legacy;")
+
+def _rollup_tables(cur):
+    for table in ("ec2_instance_hourly", "ec2_instance_daily"):
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                instance_id TEXT NOT NULL,
+                bucket TIMESTAMP NOT NULL,
+                region TEXT,
+                samples INTEGER NOT NULL,
+                avg_cpu REAL,
+                max_cpu REAL,
+                avg_network_in DOUBLE PRECISION,
+                avg_network_out DOUBLE PRECISION,
+                cost NUMERIC(12, 5),
+                PRIMARY KEY (instance_id, bucket)
+            );
+        """)
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {table}_region_bucket_idx ON {table} (region, bucket);")
+    cur.execute("CREATE INDEX IF NOT EXISTS ec2_costs_instance_ts_idx ON ec2_costs (instance_id, timestamp);")
+
+def _ingest_manifest(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_manifest (
+            path TEXT PRIMARY KEY,
+            size BIGINT NOT NULL,
+            mtime DOUBLE PRECISION NOT NULL,
+            sha256 TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            ingested_at TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+    """)
+    # Natural key for scan rows; drop earlier duplicates so the unique index can be built
+    cur.execute("""
+        DELETE FROM ec2_instances a USING ec2_instances b
+        WHERE a.instance_id = b.instance_id AND a.timestamp = b.timestamp AND a.id < b.id;
+    """)
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS ec2_instances_natural_key "
+                "ON ec2_instances (instance_id, timestamp);")
+
+def _account_id(cur):
+    cur.execute("ALTER TABLE ec2_instances ADD COLUMN IF NOT EXISTS account_id TEXT;")
+    cur.execute("CREATE INDEX IF NOT EXISTS ec2_instances_account_ts_idx ON ec2_instances (account_id, timestamp);")
+
+def _scan_jobs(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS scan_jobs (
+            id BIGSERIAL PRIMARY KEY,
+            run_id TEXT NOT NULL,
+            unit TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            payload JSONB,
+            result JSONB,
+            last_error TEXT,
+            worker_id TEXT,
+            available_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            lease_expires_at TIMESTAMP,
+            heartbeat_at TIMESTAMP,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            finished_at TIMESTAMP,
+            UNIQUE (run_id, unit, stage)
+        );
+    """)
+    # Claims only look at open jobs, so keep that index small
+    cur.execute("CREATE INDEX IF NOT EXISTS scan_jobs_open_idx ON scan_jobs (available_at, id) "
+                "WHERE status IN ('queued', 'running');")
+    cur.execute("CREATE INDEX IF NOT EXISTS scan_jobs_run_idx ON scan_jobs (run_id, status);")
+
+def _manifest_sources(cur):
+    # Source files a compacted archive covers, so its raw files' entries can be pruned
+    cur.execute("ALTER TABLE ingest_manifest ADD COLUMN IF NOT EXISTS sources JSONB;")
+
+# (version, name, step); append only, never edit an applied migration
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "baseline tables", _baseline),
+    (2, "partition ec2_instances by month", _partition_ec2_instances),
+    (3, "hourly and daily rollups", _rollup_tables),
+    (4, "ingest manifest and natural key", _ingest_manifest),
+    (5, "account_id on ec2_instances", _account_id),
+    (6, "scan job queue", _scan_jobs),
+    (7, "archive sources in ingest manifest", _manifest_sources),
+]
+
+def migrate(pool) -> List[int]:
+    """Apply pending migrations; returns the versions applied by this call"""
+    with pool.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+            );
+        """)
+        cur.execute("SELECT version FROM schema_migrations;")
+        done = {row[0] for row in cur.fetchall()}
+
+    applied = []
+    # A current schema costs one read; pending steps are re-checked under the lock
+    for version, name, step in MIGRATIONS:
+        if version in done:
+            continue
+        with pool.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_ID,))
+            cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s;", (version,))
+            if cur.fetchone():
+                continue
+            step(cur)
+            cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s);", (version, name))
+            applied.append(version)
+            logger.info(f"[+] Applied schema migration {version}: {name}")
+
+    with pool.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_ID,))
+        today = datetime.utcnow().date()
+        ensure_partitions(cur, today, _add_months(today, PARTITION_MONTHS_AHEAD))
+    return applied
+
+def refresh_rollups(pool, since: datetime, until: Optional[datetime] = None):
+    """Recompute hourly and daily rollup buckets overlapping [since, until)"""
+    until = until or datetime.utcnow()
+    with pool.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(%s);", (ROLLUP_LOCK_ID,))
+        cur.execute("""
+            INSERT INTO ec2_instance_hourly (
+                instance_id, bucket, region, samples, avg_cpu, max_cpu, avg_network_in, avg_network_out, cost
+            )
+            SELECT instance_id, date_trunc('hour', timestamp), MAX(region), COUNT(*),
+                   AVG(cpu_utilization), MAX(cpu_utilization), AVG(network_in), AVG(network_out), AVG(hourly_rate)
+            FROM ec2_instances
+            WHERE timestamp >= date_trunc('hour', %(since)s::timestamp) AND timestamp < %(until)s
+              AND instance_id IS NOT NULL
+            GROUP BY instance_id, date_trunc('hour', timestamp)
+            ON CONFLICT (instance_id, bucket) DO UPDATE SET
+                region = EXCLUDED.region, samples = EXCLUDED.samples, avg_cpu = EXCLUDED.avg_cpu,
+                max_cpu = EXCLUDED.max_cpu, avg_network_in = EXCLUDED.avg_network_in,
+                avg_network_out = EXCLUDED.avg_network_out, cost = EXCLUDED.cost;
+        """, {"since": since, "until": until})
+        # Scans are sparse, so the daily cost is the day's average hourly cost over 24 hours
+        cur.execute("""
+            INSERT INTO ec2_instance_daily (
+                instance_id, bucket, region, samples, avg_cpu, max_cpu, avg_network_in, avg_network_out, cost
+            )
+            SELECT instance_id, date_trunc('day', bucket), MAX(region), SUM(samples),
+                   SUM(avg_cpu * samples) / NULLIF(SUM(samples) FILTER (WHERE avg_cpu IS NOT NULL), 0),
+                   MAX(max_cpu), AVG(avg_network_in), AVG(avg_network_out), AVG(cost) * 24
+            FROM ec2_instance_hourly
+            WHERE bucket >= date_trunc('day', %(since)s::timestamp) AND bucket < %(until)s
+            GROUP BY instance_id, date_trunc('day', bucket)
+            ON CONFLICT (instance_id, bucket) DO UPDATE SET
+                region = EXCLUDED.region, samples = EXCLUDED.samples, avg_cpu = EXCLUDED.avg_cpu,
+                max_cpu = EXCLUDED.max_cpu, avg_network_in = EXCLUDED.avg_network_in,
+                avg_network_out = EXCLUDED.avg_network_out, cost = EXCLUDED.cost;
+        """, {"since": since, "until": until})
+
+def detach_partitions_before(pool, cutoff: date, drop: bool = False) -> List[str]:
+    """
+    Detach monthly partitions that end on or before `cutoff`.
+
+    Old rows the default partition caught are first moved into partitions of
+    their own month, so they are retired with everything else. Detached
+    tables keep their data (archive or drop them at leisure); with drop=True
+    they are dropped right away. Rollups are left untouched.
+    """
+    detached = []
+    with pool.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_ID,))
+        cur.execute(f"SELECT DISTINCT date_trunc('month', timestamp)::date FROM {DEFAULT_PARTITION} "
+                    f"WHERE timestamp < %s;", (_month_start(cutoff),))
+        for (month,) in cur.fetchall():
+            if _add_months(month, 1) <= cutoff:
+                ensure_partitions(cur, month, month)
+        cur.execute("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'ec2_instances'::regclass AND c.relname LIKE 'ec2_instances_p%'
+            ORDER BY c.relname;
+        """)
+        for (name,) in cur.fetchall():
+            month = datetime.strptime(name[len("ec2_instances_p"):], "%Y%m").date()
+            if _add_months(month, 1) > cutoff:
+                continue
+            cur.execute(f"ALTER TABLE ec2_instances DETACH PARTITION {name};")
+            if drop:
+                cur.execute(f"DROP TABLE {name};")
+            detached.append(name)
+    if detached:
+        logger.info(f"[+] {'Dropped' if drop else 'Detached'} {len(detached)} partition(s) before {cutoff}")
+    return detached
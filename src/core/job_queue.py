@@ -0,0 +1,234 @@
+# src/core/job_queue.py
+
+"""
+PostgreSQL job queue for distributed scan runs.
+
+A run is split into (unit, stage) jobs in scan_jobs (migration 6), where a
+unit is a region or an "<account_id>:<region>" label and the stages follow
+each other in a fixed order. Workers on any node claim the next open job
+with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent claimers never block
+on each other or get the same job.
+
+A claimed job is leased for `lease_seconds` and kept alive by heartbeats.
+When a worker dies its lease expires and the job becomes claimable again;
+failed jobs are retried after a jittered exponential delay. Both count as
+attempts, and after `max_attempts` the job is marked failed. Every update
+from a worker is fenced on (worker_id, attempts), so a worker that lost its
+lease cannot overwrite the result of the one that took over.
+
+Completing a job stores its output in `result` and enqueues the unit's next
+stage in the same transaction; the previous stage's output is then dropped.
+Connections come from the shared PostgresHandler pool (DB_* settings), so
+pointing DB_HOST at a local PostgreSQL is enough to try the queue out.
+"""
+
+import os
+import random
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+from src.core.db_handler import ConnectionPool, get_pool
+from src.core.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE = float(os.getenv("JOB_RETRY_BASE", "30"))  # seconds before the first retry
+JOB_RETRY_CAP = 900.0
+
+_JOB_COLUMNS = "id, run_id, unit, stage, attempts, max_attempts, payload"
+
+class Job:
+    __slots__ = ("id", "run_id", "unit", "stage", "attempts", "max_attempts", "payload", "worker_id")
+
+    def __init__(self, id: int, run_id: str, unit: str, stage: str, attempts: int, max_attempts: int,
+                 payload: Optional[Dict[str, Any]], worker_id: str):
+        self.id = id
+        self.run_id = run_id
+        self.unit = unit
+        self.stage = stage
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.payload = payload or {}
+        self.worker_id = worker_id
+
+    def __repr__(self) -> str:
+        return f"Job({self.id} {self.run_id} {self.unit}/{self.stage} attempt {self.attempts}/{self.max_attempts})"
+
+class LeaseLostError(Exception):
+    """The job's lease expired and another worker may own it now"""
+
+class JobQueue:
+    def __init__(self, stages: Sequence[str], pool: Optional[ConnectionPool] = None,
+                 lease_seconds: float = JOB_LEASE_SECONDS, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.stages = tuple(stages)
+        self.pool = pool or get_pool()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def _next_stage(self, stage: str) -> Optional[str]:
+        index = self.stages.index(stage)
+        return self.stages[index + 1] if index + 1 < len(self.stages) else None
+
+    def _previous_stage(self, stage: str) -> Optional[str]:
+        index = self.stages.index(stage)
+        return self.stages[index - 1] if index > 0 else None
+
+    def enqueue_run(self, run_id: str, units: List[str], payload: Optional[Dict[str, Any]] = None) -> int:
+        """Queue the first stage of every unit; units already queued for this run are left alone"""
+        with self.pool.cursor() as cur:
+            cur.execute("""
+                INSERT INTO scan_jobs (run_id, unit, stage, max_attempts, payload)
+                SELECT %s, unit, %s, %s, %s::jsonb FROM unnest(%s::text[]) AS unit
+                ON CONFLICT (run_id, unit, stage) DO NOTHING;
+            """, (run_id, self.stages[0], self.max_attempts, dumps(payload or {}), list(units)))
+            queued = cur.rowcount
+        logger.info(f"[+] Queued {queued} unit(s) for run {run_id}")
+        return queued
+
+    def claim(self, worker_id: str, stages: Optional[List[str]] = None) -> Optional[Job]:
+        """Lease the oldest open job (optionally only of `stages`), including jobs whose lease expired"""
+        with self.pool.cursor() as cur:
+            cur.execute(f"""
+                UPDATE scan_jobs SET
+                    status = 'running', worker_id = %(worker)s, attempts = attempts + 1,
+                    heartbeat_at = NOW(), lease_expires_at = NOW() + make_interval(secs => %(lease)s),
+                    last_error = CASE WHEN status = 'running' THEN 'lease expired' ELSE last_error END
+                WHERE id = (
+                    SELECT id FROM scan_jobs
+                    WHERE ((status = 'queued' AND available_at <= NOW())
+                           OR (status = 'running' AND lease_expires_at < NOW()))
+                      AND attempts < max_attempts
+                      AND (%(stages)s::text[] IS NULL OR stage = ANY(%(stages)s::text[]))
+                    ORDER BY available_at, id
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING {_JOB_COLUMNS};
+            """, {"worker": worker_id, "lease": self.lease_seconds, "stages": stages})
+            row = cur.fetchone()
+        if row is None:
+            return None
+        job = Job(*row, worker_id=worker_id)
+        logger.info(f"[*] {worker_id} claimed {job}")
+        return job
+
+    def reap(self) -> int:
+        """Fail running jobs whose lease expired on their last attempt"""
+        with self.pool.cursor() as cur:
+            cur.execute("""
+                UPDATE scan_jobs SET status = 'failed', finished_at = NOW(), lease_expires_at = NULL,
+                    last_error = 'lease expired on the last attempt'
+                WHERE status = 'running' AND lease_expires_at < NOW() AND attempts >= max_attempts;
+            """)
+            reaped = cur.rowcount
+        if reaped:
+            logger.warning(f"[!] Marked {reaped} job(s) failed after their final lease expired")
+        return reaped
+
+    def heartbeat(self, job: Job) -> bool:
+        """Extend the lease; False means it was lost and the job must be abandoned"""
+        with self.pool.cursor() as cur:
+            cur.execute("""
+                UPDATE scan_jobs SET heartbeat_at = NOW(), lease_expires_at = NOW() + make_interval(secs => %s)
+                WHERE id = %s AND status = 'running' AND worker_id = %s AND attempts = %s;
+            """, (self.lease_seconds, job.id, job.worker_id, job.attempts))
+            return cur.rowcount == 1
+
+    def stage_input(self, job: Job) -> Any:
+        """Output of the unit's previous stage (None for the first stage)"""
+        previous = self._previous_stage(job.stage)
+        if previous is None:
+            return None
+        with self.pool.cursor() as cur:
+            cur.execute("SELECT result FROM scan_jobs WHERE run_id = %s AND unit = %s AND stage = %s AND status = 'done';",
+                        (job.run_id, job.unit, previous))
+            row = cur.fetchone()
+        if row is None or row[0] is None:
+            raise LookupError(f"No output of stage '{previous}' for {job.unit} in run {job.run_id}")
+        return row[0]
+
+    def complete(self, job: Job, result: Any):
+        """Store the result, queue the unit's next stage and drop the previous stage's output, atomically"""
+        next_stage, previous = self._next_stage(job.stage), self._previous_stage(job.stage)
+        with self.pool.cursor() as cur:
+            cur.execute("""
+                UPDATE scan_jobs SET status = 'done', result = %s::jsonb, finished_at = NOW(),
+                    lease_expires_at = NULL, last_error = NULL
+                WHERE id = %s AND status = 'running' AND worker_id = %s AND attempts = %s;
+            """, (dumps(result), job.id, job.worker_id, job.attempts))
+            if cur.rowcount != 1:
+                raise LeaseLostError(f"{job} lost its lease before completing")
+            if next_stage is not None:
+                cur.execute("""
+                    INSERT INTO scan_jobs (run_id, unit, stage, max_attempts, payload)
+                    VALUES (%s, %s, %s, %s, %s::jsonb)
+                    ON CONFLICT (run_id, unit, stage) DO NOTHING;
+                """, (job.run_id, job.unit, next_stage, self.max_attempts, dumps(job.payload)))
+            if previous is not None:
+                cur.execute("UPDATE scan_jobs SET result = NULL WHERE run_id = %s AND unit = %s AND stage = %s;",
+                            (job.run_id, job.unit, previous))
+        logger.info(f"[+] {job.worker_id} finished {job}")
+
+    def fail(self, job: Job, error: str) -> str:
+        """Schedule a retry with jittered exponential backoff, or mark the job failed; returns the new status"""
+        delay = random.uniform(0.5, 1.0) * min(JOB_RETRY_CAP, JOB_RETRY_BASE * 2 ** (job.attempts - 1))
+        with self.pool.cursor() as cur:
+            cur.execute("""
+                UPDATE scan_jobs SET
+                    status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                    finished_at = CASE WHEN attempts >= max_attempts THEN NOW() END,
+                    available_at = NOW() + make_interval(secs => %s),
+                    last_error = %s, worker_id = NULL, lease_expires_at = NULL
+                WHERE id = %s AND status = 'running' AND worker_id = %s AND attempts = %s
+                RETURNING status;
+            """, (delay, error[:2000], job.id, job.worker_id, job.attempts))
+            row = cur.fetchone()
+        if row is None:
+            raise LeaseLostError(f"{job} lost its lease before failing")
+        if row[0] == "failed":
+            logger.error(f"[!] {job} failed permanently: {error}")
+        else:
+            logger.warning(f"[!] {job} failed, retrying in {delay:.0f}s: {error}")
+        return row[0]
+
+    def release(self, job: Job):
+        """Hand an unstarted or interrupted job back without counting the attempt (e.g. on shutdown)"""
+        with self.pool.cursor() as cur:
+            cur.execute("""
+                UPDATE scan_jobs SET status = 'queued', attempts = attempts - 1, worker_id = NULL,
+                    lease_expires_at = NULL, available_at = NOW()
+                WHERE id = %s AND status = 'running' AND worker_id = %s AND attempts = %s;
+            """, (job.id, job.worker_id, job.attempts))
+
+    def open_jobs(self) -> int:
+        """Jobs of any run that are queued (including pending retries) or running"""
+        with self.pool.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM scan_jobs WHERE status IN ('queued', 'running');")
+            return cur.fetchone()[0]
+
+    def retry_failed(self, run_id: str) -> int:
+        """Give the failed jobs of a run a fresh set of attempts"""
+        with self.pool.cursor() as cur:
+            cur.execute("""
+                UPDATE scan_jobs SET status = 'queued', attempts = 0, available_at = NOW(), finished_at = NULL
+                WHERE run_id = %s AND status = 'failed';
+            """, (run_id,))
+            return cur.rowcount
+
+    def status(self, run_id: str) -> Dict[str, Dict[str, int]]:
+        """{stage: {status: job count}} for a run"""
+        with self.pool.cursor() as cur:
+            cur.execute("SELECT stage, status, COUNT(*) FROM scan_jobs WHERE run_id = %s GROUP BY stage, status;",
+                        (run_id,))
+            rows = cur.fetchall()
+        counts: Dict[str, Dict[str, int]] = {stage: {} for stage in self.stages}
+        for stage, status, count in rows:
+            counts.setdefault(stage, {})[status] = count
+        return counts
+
+    def latest_run(self) -> Optional[str]:
+        with self.pool.cursor() as cur:
+            cur.execute("SELECT run_id FROM scan_jobs ORDER BY created_at DESC, id DESC LIMIT 1;")
+            row = cur.fetchone()
+        return row[0] if row else None
@@ -0,0 +1,223 @@
+# src/core/pipeline.py
+
+"""
+Staged, thread-based processing pipeline with bounded queues.
+
+Each stage owns an input queue and a pool of worker threads. A worker takes
+an item, runs the stage function on it and puts the result on the next
+stage's queue; when that queue is full the put blocks, so a slow stage
+throttles the stages in front of it instead of buffering without limit.
+Items flow through one at a time, so work from a fast source reaches the
+last stage while slower sources are still producing.
+
+A stage function returns the item to pass on, or None to drop it; with
+expand=True it returns an iterable (typically a generator) and every element
+is passed on as it is produced. Errors are logged and counted, and the
+failing item is dropped.
+
+stop() abandons the run: every thread blocked on a full or empty queue gives
+up within STOP_POLL_INTERVAL and run() raises PipelineStopped. A source or
+stage that raises something other than Exception (KeyboardInterrupt,
+SystemExit) stops the pipeline the same way, so a dead consumer never leaves
+its producers blocked on put() forever.
+"""
+
+import time
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from src.core.logger import logger
+
+QUEUE_SIZE = 16
+REPORT_INTERVAL = 30.0  # seconds between progress reports while running; 0 disables
+STOP_POLL_INTERVAL = 0.5  # seconds a blocked put/get waits before checking for stop()
+
+_DONE = object()
+
+class PipelineStopped(Exception):
+    """The pipeline was stopped before every item drained"""
+
+class StageStats:
+    __slots__ = ("items_in", "items_out", "errors", "busy_seconds", "max_queue_depth", "depth_total", "depth_samples")
+
+    def __init__(self):
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self.depth_total = 0
+        self.depth_samples = 0
+
+    def throughput(self, wall_seconds: float) -> float:
+        """Items finished per second of wall time"""
+        return self.items_in / wall_seconds if wall_seconds > 0 else 0.0
+
+    def mean_queue_depth(self) -> float:
+        return self.depth_total / self.depth_samples if self.depth_samples else 0.0
+
+class Stage:
+    def __init__(self, name: str, fn: Callable[[Any], Any], workers: int = 1,
+                 queue_size: int = QUEUE_SIZE, expand: bool = False):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.expand = expand
+        self.stats = StageStats()
+
+class Pipeline:
+    def __init__(self, stages: List[Stage], report_interval: float = REPORT_INTERVAL):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.report_interval = report_interval
+        self.queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._stopped = threading.Event()
+        self.started_at: Optional[float] = None
+        self.wall_seconds = 0.0
+
+    def stop(self):
+        """Abandon the run: queued items are dropped and blocked threads give up"""
+        self._stopped.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped.is_set()
+
+    def _put(self, index: int, item: Any):
+        """Blocking put on stage `index`'s queue (this is where backpressure happens)"""
+        while True:
+            if self._stopped.is_set():
+                raise PipelineStopped(f"Pipeline stopped before stage '{self.stages[index].name}' took the item")
+            try:
+                self.queues[index].put(item, timeout=STOP_POLL_INTERVAL)
+                break
+            except queue.Full:
+                continue
+        depth = self.queues[index].qsize()
+        stats = self.stages[index].stats
+        with self._lock:
+            stats.max_queue_depth = max(stats.max_queue_depth, depth)
+            stats.depth_total += depth
+            stats.depth_samples += 1
+
+    def _get(self, index: int) -> Any:
+        """Next item for stage `index`, or _DONE once the pipeline is stopped"""
+        while not self._stopped.is_set():
+            try:
+                return self.queues[index].get(timeout=STOP_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _close(self, index: int):
+        """Tell every worker of stage `index` that no more items are coming"""
+        try:
+            for _ in range(self.stages[index].workers):
+                self._put(index, _DONE)
+        except PipelineStopped:
+            pass  # the workers notice the stop on their own
+
+    def _worker(self, index: int, remaining: List[int]):
+        try:
+            self._work(index)
+        except BaseException:
+            self.stop()
+            raise
+        finally:
+            # The last worker of a stage to finish closes the next stage
+            with self._lock:
+                remaining[index] -= 1
+                closing = remaining[index] == 0
+            if closing and index < len(self.stages) - 1:
+                self._close(index + 1)
+
+    def _work(self, index: int):
+        stage = self.stages[index]
+        is_last = index == len(self.stages) - 1
+        while True:
+            item = self._get(index)
+            if item is _DONE:
+                break
+            started = time.perf_counter()
+            emitted = 0
+            waited = 0.0  # time blocked on the next queue does not count as busy
+            result = None
+            try:
+                result = stage.fn(item)
+                # Expanding stages hand each output on as soon as it is produced
+                for output in (result or ()) if stage.expand else ([] if result is None else [result]):
+                    emitted += 1
+                    if not is_last:
+                        put_started = time.perf_counter()
+                        self._put(index + 1, output)
+                        waited += time.perf_counter() - put_started
+            except PipelineStopped:
+                if stage.expand and hasattr(result, "close"):
+                    result.close()  # let a generator source clean up
+                break
+            except Exception as e:
+                logger.error(f"[!] Pipeline stage '{stage.name}' failed: {e}")
+                with self._lock:
+                    stage.stats.errors += 1
+            with self._lock:
+                stage.stats.items_in += 1
+                stage.stats.items_out += emitted
+                stage.stats.busy_seconds += time.perf_counter() - started - waited
+
+    def _monitor(self):
+        while not self._finished.wait(self.report_interval):
+            self.report(progress=True)
+
+    def run(self, source: Iterable[Any]) -> Dict[str, StageStats]:
+        """
+        Feed `source` into the first stage and block until every stage has drained.
+
+        Raises PipelineStopped if the run was stopped before that.
+        """
+        self.started_at = time.perf_counter()
+        remaining = [stage.workers for stage in self.stages]
+        threads = [
+            threading.Thread(target=self._worker, args=(index, remaining),
+                             name=f"pipeline-{stage.name}-{n}", daemon=True)
+            for index, stage in enumerate(self.stages) for n in range(stage.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        if self.report_interval:
+            threading.Thread(target=self._monitor, name="pipeline-monitor", daemon=True).start()
+
+        try:
+            for item in source:
+                self._put(0, item)
+        except BaseException:
+            self.stop()
+            raise
+        finally:
+            self._close(0)
+            for thread in threads:
+                thread.join()
+            self._finished.set()
+            self.wall_seconds = time.perf_counter() - self.started_at
+
+        self.report()
+        if self._stopped.is_set():
+            raise PipelineStopped("Pipeline stopped before every item drained")
+        return {stage.name: stage.stats for stage in self.stages}
+
+    def report(self, progress: bool = False):
+        """Log per-stage throughput and queue depth"""
+        wall_seconds = time.perf_counter() - self.started_at if progress else self.wall_seconds
+        logger.info(f"[*] Pipeline {'progress' if progress else 'finished'} after {wall_seconds:.1f}s")
+        for index, stage in enumerate(self.stages):
+            stats = stage.stats
+            depth = self.queues[index].qsize() if progress else stats.max_queue_depth
+            logger.info(
+                f"[*]   {stage.name:<10} workers={stage.workers} in={stats.items_in} out={stats.items_out} "
+                f"errors={stats.errors} {stats.throughput(wall_seconds):.1f}/s busy={stats.busy_seconds:.1f}s "
+                f"queue={'now' if progress else 'max'} {depth}/{stage.queue_size} "
+                f"(mean {stats.mean_queue_depth():.1f})"
+            )
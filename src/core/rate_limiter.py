@@ -0,0 +1,326 @@
+# src/core/rate_limiter.py
+
+"""
+Client-side rate limiting and circuit breaking for AWS API calls.
+
+Every client built by src.core.aws_clients gets botocore event hooks (see
+install_hooks) that route each request through a shared AWSCallGuard:
+
+- before-send: every HTTP attempt, retries included, takes a token from
+  the token bucket for its (account, service, region, quota). AWS quotas
+  apply per account, so each account scanned with assumed-role credentials
+  gets its own buckets. Buckets are sized from the published AWS
+  request-rate quotas, so callers block briefly instead of being throttled. A caller that would wait longer than
+  AWS_RATE_LIMIT_MAX_WAIT seconds gets RateLimitTimeout instead.
+- response-received: a throttling error halves the bucket's rate and
+  pauses it for a jittered, exponentially growing interval shared by
+  every thread; successful responses restore the rate step by step.
+  With botocore's "adaptive" retry mode botocore already adjusts its own
+  send rate, so only the fixed quota is enforced here.
+- before-call / after-call: one circuit breaker per (service, region), so
+  an outage of one service (say CloudWatch) does not cut off the others
+  in the same region. After AWS_CIRCUIT_FAILURE_THRESHOLD consecutive
+  calls fail with 5xx, connection or throttling errors (after botocore's
+  retries), calls to that service in that region fail fast with
+  CircuitOpenError for AWS_CIRCUIT_RESET_TIMEOUT seconds, then a single
+  trial call decides whether the circuit closes again.
+
+Configuration (environment):
+  AWS_RATE_LIMIT_SCALE        share of each quota to use (0.8); the rest is
+                              left for other tools using the same account
+  AWS_RATE_LIMITS             overrides, e.g. "ec2=10:50,ce=2" (rate[:burst])
+  AWS_RATE_LIMIT_MAX_WAIT     longest a call may wait for a token (30)
+  AWS_CIRCUIT_FAILURE_THRESHOLD, AWS_CIRCUIT_RESET_TIMEOUT
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+# (requests per second, burst) per service, or per "service.Operation" where the operation has its own quota
+DEFAULT_QUOTAS: Dict[str, Tuple[float, int]] = {
+    "ec2": (20.0, 100),                            # non-mutating actions bucket
+    "cloudwatch": (50.0, 50),
+    "cloudwatch.GetMetricData": (50.0, 50),
+    "cloudwatch.GetMetricStatistics": (400.0, 400),
+    "pricing": (10.0, 10),
+    "ce": (5.0, 5),
+    "sts": (50.0, 50),
+}
+FALLBACK_QUOTA = (10.0, 10)
+DEFAULT_ACCOUNT = "default"  # bucket key of clients on the default credentials
+
+RATE_LIMIT_SCALE = float(os.getenv("AWS_RATE_LIMIT_SCALE", "0.8"))
+RATE_LIMIT_MAX_WAIT = float(os.getenv("AWS_RATE_LIMIT_MAX_WAIT", "30"))
+MIN_RATE_FRACTION = 0.05     # adaptive backoff never drops below 5% of the quota
+RECOVERY_FRACTION = 0.05     # each success restores 5% of the quota
+BACKOFF_BASE = 0.5           # seconds
+BACKOFF_CAP = 20.0           # seconds, same cap botocore uses between retries
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("AWS_CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("AWS_CIRCUIT_RESET_TIMEOUT", "60"))
+
+# Error codes botocore's standard retry mode treats as throttling
+THROTTLING_ERROR_CODES = frozenset((
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestThrottledException",
+    "TooManyRequestsException", "ProvisionedThroughputExceededException", "TransactionInProgressException",
+    "RequestLimitExceeded", "BandwidthLimitExceeded", "LimitExceededException", "RequestThrottled",
+    "SlowDown", "PriorRequestNotComplete", "EC2ThrottledException",
+))
+
+class CallRejectedError(Exception):
+    """An AWS call was not sent because the limiter shed it"""
+
+class RateLimitTimeout(CallRejectedError):
+    def __init__(self, service: str, region: str, wait: float):
+        super().__init__(f"{service} in {region} is rate limited, next slot in {wait:.1f}s")
+        self.service, self.region, self.wait = service, region, wait
+
+    def __reduce__(self):  # picklable, so it can cross process pool boundaries
+        return self.__class__, (self.service, self.region, self.wait)
+
+class CircuitOpenError(CallRejectedError):
+    def __init__(self, service: str, region: str, retry_after: float):
+        super().__init__(f"Circuit open for {service} in {region}, retry in {retry_after:.0f}s")
+        self.service, self.region, self.retry_after = service, region, retry_after
+
+    def __reduce__(self):
+        return self.__class__, (self.service, self.region, self.retry_after)
+
+def error_code(error: BaseException) -> Optional[str]:
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code")
+    return None
+
+def is_throttled(error: BaseException) -> bool:
+    """True when a call failed because of throttling or load shedding, not because of bad input"""
+    return isinstance(error, CallRejectedError) or error_code(error) in THROTTLING_ERROR_CODES
+
+def parse_overrides(value: str) -> Dict[str, Tuple[float, int]]:
+    """Parse AWS_RATE_LIMITS ("ec2=10:50,ce=2") into {quota key: (rate, burst)}"""
+    overrides = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        try:
+            key, spec = entry.split("=", 1)
+            rate, _, burst = spec.partition(":")
+            overrides[key.strip()] = (float(rate), int(burst) if burst else max(1, int(float(rate))))
+        except ValueError:
+            logger.warning(f"[!] Ignoring malformed AWS_RATE_LIMITS entry: {entry}")
+    return overrides
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second up to `burst`.
+
+    acquire() reserves a token and sleeps outside the lock until it is due,
+    so waiting callers are served in arrival order without spinning.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.quota = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.throttle_streak = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        start = max(self.updated, self.paused_until)
+        if now > start:
+            self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self.updated = max(self.updated, now)
+
+    def acquire(self, max_wait: Optional[float] = None) -> float:
+        """
+        Take one token, sleeping until it is available; return the time waited.
+        Returns -wait without taking a token when the wait would exceed max_wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(self.paused_until - now, 0.0)
+            if self.tokens < 1:
+                wait += (1 - self.tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                return -wait
+            self.tokens -= 1  # may go negative: later callers queue behind this reservation
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def throttled(self) -> float:
+        """Multiplicative decrease plus a jittered pause; returns the pause length"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.quota * MIN_RATE_FRACTION, self.rate / 2)
+            self.throttle_streak += 1
+            pause = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** self.throttle_streak))
+            self.paused_until = max(self.paused_until, now + pause)
+            self.tokens = min(self.tokens, 0.0)
+            return pause
+
+    def succeeded(self):
+        """Additive increase back towards the quota"""
+        with self._lock:
+            self.throttle_streak = 0
+            if self.rate < self.quota:
+                self._refill(time.monotonic())
+                self.rate = min(self.quota, self.rate + self.quota * RECOVERY_FRACTION)
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, service: str, region: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.service = service
+        self.region = region
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless the call may go ahead"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                retry_after = self.opened_at + self.reset_timeout - now
+                if retry_after > 0:
+                    raise CircuitOpenError(self.service, self.region, retry_after)
+                self.state = self.HALF_OPEN
+                logger.info(f"[*] Circuit for {self.service} in {self.region} half-open, sending a trial call")
+            elif now - self.trial_started < self.reset_timeout:
+                # A trial call is in flight; everyone else waits for its outcome
+                raise CircuitOpenError(self.service, self.region, self.trial_started + self.reset_timeout - now)
+            self.trial_started = now
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"[+] Circuit for {self.service} in {self.region} closed")
+            self.state, self.failures = self.CLOSED, 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                logger.warning(f"[!] Circuit for {self.service} in {self.region} opened after {self.failures} "
+                               f"failed call(s); failing fast for {self.reset_timeout:.0f}s")
+                self.state, self.opened_at = self.OPEN, time.monotonic()
+
+class AWSCallGuard:
+    """
+    Process-wide token buckets per (account, service, region, quota) and
+    circuit breakers per (service, region)
+    """
+
+    def __init__(self, quotas: Optional[Dict[str, Tuple[float, int]]] = None, scale: float = RATE_LIMIT_SCALE,
+                 max_wait: float = RATE_LIMIT_MAX_WAIT):
+        self.quotas = dict(DEFAULT_QUOTAS)
+        self.quotas.update(quotas if quotas is not None else parse_overrides(os.getenv("AWS_RATE_LIMITS", "")))
+        self.scale = scale
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str, str, str], TokenBucket] = {}
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+    def _quota_key(self, service: str, operation: str) -> str:
+        key = f"{service}.{operation}"
+        return key if key in self.quotas else service
+
+    def bucket(self, service: str, region: str, operation: str, account_id: Optional[str] = None) -> TokenBucket:
+        """Bucket for one account's quota; account_id None is the default credentials' account"""
+        quota_key = self._quota_key(service, operation)
+        key = (account_id or DEFAULT_ACCOUNT, service, region, quota_key)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate, burst = self.quotas.get(quota_key, FALLBACK_QUOTA)
+                bucket = TokenBucket(max(rate * self.scale, 0.1), max(1, int(burst * self.scale)))
+                self._buckets[key] = bucket
+            return bucket
+
+    def breaker(self, service: str, region: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get((service, region))
+            if breaker is None:
+                breaker = self._breakers[(service, region)] = CircuitBreaker(service, region)
+            return breaker
+
+    def set_scale(self, scale: float):
+        """Use a different share of each quota; buckets are rebuilt on next use"""
+        with self._lock:
+            if scale != self.scale:
+                self.scale = scale
+                self._buckets.clear()
+
+    def acquire(self, service: str, region: str, operation: str, account_id: Optional[str] = None):
+        waited = self.bucket(service, region, operation, account_id).acquire(self.max_wait)
+        if waited < 0:
+            raise RateLimitTimeout(service, region, -waited)
+        if waited > 1:
+            logger.debug(f"[*] Waited {waited:.1f}s for a {service} {operation} slot in {region}")
+
+    def status(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            return {
+                "buckets": {"/".join(key): round(bucket.rate, 2) for key, bucket in self._buckets.items()},
+                "circuits": {"/".join(key): breaker.state for key, breaker in self._breakers.items()},
+            }
+
+def install_hooks(client, service: str, region: str, guard: AWSCallGuard, adaptive_retries: bool = False,
+                  account_id: Optional[str] = None):
+    """Register the limiter and breaker on a client's event system"""
+    breaker = guard.breaker(service, region)
+
+    def before_call(**kwargs):
+        breaker.before_call()
+
+    def before_send(event_name: str = "", **kwargs):
+        guard.acquire(service, region, event_name.rsplit(".", 1)[-1], account_id)
+
+    def response_received(event_name: str = "", parsed_response=None, **kwargs):
+        if adaptive_retries:
+            return  # botocore's adaptive mode adjusts the send rate itself
+        code = (parsed_response or {}).get("Error", {}).get("Code")
+        bucket = guard.bucket(service, region, event_name.rsplit(".", 1)[-1], account_id)
+        if code in THROTTLING_ERROR_CODES:
+            pause = bucket.throttled()
+            logger.warning(f"[!] {service} throttled in {region} ({code}); "
+                           f"rate lowered to {bucket.rate:.1f}/s, pausing {pause:.1f}s")
+        elif parsed_response is not None and not code:
+            bucket.succeeded()
+
+    def after_call(http_response=None, parsed=None, **kwargs):
+        code = (parsed or {}).get("Error", {}).get("Code")
+        if http_response is not None and (http_response.status_code >= 500 or code in THROTTLING_ERROR_CODES):
+            breaker.record_failure()
+        else:
+            breaker.record_success()  # 4xx client errors say nothing about the region's health
+
+    def after_call_error(exception=None, **kwargs):
+        if not isinstance(exception, CallRejectedError):  # shed locally, never reached AWS
+            breaker.record_failure()
+
+    events = client.meta.events
+    events.register("before-call", before_call)
+    events.register("before-send", before_send)
+    events.register("response-received", response_received)
+    events.register("after-call", after_call)
+    events.register("after-call-error", after_call_error)
+
+# Export shared guard
+guard = AWSCallGuard()
@@ -0,0 +1,293 @@
+# src/core/scan_archive.py
+
+"""
+Daily compaction and retention for the scan output directory.
+
+ScanCompactor.run() merges every scan file of a finished UTC day into one NDJSON
+archive (ec2_archive_<day>.<generation>.ndjson) plus an index
+(ec2_archive_<day>.index.json) holding the source file names, record count,
+time range and per-instance byte offsets.
+
+The index is the commit point. Readers only see an archive once its index
+exists, and from then on they ignore the source files it lists. The index is
+swapped in with os.replace, so a concurrent reader sees either the old files
+or the new archive, never both and never a partial file. Sources and
+superseded generations are removed at the end of the run, under an exclusive
+lock on .readers.lock; readers hold it shared (read_lock) from listing the
+directory until they are done reading, so no file disappears under them.
+Files a crashed run failed to remove are collected by the next run.
+
+Retention: archives older than SCAN_RAW_RETENTION_DAYS are downsampled to
+one record per instance per SCAN_DOWNSAMPLE_HOURS (metrics averaged), and
+archives older than SCAN_MAX_RETENTION_DAYS (0 = keep forever) are deleted.
+"""
+
+import os
+import re
+import fcntl
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from src.core.logger import logger
+from src.core.serialization import dumps_bytes, loads
+
+SCAN_DIR = "/app/data/output/ec2/"
+RAW_RETENTION_DAYS = int(os.getenv("SCAN_RAW_RETENTION_DAYS", "30"))
+DOWNSAMPLE_HOURS = int(os.getenv("SCAN_DOWNSAMPLE_HOURS", "24"))
+MAX_RETENTION_DAYS = int(os.getenv("SCAN_MAX_RETENTION_DAYS", "365"))
+
+ARCHIVE_PREFIX = "ec2_archive_"
+INDEX_SUFFIX = ".index.json"
+AVERAGED_METRICS = ("CPUUtilization", "NetworkIn", "NetworkOut")
+LOCK_NAME = ".compaction.lock"
+READ_LOCK_NAME = ".readers.lock"
+
+_ARCHIVE_INDEX = re.compile(r"^ec2_archive_(\d{4}-\d{2}-\d{2})\.index\.json$")
+_ARCHIVE_DATA = re.compile(r"^ec2_archive_\d{4}-\d{2}-\d{2}\.\d+\.ndjson$")
+# Save time in scan file names: ec2_scan_2025-01-31T12-00-00.json, instances_us-east-1_20250131_120000.json
+_FILENAME_TIMES = (
+    (re.compile(r"(\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2})"), "%Y-%m-%dT%H-%M-%S"),
+    (re.compile(r"(\d{8}_\d{6})"), "%Y%m%d_%H%M%S"),
+)
+
+def filename_time(name: str) -> Optional[datetime]:
+    """Save time encoded in a raw scan file name, if any"""
+    for pattern, fmt in _FILENAME_TIMES:
+        match = pattern.search(name)
+        if match:
+            return datetime.strptime(match.group(1), fmt)
+    return None
+
+def is_archive_file(name: str) -> bool:
+    return name.startswith(ARCHIVE_PREFIX)
+
+@contextmanager
+def read_lock(directory: str):
+    """
+    Hold the directory's reader lock (shared) while listing and reading scan
+    files, so the compactor cannot delete them in the meantime.
+    """
+    try:
+        lock = open(os.path.join(directory, READ_LOCK_NAME), "a")
+    except OSError:  # missing or read-only directory: there is no compactor to wait for
+        yield
+        return
+    with lock:
+        fcntl.flock(lock, fcntl.LOCK_SH)
+        yield
+
+def read_indexes(directory: str) -> Dict[str, Dict[str, Any]]:
+    """{day: index} for every committed archive in `directory`"""
+    indexes = {}
+    if not os.path.isdir(directory):
+        return indexes
+    for name in os.listdir(directory):
+        match = _ARCHIVE_INDEX.match(name)
+        if not match:
+            continue
+        try:
+            with open(os.path.join(directory, name), "rb") as f:
+                indexes[match.group(1)] = loads(f.read())
+        except Exception as e:
+            logger.warning(f"[!] Ignoring unreadable archive index {name}: {e}")
+    return indexes
+
+def visible_files(directory: str, extensions: Tuple[str, ...] = (".json", ".ndjson"),
+                  indexes: Optional[Dict[str, Dict[str, Any]]] = None) -> List[str]:
+    """
+    Consistent view of the scan directory: committed archive data files plus
+    raw files that no committed archive has absorbed, in name order.
+    """
+    if not os.path.isdir(directory):
+        return []
+    indexes = read_indexes(directory) if indexes is None else indexes
+    archived: Set[str] = set()
+    current_data = set()
+    for index in indexes.values():
+        archived.update(index.get("sources", []))
+        current_data.add(index["data_file"])
+
+    names = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(extensions) or name.startswith("."):
+            continue
+        if is_archive_file(name):
+            if name in current_data:
+                names.append(name)
+        elif name not in archived:
+            names.append(name)
+    return names
+
+def _write_atomic(path: str, write):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _record_key(record: Dict[str, Any]) -> Tuple[str, str]:
+    return (str(record.get("timestamp", "")), str(record.get("InstanceId", "")))
+
+def downsample(records: Iterable[Dict[str, Any]], hours: int = DOWNSAMPLE_HOURS) -> List[Dict[str, Any]]:
+    """One record per instance per `hours` bucket: latest fields, averaged metrics, SampleCount"""
+    buckets: Dict[Tuple[str, int], Dict[str, Any]] = {}
+    sums: Dict[Tuple[str, int], Dict[str, List[float]]] = {}
+    for record in sorted(records, key=_record_key):
+        try:
+            timestamp = datetime.fromisoformat(str(record["timestamp"])[:26]).replace(tzinfo=timezone.utc)
+        except (KeyError, ValueError):
+            continue  # no usable timestamp: the record cannot be bucketed
+        key = (record.get("InstanceId"), int(timestamp.timestamp() // (hours * 3600)))
+        previous = buckets.get(key)
+        count = (previous or {}).get("SampleCount", 0) + record.get("SampleCount", 1)
+        buckets[key] = {**record, "SampleCount": count}
+        for metric in AVERAGED_METRICS:
+            value = record.get(metric)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                total = sums.setdefault(key, {}).setdefault(metric, [0.0, 0])
+                weight = record.get("SampleCount", 1)
+                total[0] += value * weight
+                total[1] += weight
+
+    for key, record in buckets.items():
+        for metric, (total, weight) in sums.get(key, {}).items():
+            record[metric] = round(total / weight, 4)
+    return sorted(buckets.values(), key=_record_key)
+
+class ScanCompactor:
+    def __init__(self, directory: str = SCAN_DIR, raw_retention_days: int = RAW_RETENTION_DAYS,
+                 downsample_hours: int = DOWNSAMPLE_HOURS, max_retention_days: int = MAX_RETENTION_DAYS):
+        self.directory = directory
+        self.raw_retention_days = raw_retention_days
+        self.downsample_hours = downsample_hours
+        self.max_retention_days = max_retention_days
+
+    def _day_of(self, name: str) -> str:
+        saved_at = filename_time(name)
+        if saved_at is None:
+            saved_at = datetime.utcfromtimestamp(os.path.getmtime(os.path.join(self.directory, name)))
+        return saved_at.date().isoformat()
+
+    def _read_archive(self, index: Dict[str, Any]) -> List[Dict[str, Any]]:
+        from src.core.scan_loader import iter_ndjson
+        return list(iter_ndjson(os.path.join(self.directory, index["data_file"])))
+
+    def _commit(self, day: str, records: List[Dict[str, Any]], sources: List[str],
+                previous: Optional[Dict[str, Any]], downsampled: bool) -> Dict[str, Any]:
+        """Write a new archive generation for `day` and swap its index in"""
+        generation = (previous or {}).get("generation", 0) + 1
+        data_file = f"{ARCHIVE_PREFIX}{day}.{generation}.ndjson"
+        instances: Dict[str, List[int]] = {}
+
+        def write_data(f):
+            offset = 0
+            for record in records:
+                line = dumps_bytes(record) + b"\n"
+                instances.setdefault(record.get("InstanceId"), []).append(offset)
+                f.write(line)
+                offset += len(line)
+
+        _write_atomic(os.path.join(self.directory, data_file), write_data)
+        timestamps = [str(r.get("timestamp", "")) for r in records if r.get("timestamp")]
+        index = {
+            "day": day,
+            "generation": generation,
+            "data_file": data_file,
+            "sources": sorted(set((previous or {}).get("sources", [])) | set(sources)),
+            "records": len(records),
+            "min_timestamp": min(timestamps) if timestamps else None,
+            "max_timestamp": max(timestamps) if timestamps else None,
+            "downsampled": downsampled,
+            "instances": instances,
+            "compacted_at": datetime.utcnow().isoformat()
+        }
+        # Commit point: readers switch to the new archive as soon as this rename lands
+        _write_atomic(os.path.join(self.directory, f"{ARCHIVE_PREFIX}{day}{INDEX_SUFFIX}"),
+                      lambda f: f.write(dumps_bytes(index)))
+        return index  # the sources and the previous generation are now garbage, see collect_garbage
+
+    def _garbage(self, indexes: Dict[str, Dict[str, Any]]) -> List[str]:
+        """Raw files absorbed by an archive and archive generations no index points to"""
+        absorbed = {source for index in indexes.values() for source in index.get("sources", [])}
+        current = {index["data_file"] for index in indexes.values()}
+        return [name for name in sorted(os.listdir(self.directory))
+                if name in absorbed or (_ARCHIVE_DATA.match(name) and name not in current)]
+
+    def collect_garbage(self, indexes: Dict[str, Dict[str, Any]], expired: Iterable[str] = ()) -> int:
+        """Delete superseded and `expired` files once no reader holds the directory"""
+        names = self._garbage(indexes) + list(expired)
+        if not names:
+            return 0
+        with open(os.path.join(self.directory, READ_LOCK_NAME), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # waits for readers that listed the old files
+            for name in names:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+        return len(names)
+
+    def compact_day(self, day: str, sources: List[str], previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge raw `sources` (and any existing archive) of one day into a new archive generation"""
+        from src.core.scan_loader import load_task, RecordFilter
+        records = self._read_archive(previous) if previous else []
+        for name in sources:
+            path = os.path.join(self.directory, name)
+            records.extend(load_task((path, 0, -1), RecordFilter()))
+        records.sort(key=_record_key)
+        downsampled = bool(previous and previous.get("downsampled"))
+        if downsampled:
+            records = downsample(records, self.downsample_hours)
+        index = self._commit(day, records, sources, previous, downsampled)
+        logger.info(f"[+] Compacted {len(sources)} file(s) into {index['data_file']} ({len(records)} records)")
+        return index
+
+    def run(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Compact finished days, downsample and expire old archives; returns counters"""
+        now = now or datetime.utcnow()
+        today = now.date().isoformat()
+        stats = {"compacted_days": 0, "downsampled_days": 0, "expired_days": 0, "removed_files": 0}
+        if not os.path.isdir(self.directory):
+            logger.warning(f"[!] Directory not found: {self.directory}")
+            return stats
+
+        with open(os.path.join(self.directory, LOCK_NAME), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # one compactor per directory at a time
+            indexes = read_indexes(self.directory)
+
+            by_day: Dict[str, List[str]] = {}
+            for name in visible_files(self.directory, indexes=indexes):
+                if not is_archive_file(name):
+                    by_day.setdefault(self._day_of(name), []).append(name)
+
+            for day, sources in sorted(by_day.items()):
+                if day >= today:
+                    continue  # the current day is still being written
+                try:
+                    indexes[day] = self.compact_day(day, sources, indexes.get(day))
+                    stats["compacted_days"] += 1
+                except Exception as e:
+                    logger.error(f"[!] Failed to compact {day}: {e}")
+
+            downsample_before = (now - timedelta(days=self.raw_retention_days)).date().isoformat()
+            expire_before = (now - timedelta(days=self.max_retention_days)).date().isoformat()
+            expired: List[str] = []
+            for day, index in sorted(indexes.items()):
+                try:
+                    if self.max_retention_days and day < expire_before:
+                        expired.extend((f"{ARCHIVE_PREFIX}{day}{INDEX_SUFFIX}", index["data_file"]))
+                        expired.extend(index.get("sources", []))
+                        del indexes[day]
+                        stats["expired_days"] += 1
+                    elif day < downsample_before and not index.get("downsampled"):
+                        records = downsample(self._read_archive(index), self.downsample_hours)
+                        indexes[day] = self._commit(day, records, [], index, True)
+                        stats["downsampled_days"] += 1
+                except Exception as e:
+                    logger.error(f"[!] Retention failed for {day}: {e}")
+
+            stats["removed_files"] = self.collect_garbage(indexes, expired)
+
+        logger.info(f"[+] Compaction done: {stats}")
+        return stats
@@ -0,0 +1,238 @@
+# src/core/scan_loader.py
+
+"""
+Lazy, parallel loader for the scan archive.
+
+Reads both archive formats:
+  - .json    {"timestamp": ..., "data": [record, ...]} as written by save_json
+  - .ndjson  one JSON record per line, each with its own "timestamp"
+
+Work is split into tasks (a whole .json file, or a newline-aligned byte range
+of an .ndjson file) that run in a process pool, and records are yielded as
+tasks finish, in archive order or as soon as ready. At most a few tasks are
+in flight, so memory stays bounded by the task size rather than the archive
+size. Time-range and instance filters are applied inside the workers, and
+raw NDJSON lines that cannot match the instance filter are never decoded.
+"""
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta, timezone
+from typing import Any, Collection, Dict, Iterator, List, Optional, Tuple
+from src.core.logger import logger
+from src.core.scan_archive import filename_time, read_indexes, read_lock, visible_files
+from src.core.serialization import loads, save_records
+
+SCAN_DIR = "/app/data/output/ec2/"
+SCAN_EXTENSIONS = (".json", ".ndjson")
+NDJSON_CHUNK_BYTES = 8 * 1024 * 1024
+IN_FLIGHT_PER_WORKER = 2
+
+_FILENAME_SLACK = timedelta(hours=1)  # records are stamped a little before the file is saved
+
+Task = Tuple[str, int, int]  # (path, start offset, end offset); end -1 = whole file
+
+def parse_time(value: str) -> Optional[datetime]:
+    """Naive UTC datetime from an ISO timestamp, or None"""
+    try:
+        parsed = datetime.fromisoformat(str(value)[:26])
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo is None else parsed.astimezone(timezone.utc).replace(tzinfo=None)
+
+class RecordFilter:
+    """Time-range and instance-ID predicate applied before records leave a worker"""
+
+    def __init__(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 instance_ids: Optional[Collection[str]] = None):
+        self.since = since
+        self.until = until
+        self.instance_ids = frozenset(instance_ids) if instance_ids is not None else None
+
+    def file_may_match(self, path: str) -> bool:
+        """Skip whole raw files whose name puts them outside the time range"""
+        saved_at = filename_time(os.path.basename(path))
+        if saved_at is None or (self.since is None and self.until is None):
+            return True
+        if self.since and saved_at < self.since - _FILENAME_SLACK:
+            return False
+        if self.until and saved_at > self.until + _FILENAME_SLACK:
+            return False
+        return True
+
+    def line_may_match(self, line: bytes) -> bool:
+        """Cheap substring test on a raw NDJSON line before decoding it"""
+        if self.instance_ids is None:
+            return True
+        return any(instance_id.encode() in line for instance_id in self.instance_ids)
+
+    def archive_may_match(self, index: Dict[str, Any]) -> bool:
+        """Skip whole archives using their index: time range and instance list"""
+        if self.instance_ids is not None and not self.instance_ids.intersection(index.get("instances", {})):
+            return False
+        oldest, newest = parse_time(index.get("min_timestamp") or ""), parse_time(index.get("max_timestamp") or "")
+        if self.since and newest and newest < self.since:
+            return False
+        if self.until and oldest and oldest >= self.until:
+            return False
+        return True
+
+    def matches(self, record: Dict[str, Any]) -> bool:
+        if self.instance_ids is not None and record.get("InstanceId") not in self.instance_ids:
+            return False
+        if self.since is None and self.until is None:
+            return True
+        timestamp = parse_time(record.get("timestamp", ""))
+        if timestamp is None:
+            return False
+        return (self.since is None or timestamp >= self.since) and (self.until is None or timestamp < self.until)
+
+def _load_json(path: str, record_filter: RecordFilter) -> List[Dict[str, Any]]:
+    with open(path, "rb") as f:
+        content = loads(f.read())
+    file_timestamp = content.get("timestamp")
+    records = []
+    for record in content.get("data", []):
+        if not record.get("timestamp") and file_timestamp:
+            record["timestamp"] = file_timestamp
+        if record_filter.matches(record):
+            records.append(record)
+    return records
+
+def _load_ndjson_range(path: str, start: int, end: int, record_filter: RecordFilter) -> List[Dict[str, Any]]:
+    """Records from lines that start within [start, end)"""
+    records = []
+    with open(path, "rb") as f:
+        if start:
+            f.seek(start - 1)
+            f.readline()  # finish the line that straddles `start`; it belongs to the previous range
+        while end < 0 or f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            if not line.strip() or not record_filter.line_may_match(line):
+                continue
+            try:
+                record = loads(line)
+            except ValueError as e:
+                logger.warning(f"[!] Skipping malformed line in {path}: {e}")
+                continue
+            if record_filter.matches(record):
+                records.append(record)
+    return records
+
+def load_task(task: Task, record_filter: RecordFilter) -> List[Dict[str, Any]]:
+    """Worker entry point: load and filter the records of one task"""
+    path, start, end = task
+    try:
+        if path.endswith(".ndjson"):
+            return _load_ndjson_range(path, start, end, record_filter)
+        return _load_json(path, record_filter)
+    except Exception as e:
+        logger.error(f"[!] Error loading {path}: {e}")
+        return []
+
+def iter_ndjson(path: str, record_filter: Optional[RecordFilter] = None) -> Iterator[Dict[str, Any]]:
+    """Stream an NDJSON file record by record in constant memory"""
+    record_filter = record_filter or RecordFilter()
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip() or not record_filter.line_may_match(line):
+                continue
+            try:
+                record = loads(line)
+            except ValueError as e:
+                logger.warning(f"[!] Skipping malformed line in {path}: {e}")
+                continue
+            if record_filter.matches(record):
+                yield record
+
+class ScanLoader:
+    def __init__(self, directory: str = SCAN_DIR, workers: Optional[int] = None, ordered: bool = True,
+                 since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 instance_ids: Optional[Collection[str]] = None, chunk_bytes: int = NDJSON_CHUNK_BYTES):
+        self.directory = directory
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.ordered = ordered
+        self.filter = RecordFilter(since, until, instance_ids)
+        self.chunk_bytes = chunk_bytes
+
+    def list_files(self) -> List[str]:
+        """Visible scan files in name order, minus those outside the filters"""
+        if not os.path.exists(self.directory):
+            logger.warning(f"[!] Directory not found: {self.directory}")
+            return []
+        indexes = read_indexes(self.directory)
+        archives = {index["data_file"]: index for index in indexes.values()}
+        files = []
+        for name in visible_files(self.directory, SCAN_EXTENSIONS, indexes):
+            index = archives.get(name)
+            if self.filter.archive_may_match(index) if index else self.filter.file_may_match(name):
+                files.append(os.path.join(self.directory, name))
+        return files
+
+    def tasks(self) -> List[Task]:
+        tasks = []
+        for path in self.list_files():
+            if not path.endswith(".ndjson"):
+                tasks.append((path, 0, -1))
+                continue
+            size = os.path.getsize(path)
+            tasks.extend((path, start, min(start + self.chunk_bytes, size))
+                         for start in range(0, size, self.chunk_bytes))
+        return tasks
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Yield matching records lazily; the compactor deletes no file until iteration ends"""
+        with read_lock(self.directory):
+            yield from self._iter_records(self.tasks())
+
+    def _iter_records(self, tasks: List[Task]) -> Iterator[Dict[str, Any]]:
+        if self.workers <= 1 or len(tasks) <= 1:
+            for path, start, end in tasks:
+                if path.endswith(".ndjson") and self.ordered:
+                    # Sequential NDJSON needs no task buffering at all
+                    if start == 0:
+                        yield from iter_ndjson(path, self.filter)
+                    continue
+                yield from load_task((path, start, end), self.filter)
+            return
+
+        max_in_flight = self.workers * IN_FLIGHT_PER_WORKER
+        # Spawned rather than forked, like AccountScanPool: callers run threads holding locks
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            pending: List[Future] = []
+            task_iter = iter(tasks)
+
+            def submit_next() -> bool:
+                task = next(task_iter, None)
+                if task is None:
+                    return False
+                pending.append(executor.submit(load_task, task, self.filter))
+                return True
+
+            while len(pending) < max_in_flight and submit_next():
+                pass
+
+            while pending:
+                if self.ordered:
+                    future = pending.pop(0)
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    future = next(f for f in pending if f in done)
+                    pending.remove(future)
+                records = future.result()
+                submit_next()
+                yield from records
+
+def iter_scan_records(directory: str = SCAN_DIR, **kwargs) -> Iterator[Dict[str, Any]]:
+    """Shorthand for ScanLoader(directory, **kwargs).iter_records()"""
+    return ScanLoader(directory, **kwargs).iter_records()
+
+def save_ndjson(records, filename: str, timestamp: Optional[str] = None):
+    """Write records as NDJSON, stamping each with `timestamp` if it has none"""
+    timestamp = timestamp or datetime.utcnow().isoformat()
+    stamped = (record if record.get("timestamp") else {**record, "timestamp": timestamp} for record in records)
+    save_records(stamped, filename, timestamp, ndjson=True)
+    logger.info(f"[+] Saved NDJSON output to {filename}")
@@ -0,0 +1,248 @@
+# src/core/scan_store.py
+
+"""
+Columnar scan storage.
+
+With SCAN_STORAGE_FORMAT=parquet, scan batches are written as zstd-compressed
+Parquet segments under SCAN_PARQUET_DIR, hive-partitioned by scan date and
+region (date=2025-01-31/region=us-east-1/scan_<time>_<id>.parquet). Metrics,
+costs and tags get typed columns; any other record keys, including the nested
+Metrics, are kept in a JSON `extra` column so records round-trip. Metric values
+found only under Metrics also fill their typed column, and read back as
+top-level keys as well.
+
+Readers prune partitions by date and region, push instance and timestamp
+filters down to the row groups, and read only the columns they ask for.
+pyarrow is optional; without it the default JSON format keeps working.
+"""
+
+import os
+import uuid
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional
+from src.core.logger import logger
+from src.core.serialization import dumps, loads
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency, only needed for SCAN_STORAGE_FORMAT=parquet
+    pa = ds = pq = None
+
+SCAN_STORAGE_FORMAT = os.getenv("SCAN_STORAGE_FORMAT", "json").lower()
+PARQUET_DIR = os.getenv("SCAN_PARQUET_DIR", "/app/data/output/ec2_parquet/")
+COMPRESSION = "zstd"
+
+# (column, scan record key, arrow type name)
+SCAN_COLUMNS = (
+    ("timestamp", "timestamp", "timestamp"),
+    ("instance_id", "InstanceId", "string"),
+    ("instance_type", "InstanceType", "string"),
+    ("state", "State", "string"),
+    ("launch_time", "LaunchTime", "string"),
+    ("cpu_utilization", "CPUUtilization", "float64"),
+    ("network_in", "NetworkIn", "float64"),
+    ("network_out", "NetworkOut", "float64"),
+    ("hourly_rate", "HourlyRate", "money"),
+    ("daily_cost", "DailyCostEstimate", "money"),
+    ("weekly_cost", "WeeklyCostEstimate", "money"),
+    ("monthly_cost", "MonthlyCostEstimate", "money"),
+    ("weekly_forecast", "WeeklyForecast", "money"),
+    ("monthly_forecast", "MonthlyForecast", "money"),
+    ("underutilized", "Underutilized", "bool"),
+    ("cost_impact_rank", "CostImpactRank", "string"),
+    ("tags", "Tags", "tags"),
+    ("extra", None, "string"),
+)
+PARTITION_COLUMNS = ("date", "region")
+_KNOWN_KEYS = {key for _, key, _ in SCAN_COLUMNS if key} | {"Region"}
+
+def parquet_available() -> bool:
+    return pa is not None
+
+def use_parquet() -> bool:
+    """True when scans should be stored as Parquet (configured and pyarrow importable)"""
+    if SCAN_STORAGE_FORMAT != "parquet":
+        return False
+    if pa is None:
+        logger.warning("[!] SCAN_STORAGE_FORMAT=parquet but pyarrow is not installed, using JSON")
+        return False
+    return True
+
+def _arrow_type(name: str):
+    return {
+        "timestamp": pa.timestamp("us"),
+        "string": pa.string(),
+        "float64": pa.float64(),
+        "money": pa.decimal128(18, 6),
+        "bool": pa.bool_(),
+        "tags": pa.map_(pa.string(), pa.string()),
+    }[name]
+
+def scan_schema():
+    return pa.schema([(column, _arrow_type(type_name)) for column, _, type_name in SCAN_COLUMNS])
+
+def _to_float(value: Any) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool) else None
+
+def _to_money(value: Any) -> Optional[Decimal]:
+    if value is None or value == "" or isinstance(value, bool):
+        return None
+    try:
+        return Decimal(str(value)).quantize(Decimal("0.000001"))
+    except InvalidOperation:
+        return None
+
+def _metric(record: Dict[str, Any], key: str) -> Any:
+    value = record.get(key)
+    if value is None:
+        value = record.get("Metrics", {}).get(key, {}).get("value")
+    return value
+
+def _parse_time(value: Any, default: datetime) -> datetime:
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    try:
+        return datetime.fromisoformat(str(value)[:26])
+    except ValueError:
+        return default
+
+class ParquetScanStore:
+    def __init__(self, root: str = PARQUET_DIR):
+        if pa is None:
+            raise ImportError("pyarrow is required for the Parquet scan store")
+        self.root = root
+
+    def _columns(self, records: List[Dict[str, Any]], scanned_at: datetime) -> Dict[str, list]:
+        data = {column: [] for column, _, _ in SCAN_COLUMNS}
+        for record in records:
+            for column, key, type_name in SCAN_COLUMNS:
+                if column == "timestamp":
+                    value = _parse_time(record.get("timestamp"), scanned_at)
+                elif column == "extra":
+                    extra = {k: v for k, v in record.items() if k not in _KNOWN_KEYS}
+                    value = dumps(extra) if extra else None
+                elif type_name == "float64":
+                    value = _to_float(_metric(record, key))
+                elif type_name == "money":
+                    value = _to_money(record.get(key))
+                elif type_name == "tags":
+                    tags = record.get(key) or {}
+                    value = [(str(k), str(v)) for k, v in tags.items()] if isinstance(tags, dict) else None
+                elif type_name == "bool":
+                    value = record.get(key) if isinstance(record.get(key), bool) else None
+                else:
+                    value = record.get(key)
+                    value = None if value is None else str(value)
+                data[column].append(value)
+        return data
+
+    def write(self, records: Iterable[Dict[str, Any]], scanned_at: Optional[datetime] = None) -> List[str]:
+        """Write one scan batch as one segment per (date, region) partition; returns the segment paths"""
+        scanned_at = scanned_at or datetime.utcnow()
+        partitions: Dict[tuple, List[Dict[str, Any]]] = {}
+        for record in records:
+            day = _parse_time(record.get("timestamp"), scanned_at).date().isoformat()
+            partitions.setdefault((day, record.get("Region") or "unknown"), []).append(record)
+
+        schema = scan_schema()
+        segment = f"scan_{scanned_at.strftime('%Y%m%dT%H%M%S')}_{uuid.uuid4().hex[:8]}.parquet"
+        paths = []
+        for (day, region), batch in sorted(partitions.items()):
+            directory = os.path.join(self.root, f"date={day}", f"region={region}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, segment)
+            table = pa.Table.from_pydict(self._columns(batch, scanned_at), schema=schema)
+            # dot-prefixed so dataset scans (ignore_prefixes) never see a half-written segment
+            tmp_path = os.path.join(directory, f".{segment}.{os.getpid()}.tmp")
+            pq.write_table(table, tmp_path, compression=COMPRESSION)
+            os.replace(tmp_path, path)
+            paths.append(path)
+
+        logger.info(f"[+] Saved {sum(len(b) for b in partitions.values())} record(s) "
+                     f"to {len(paths)} Parquet partition(s) under {self.root}")
+        return paths
+
+    def dataset(self):
+        return ds.dataset(self.root, format="parquet", partitioning="hive",
+                          exclude_invalid_files=True, ignore_prefixes=[".", "_"])
+
+    def _filter(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                regions: Optional[Collection[str]] = None, instance_ids: Optional[Collection[str]] = None):
+        conditions = []
+        if since is not None:
+            conditions.append(ds.field("date") >= since.date().isoformat())
+            conditions.append(ds.field("timestamp") >= pa.scalar(since, pa.timestamp("us")))
+        if until is not None:
+            conditions.append(ds.field("date") <= until.date().isoformat())
+            conditions.append(ds.field("timestamp") < pa.scalar(until, pa.timestamp("us")))
+        if regions is not None:
+            conditions.append(ds.field("region").isin(list(regions)))
+        if instance_ids is not None:
+            conditions.append(ds.field("instance_id").isin(list(instance_ids)))
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def read(self, columns: Optional[List[str]] = None, **filters):
+        """
+        Load matching rows as a pyarrow Table.
+
+        Date and region bounds prune whole partition directories; instance
+        and exact timestamp filters are pushed down to the Parquet row groups.
+        Filters are the keyword arguments of `_filter` (since, until, regions,
+        instance_ids).
+        """
+        if not os.path.isdir(self.root):
+            return pa.table({column: pa.array([], _arrow_type(t)) for column, _, t in SCAN_COLUMNS
+                             if columns is None or column in columns})
+        return self.dataset().to_table(columns=columns, filter=self._filter(**filters))
+
+    def iter_records(self, columns: Optional[List[str]] = None, **filters) -> Iterator[Dict[str, Any]]:
+        """
+        Yield rows in the JSON scan record layout (CamelCase keys, Decimal costs).
+
+        Rows are converted one record batch at a time, so memory stays bounded
+        by the batch size rather than the number of matching rows.
+        """
+        if not os.path.isdir(self.root):
+            return
+        batches = self.dataset().to_batches(columns=columns, filter=self._filter(**filters))
+        for batch in batches:
+            for row in batch.to_pylist():
+                yield self._record(row)
+
+    @staticmethod
+    def _record(row: Dict[str, Any]) -> Dict[str, Any]:
+        record = loads(row.pop("extra") or "{}") if "extra" in row else {}
+        for column, key, type_name in SCAN_COLUMNS:
+            if key is None or column not in row:
+                continue
+            value = row[column]
+            if value is None:
+                continue
+            if type_name == "timestamp":
+                value = value.isoformat()
+            elif type_name == "tags":
+                value = dict(value)
+            record[key] = value
+        if "region" in row:
+            record["Region"] = row["region"]
+        return record
+
+def save_scan(records: List[Dict[str, Any]], filename: str):
+    """
+    Persist a scan batch in the configured format.
+
+    JSON (default) goes to `filename`; with SCAN_STORAGE_FORMAT=parquet the
+    batch is written to the Parquet store and `filename` is ignored.
+    """
+    if use_parquet():
+        ParquetScanStore().write(records)
+    else:
+        from src.core.utils import save_json
+        save_json(records, filename)
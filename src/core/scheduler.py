@@ -0,0 +1,153 @@
+# src/core/scheduler.py
+
+"""
+In-process interval scheduler for the long-running daemon.
+
+Every job runs on its own interval with random jitter (so jobs, and several
+daemons, do not fire in lockstep). A job never overlaps itself: if a run is
+still going when the next one is due, that tick is skipped. Across
+processes a non-blocking flock on <lock_dir>/<job>.lock keeps a second
+daemon, or a one-shot script using the same lock, from running it at the
+same time.
+
+stop() (wired to SIGTERM/SIGINT by the daemon) stops new runs from
+starting and waits up to `shutdown_timeout` seconds for running jobs.
+"""
+
+import os
+import time
+import fcntl
+import random
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+from src.core.logger import logger
+
+LOCK_DIR = os.getenv("DAEMON_LOCK_DIR", "/app/data/locks/")
+SHUTDOWN_TIMEOUT = float(os.getenv("DAEMON_SHUTDOWN_TIMEOUT", "300"))  # seconds
+
+@contextmanager
+def job_lock(name: str, lock_dir: str = LOCK_DIR):
+    """Yield True if the cross-process lock for `name` was acquired, False if someone else holds it"""
+    try:
+        os.makedirs(lock_dir, exist_ok=True)
+        lock = open(os.path.join(lock_dir, f"{name}.lock"), "w")
+    except OSError as e:
+        logger.warning(f"[!] Cannot create lock for job '{name}', running without it: {e}")
+        yield True
+        return
+    try:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    finally:
+        lock.close()
+
+class Job:
+    def __init__(self, name: str, fn: Callable[[], None], interval: float, jitter: float = 0.1,
+                 run_on_start: bool = True):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.jitter = jitter  # fraction of the interval
+        self.run_on_start = run_on_start
+        self.next_run = 0.0
+        self.thread: Optional[threading.Thread] = None
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_duration: Optional[float] = None
+
+    def schedule_next(self, now: float, first: bool = False):
+        spread = self.interval * self.jitter
+        if first and self.run_on_start:
+            self.next_run = now + random.uniform(0, spread)
+        else:
+            self.next_run = now + self.interval + random.uniform(-spread, spread)
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+class Scheduler:
+    def __init__(self, jobs: List[Job], lock_dir: str = LOCK_DIR, shutdown_timeout: float = SHUTDOWN_TIMEOUT):
+        self.jobs = jobs
+        self.lock_dir = lock_dir
+        self.shutdown_timeout = shutdown_timeout
+        self._stop = threading.Event()
+
+    def stop(self):
+        if not self._stop.is_set():
+            logger.info("[*] Scheduler stopping: no new job runs will start")
+        self._stop.set()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    def _run_job(self, job: Job):
+        with job_lock(job.name, self.lock_dir) as acquired:
+            if not acquired:
+                job.skipped += 1
+                logger.warning(f"[!] Job '{job.name}' is running in another process, skipping this run")
+                return
+            started = time.monotonic()
+            logger.info(f"[*] Job '{job.name}' started")
+            try:
+                job.fn()
+                job.runs += 1
+                logger.info(f"[+] Job '{job.name}' finished in {time.monotonic() - started:.1f}s")
+            except Exception as e:
+                job.failures += 1
+                logger.error(f"[!] Job '{job.name}' failed after {time.monotonic() - started:.1f}s: {e}")
+            finally:
+                job.last_duration = time.monotonic() - started
+
+    def _launch(self, job: Job, now: float):
+        job.schedule_next(now)
+        if job.running:
+            job.skipped += 1
+            logger.warning(f"[!] Job '{job.name}' is still running, skipping this run")
+            return
+        job.thread = threading.Thread(target=self._run_job, args=(job,), name=f"job-{job.name}", daemon=True)
+        job.thread.start()
+
+    def run(self):
+        """Run jobs until stop() is called, then wait for the running ones"""
+        now = time.monotonic()
+        for job in self.jobs:
+            job.schedule_next(now, first=True)
+        logger.info(f"[+] Scheduler started with {len(self.jobs)} job(s): "
+                    f"{', '.join(f'{job.name} every {job.interval:.0f}s' for job in self.jobs)}")
+
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for job in self.jobs:
+                if job.next_run <= now:
+                    self._launch(job, now)
+            next_due = min(job.next_run for job in self.jobs) if self.jobs else now + 60
+            self._stop.wait(max(0.1, next_due - time.monotonic()))
+
+        self.join()
+
+    def join(self) -> bool:
+        """Wait for running jobs; returns False if some were still running at the deadline"""
+        deadline = time.monotonic() + self.shutdown_timeout
+        for job in self.jobs:
+            if job.running:
+                logger.info(f"[*] Waiting for job '{job.name}' to finish")
+                job.thread.join(max(0.0, deadline - time.monotonic()))
+        unfinished = [job.name for job in self.jobs if job.running]
+        if unfinished:
+            logger.warning(f"[!] Shutdown timeout reached with job(s) still running: {', '.join(unfinished)}")
+        return not unfinished
+
+    def status(self) -> Dict[str, Dict[str, object]]:
+        return {job.name: {"running": job.running, "runs": job.runs, "failures": job.failures,
+                           "skipped": job.skipped, "last_duration": job.last_duration} for job in self.jobs}
@@ -0,0 +1,155 @@
+# src/core/serialization.py
+
+"""
+JSON encoding for scan output, JSONB columns and COPY payloads.
+
+Uses orjson when it is installed and the standard library otherwise; both
+produce the same documents. Decimal values are written as exact strings (the
+format the cost modules already used), datetimes as ISO 8601, numpy scalars
+and arrays as plain numbers and lists, and sets as lists. NaN and infinity,
+which JSON cannot represent, are written as null by both encoders. Output is
+compact unless pretty=True.
+
+Scan files are written incrementally: the {"timestamp": ..., "data": [...]}
+envelope is opened once and records are encoded and flushed in batches, so
+a large scan never exists as one big string in memory.
+"""
+
+import os
+import json
+import math
+from contextlib import contextmanager
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, BinaryIO, Iterable, Iterator, Optional
+from uuid import UUID
+
+try:
+    import orjson
+except ImportError:  # optional speed-up; the stdlib encoder is used instead
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+STREAM_BATCH_SIZE = 1000  # records encoded per write() when streaming
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    _ORJSON_PRETTY = _ORJSON_OPTIONS | orjson.OPT_INDENT_2
+
+def default(obj: Any) -> Any:
+    """Encode the types json/orjson do not handle natively"""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, UUID):
+        return str(obj)
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", "replace")
+    if np is not None:
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        if isinstance(obj, np.generic):
+            return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps_bytes(obj: Any, pretty: bool = False) -> bytes:
+    """Encode `obj` as UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=_ORJSON_PRETTY if pretty else _ORJSON_OPTIONS)
+    return _stdlib_dumps(obj, pretty).encode()
+
+def dumps(obj: Any, pretty: bool = False) -> str:
+    """Encode `obj` as a JSON string (e.g. for JSONB parameters and COPY rows)"""
+    if orjson is not None:
+        return dumps_bytes(obj, pretty).decode()
+    return _stdlib_dumps(obj, pretty)
+
+def _finite(obj: Any) -> Any:
+    """Copy of `obj` with non-finite floats replaced by None, as orjson writes them"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    if np is not None and isinstance(obj, (np.ndarray, np.generic)):
+        return _finite(default(obj))
+    return obj
+
+def _stdlib_dumps(obj: Any, pretty: bool) -> str:
+    options = {"indent": 2} if pretty else {"separators": (",", ":")}
+    try:
+        # allow_nan=False: the stdlib would otherwise write bare NaN/Infinity tokens
+        return json.dumps(obj, default=default, ensure_ascii=False, allow_nan=False, **options)
+    except ValueError:
+        return json.dumps(_finite(obj), default=default, ensure_ascii=False, allow_nan=False, **options)
+
+def loads(data: Any) -> Any:
+    """Decode JSON from str or bytes; raises ValueError on malformed input"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _batches(records: Iterable[Any], size: int) -> Iterator[list]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def write_envelope(f: BinaryIO, records: Iterable[Any], timestamp: str) -> int:
+    """Stream {"timestamp": ..., "data": [records]} to a binary file; returns the record count"""
+    f.write(b'{"timestamp":' + dumps_bytes(timestamp) + b',"data":[')
+    count = 0
+    for batch in _batches(records, STREAM_BATCH_SIZE):
+        if count:
+            f.write(b",")
+        f.write(b",".join(dumps_bytes(record) for record in batch))
+        count += len(batch)
+    f.write(b"]}")
+    return count
+
+def write_ndjson(f: BinaryIO, records: Iterable[Any]) -> int:
+    """Stream one JSON document per line to a binary file; returns the record count"""
+    count = 0
+    for batch in _batches(records, STREAM_BATCH_SIZE):
+        f.write(b"\n".join(dumps_bytes(record) for record in batch) + b"\n")
+        count += len(batch)
+    return count
+
+@contextmanager
+def atomic_writer(path: str):
+    """Binary file handle whose content replaces `path` only once the block succeeds"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def save_records(records: Iterable[Any], path: str, timestamp: str, ndjson: Optional[bool] = None) -> int:
+    """
+    Atomically write a scan file, streaming the records.
+
+    .ndjson paths get one record per line; anything else gets the
+    {"timestamp", "data"} envelope. Returns the record count.
+    """
+    ndjson = path.endswith(".ndjson") if ndjson is None else ndjson
+    with atomic_writer(path) as f:
+        return write_ndjson(f, records) if ndjson else write_envelope(f, records, timestamp)
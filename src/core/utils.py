@@ -1,9 +1,9 @@
 # src/core/utils.py
 
 import os
-import json
 from datetime import datetime
 from src.core.logger import logger
+from src.core.serialization import atomic_writer, dumps_bytes, save_records
 
 def generate_timestamp():
     return datetime.utcnow().isoformat()
@@ -11,35 +11,31 @@ def generate_timestamp():
 def save_json(data, filename):
     """Save structured output with timestamp"""
     try:
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        with open(filename, "w") as f:
-            json.dump({
-                "timestamp": generate_timestamp(),
-                "data": data
-            }, f, indent=4)
+        if isinstance(data, list):
+            save_records(data, filename, generate_timestamp(), ndjson=False)
+        else:
+            with atomic_writer(filename) as f:
+                f.write(dumps_bytes({"timestamp": generate_timestamp(), "data": data}))
         logger.info(f"[+] Saved JSON output to {filename}")
     except Exception as e:
         logger.error(f"[!] Failed to save JSON output: {e}")
         raise
 
-def load_json_files(directory="/app/data/output/ec2/"):
-    """Load all JSON files from given directory"""
-    if not os.path.exists(directory):
-        logger.warning(f"[!] Directory not found: {directory}")
-        return []
-
-    files = [f for f in os.listdir(directory) if f.endswith(".json")]
-    logger.info(f"[+] Found {len(files)} JSON files to process")
-
-    all_data = []
-    for filename in files:
-        path = os.path.join(directory, filename)
-        try:
-            with open(path, "r") as f:
-                content = json.load(f)
-                all_data.extend(content.get("data", []))
-        except Exception as e:
-            logger.error(f"[!] Error loading {path}: {e}")
+def load_json_files(directory="/app/data/output/ec2/", **filters):
+    """
+    Load all scan records from given directory (.json and .ndjson).
 
+    Materializes the whole result; prefer src.core.scan_loader.iter_scan_records
+    for large archives. `filters` are passed to ScanLoader (since, until,
+    instance_ids, workers, ordered). With SCAN_STORAGE_FORMAT=parquet the
+    Parquet store is read instead, pruned by the same time/instance filters.
+    """
+    from src.core.scan_store import use_parquet, ParquetScanStore
+    if use_parquet():
+        store_filters = {k: v for k, v in filters.items() if k in ("since", "until", "instance_ids")}
+        all_data = list(ParquetScanStore().iter_records(**store_filters))
+    else:
+        from src.core.scan_loader import iter_scan_records
+        all_data = list(iter_scan_records(directory, **filters))
     logger.info(f"[+] Loaded {len(all_data)} instance records")
     return all_data
\ No newline at end of file
@@ -3,19 +3,18 @@
 import os
 import json
 from datetime import datetime
+from src.core.serialization import atomic_writer, dumps_bytes, save_records
 
 def generate_timestamp():
     return datetime.utcnow().isoformat()
 
 def save_json(data, filename):
-    full_data = {
-        "timestamp": generate_timestamp(),
-        "data": data
-    }
     try:
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        with open(filename, "w") as f:
-            json.dump(full_data, f, indent=4)
+        if isinstance(data, list):
+            save_records(data, filename, generate_timestamp(), ndjson=False)
+        else:
+            with atomic_writer(filename) as f:
+                f.write(dumps_bytes({"timestamp": generate_timestamp(), "data": data}))
         print(f"[+] Saved JSON output to {filename}")
     except Exception as e:
         print(f"[!] Failed to save JSON output: {e}")
@@ -30,18 +29,9 @@ def load_json(filepath):
         print(f"[!] Error loading {filepath}: {e}")
         return []
 
-def load_json_files(directory):
-    """Load all JSON files from a directory"""
-    if not os.path.exists(directory):
-        print(f"[!] Directory not found: {directory}")
-        return []
-
-    files = [f for f in os.listdir(directory) if f.endswith(".json")]
-    all_instances = []
-    for filename in files:
-        path = os.path.join(directory, filename)
-        instances = load_json(path)
-        all_instances.extend(instances)
-        print(f"[+] Loaded {len(instances)} instance(s) from {filename}")
-
+def load_json_files(directory, **filters):
+    """Load all scan records from a directory (.json and .ndjson); see src.core.scan_loader"""
+    from src.core.scan_loader import iter_scan_records
+    all_instances = list(iter_scan_records(directory, **filters))
+    print(f"[+] Loaded {len(all_instances)} instance(s) from {directory}")
     return all_instances
\ No newline at end of file
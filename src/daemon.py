@@ -0,0 +1,249 @@
+# src/daemon.py
+
+"""
+Long-running Tephron daemon.
+
+Runs the scan, cost, anomaly and knowledge-base jobs on their own intervals
+inside one process (see src.core.scheduler), so the expensive setup is paid
+once: the boto3 session and clients, assumed-role credentials, the
+PostgreSQL pool, the anomaly model and history index, the pricing caches,
+the SentenceTransformer model and the Slack client are created on first use
+and reused by every later run.
+
+Configuration (environment):
+  DAEMON_JOBS                 comma-separated jobs to run (default: all)
+  DAEMON_<JOB>_INTERVAL       seconds between runs, e.g. DAEMON_SCAN_INTERVAL
+  DAEMON_JITTER               random spread as a fraction of the interval (0.1)
+  DAEMON_SCAN_MODE            "local" runs the scan in this process, "queue" only
+                              queues it for scan workers (see src.worker)
+"""
+
+import os
+import signal
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from src.core.logger import logger
+from src.core.scheduler import Job, Scheduler
+
+JOB_INTERVALS = {
+    "scan": float(os.getenv("DAEMON_SCAN_INTERVAL", "3600")),
+    "cost": float(os.getenv("DAEMON_COST_INTERVAL", "21600")),
+    "anomaly": float(os.getenv("DAEMON_ANOMALY_INTERVAL", "3600")),
+    "knowledge_base": float(os.getenv("DAEMON_KNOWLEDGE_BASE_INTERVAL", "86400")),
+}
+JITTER = float(os.getenv("DAEMON_JITTER", "0.1"))
+SCAN_MODE = os.getenv("DAEMON_SCAN_MODE", "local")
+COST_OUTPUT_DIR = "/app/data/output/cost/"
+KNOWLEDGE_BASE_DIR = "/app/data/knowledge/aws/"
+
+class WarmResources:
+    """Clients, pools and models shared by every job run; each is built on first use"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._resources: Dict[str, Any] = {}
+        self.history_lock = threading.Lock()  # the scan and anomaly jobs share one history index
+        self.last_scan: List[Dict[str, Any]] = []
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._resources
+
+    def _get(self, name: str, factory):
+        with self._lock:
+            if name not in self._resources:
+                logger.info(f"[*] Initializing shared {name}")
+                self._resources[name] = factory()
+            return self._resources[name]
+
+    @property
+    def session(self):
+        from src.core.aws_clients import get_session
+        return self._get("session", get_session)
+
+    @property
+    def credentials(self):
+        from src.core.accounts import CredentialCache
+        return self._get("credentials", lambda: CredentialCache(self.session))
+
+    def accounts(self):
+        """Account inventory, re-read every run so accounts can be added without a restart"""
+        from src.core.accounts import load_accounts
+        return load_accounts()
+
+    @property
+    def db(self):
+        def connect():
+            from src.core.db_handler import PostgresHandler
+            db = PostgresHandler()
+            db.create_tables()
+            return db
+        return self._get("db", connect)
+
+    @property
+    def estimator(self):
+        from src.aws.ec2.cost_estimator import EC2CostEstimator
+        return self._get("estimator", lambda: EC2CostEstimator(self.session))
+
+    @property
+    def analyzer(self):
+        from src.aws.ec2.analyzer import EC2Analyzer
+        return self._get("analyzer", lambda: EC2Analyzer(session=self.session))
+
+    @property
+    def detector(self):
+        from src.ai.ml.anomaly_detector import InstanceAnomalyDetector
+        return self._get("detector", InstanceAnomalyDetector)
+
+    @property
+    def policy_evaluator(self):
+        from src.ai.ml.anomaly_detector import InstancePolicyEvaluator
+        return self._get("policy evaluator", lambda: InstancePolicyEvaluator(self.detector.history))
+
+    @property
+    def vector_store(self):
+        from src.ai.rag.vector_store import FAISSVectorStore
+        return self._get("vector store", FAISSVectorStore)
+
+    @property
+    def bot(self):
+        from src.slack.bot import SlackBot
+        return self._get("slack bot", SlackBot)
+
+    def regions(self) -> List[str]:
+        from src.aws.ec2.scanner import get_all_regions
+        return get_all_regions(self.session)
+
+    def scan_units(self, accounts) -> List[str]:
+        from src.main import plan_units
+        return plan_units(accounts, self.credentials)
+
+    def close(self):
+        with self._lock:
+            db = self._resources.pop("db", None)
+            if db is not None:
+                try:
+                    db.pool.close()
+                    logger.info("[+] Closed PostgreSQL pool")
+                except Exception as e:
+                    logger.error(f"[!] Failed to close PostgreSQL pool: {e}")
+            self._resources.clear()
+
+def format_policy_alerts(result: Dict[str, Any]) -> List[str]:
+    instance_id, region = result.get("InstanceId"), result.get("Region")
+    cost_estimate = float(result.get("MonthlyForecast") or 0)
+    messages = []
+    if result.get("Underutilized"):
+        messages.append(
+            f"⚠️ Underutilized Instance: `{instance_id}` in `{region}`\n"
+            f"• Avg CPU: {result.get('AvgCPU', 0):.2f}%\n"
+            f"• Monthly Forecast: ${cost_estimate:.2f}\n"
+            f"• Recommendation: Consider downsizing or converting to Lambda\n"
+            f"Type `/tephron confirm {instance_id}` to validate"
+        )
+    if result.get("SpikeDetected"):
+        messages.append(
+            f"🚨 CPU Spike Detected: `{instance_id}` in `{region}`\n"
+            f"• From: ~{result.get('AvgCPU', 0):.2f}% → To: {result.get('RecentCPUSpike') or 0:.2f}%\n"
+            f"• Monthly Forecast: ${cost_estimate:.2f}"
+        )
+    return messages
+
+class TephronDaemon:
+    def __init__(self, jobs: Optional[List[str]] = None, resources: Optional[WarmResources] = None):
+        self.resources = resources or WarmResources()
+        names = jobs or [n.strip() for n in os.getenv("DAEMON_JOBS", ",".join(JOB_INTERVALS)).split(",") if n.strip()]
+        unknown = [name for name in names if name not in JOB_INTERVALS]
+        if unknown:
+            raise ValueError(f"Unknown daemon job(s): {', '.join(unknown)}")
+        self.scheduler = Scheduler([Job(name, getattr(self, f"run_{name}"), JOB_INTERVALS[name], JITTER)
+                                    for name in names])
+        self._kb_signature: Optional[Tuple] = None
+
+    def run_scan(self):
+        from src.main import ScanRun, open_checkpoint
+        resources = self.resources
+        if SCAN_MODE == "queue":
+            from src.worker import enqueue_scan
+            run_id = enqueue_scan(resources)
+            logger.info(f"[+] Queued scan run {run_id} for the scan workers")
+            return
+        with resources.history_lock:
+            resources.detector.refresh_history()  # incremental: only scan files added since the last run
+        try:
+            db = resources.db
+        except Exception as e:
+            logger.error(f"[!] PostgreSQL unavailable, scan data will not be stored: {e}")
+            db = None
+        accounts = resources.accounts()
+        # Resume only a run interrupted within the last interval (e.g. by a restart). Replaying an older
+        # run's finished regions would store and alert on data a fresh scan has long superseded.
+        checkpoint = open_checkpoint("latest", max_age_hours=JOB_INTERVALS["scan"] / 3600)
+        instances, _ = ScanRun(estimator=resources.estimator, detector=resources.detector, db=db, bot=resources.bot,
+                               checkpoint=checkpoint, accounts=accounts,
+                               credentials=resources.credentials,
+                               history_lock=resources.history_lock).run(resources.scan_units(accounts))
+        resources.last_scan = instances
+
+    def _scan_without_saving(self) -> List[Dict[str, Any]]:
+        from src.aws.ec2.scanner import EC2Scanner
+        instances = []
+        for region in self.resources.regions():
+            scanner = EC2Scanner(region, session=self.resources.session)
+            for page in scanner.iter_instance_pages():
+                instances.extend(page)
+        return instances
+
+    def run_cost(self):
+        from src.core.utils import save_json
+        instances = self.resources.last_scan or self._scan_without_saving()
+        analyzed = self.resources.analyzer.analyze_instances([dict(inst) for inst in instances])
+        output_file = os.path.join(COST_OUTPUT_DIR, f"cost_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        save_json({"instances": analyzed}, output_file)
+
+    def run_anomaly(self):
+        evaluator = self.resources.policy_evaluator
+        with self.resources.history_lock:
+            evaluator.refresh_history()
+        instances = self.resources.last_scan or self._scan_without_saving()
+        evaluations = evaluator.evaluate_fleet(instances)
+        forecasts = {inst.get("InstanceId"): inst.get("MonthlyForecast") for inst in instances}
+        for result in evaluations:
+            result.setdefault("MonthlyForecast", forecasts.get(result.get("InstanceId")))
+        alerts = [message for result in evaluations for message in format_policy_alerts(result)]
+        for message in alerts:
+            self.resources.bot.send_alert(message)
+        logger.info(f"[+] Evaluated {len(evaluations)} instance(s), sent {len(alerts)} alert(s)")
+
+    def _knowledge_base_signature(self) -> Tuple:
+        if not os.path.isdir(KNOWLEDGE_BASE_DIR):
+            return ()
+        entries = []
+        for name in sorted(os.listdir(KNOWLEDGE_BASE_DIR)):
+            stat = os.stat(os.path.join(KNOWLEDGE_BASE_DIR, name))
+            entries.append((name, stat.st_size, stat.st_mtime))
+        return tuple(entries)
+
+    def run_knowledge_base(self):
+        signature = self._knowledge_base_signature()
+        first_load = not self.resources.is_loaded("vector store")
+        store = self.resources.vector_store  # builds the index on first use
+        if not first_load and signature == self._kb_signature:
+            logger.info("[*] Knowledge base unchanged, keeping the current FAISS index")
+            return
+        if not first_load:
+            store.rebuild()
+        self._kb_signature = signature
+
+    def run(self):
+        def handle_signal(signum, _frame):
+            logger.info(f"[*] Received {signal.Signals(signum).name}, shutting down gracefully")
+            self.scheduler.stop()
+
+        signal.signal(signal.SIGTERM, handle_signal)
+        signal.signal(signal.SIGINT, handle_signal)
+        try:
+            self.scheduler.run()
+        finally:
+            self.resources.close()
+            logger.info(f"[+] Daemon stopped: {self.scheduler.status()}")
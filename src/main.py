@@ -2,9 +2,16 @@
 
 import os
 import logging
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
-from src.aws.ec2.scanner import EC2Scanner, get_all_regions
+import threading
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from src.aws.ec2.scanner import AccountScanPool, EC2Scanner, get_all_regions, DEFAULT_PAGE_SIZE
+from src.aws.ec2.cost_estimator import EC2CostEstimator
+from src.core.accounts import Account, CredentialCache, load_accounts, split_unit, unit_label
+from src.core.checkpoint import RunCheckpoint
+from src.core.pipeline import Pipeline, Stage
+from src.core.scan_store import save_scan
 from src.core.db_handler import PostgresHandler
 from src.ai.ml.anomaly_detector import InstanceAnomalyDetector
 from src.slack.bot import SlackBot
@@ -12,77 +19,309 @@ from src.slack.bot import SlackBot
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))  # batches buffered between stages
+# Worker threads per stage; detection shares one model and history index, so it stays single-threaded
+STAGE_WORKERS = {
+    "scan": int(os.getenv("PIPELINE_SCAN_WORKERS", "20")),
+    "enrich": int(os.getenv("PIPELINE_ENRICH_WORKERS", "4")),
+    "price": int(os.getenv("PIPELINE_PRICE_WORKERS", "2")),
+    "detect": 1,
+    "persist": int(os.getenv("PIPELINE_PERSIST_WORKERS", "2")),
+    "alert": 1,
+}
+
 def generate_timestamp():
     return datetime.utcnow().isoformat()
 
-def run_scanner():
-    logger.info("[*] Starting EC2 scanner")
-    regions = get_all_regions()
-    logger.info(f"[+] Found {len(regions)} active AWS regions")
+def scan_filename(timestamp: str, unit: Optional[str] = None) -> str:
+    """Raw scan file of a run, or of one unit of a distributed run"""
+    suffix = f"_{unit.replace(':', '_')}" if unit else ""
+    return f"/app/data/output/ec2/ec2_scan_{timestamp.replace(':', '-').split('.')[0]}{suffix}.json"
+
+def format_alert(anomaly: Dict[str, Any]) -> str:
+    account = f" (account `{anomaly['AccountId']}`)" if anomaly.get("AccountId") else ""
+    return (
+        f"⚠️ Underutilized Instance: `{anomaly['InstanceId']}` in `{anomaly['Region']}`{account}\n"
+        f"• CPU Utilization: {anomaly.get('CPUUtilization', 0):.2f}%\n"
+        f"• Monthly Forecast: ${anomaly.get('monthly_forecast', 0):.2f}\n"
+        f"Type `/tephron confirm {anomaly['InstanceId']}` to validate"
+    )
+
+STAGES = ("scan", "enrich", "price", "detect", "persist", "alert")
+RESUME_MAX_AGE_HOURS = float(os.getenv("SCAN_RESUME_MAX_AGE_HOURS", "6"))  # older unfinished runs start over
+
+class ScanRun:
+    """
+    One scan → enrich → price → detect → persist → alert run.
+
+    Work moves between stages as per-page batches ({"unit", "region",
+    "page", "stage", "instances", "anomalies"}), so pages from fast regions
+    are enriched, scored, stored and alerted on while slow regions are still
+    being scanned.
+
+    The run's source is a list of scan units: region names for the default
+    account, or "<account_id>:<region>" labels (see src.core.accounts) for
+    accounts from the inventory. Those are scanned with assumed-role
+    credentials in an AccountScanPool and enriched with the same account's
+    credentials; every record carries its AccountId.
+
+    A detector shared with other jobs (the daemon's anomaly job uses the same
+    history index) is only used under `history_lock`.
+
+    With a RunCheckpoint every batch is checkpointed after each stage
+    (batch["stage"] is the last one it completed). Re-running with the same
+    checkpoint replays finished regions from disk and only redoes the
+    stages that failed or never ran.
+    """
+
+    def __init__(self, page_size: int = DEFAULT_PAGE_SIZE, estimator: Optional[EC2CostEstimator] = None,
+                 detector: Optional[InstanceAnomalyDetector] = None, db: Optional[PostgresHandler] = None,
+                 bot: Optional[SlackBot] = None, checkpoint: Optional[RunCheckpoint] = None,
+                 accounts: Optional[List[Account]] = None, credentials: Optional[CredentialCache] = None,
+                 history_lock: Optional[threading.Lock] = None):
+        self.page_size = page_size
+        self.checkpoint = checkpoint
+        self.accounts = {account.account_id: account for account in accounts or []}
+        self.credentials = credentials or CredentialCache()
+        self.scan_pool: Optional[AccountScanPool] = None
+        self.default_account_id: Optional[str] = None
+        self.timestamp = generate_timestamp()
+        if checkpoint is not None:
+            # Resumed runs keep the original scan timestamp, so stored rows upsert instead of duplicating
+            self.timestamp = checkpoint.get("timestamp") or self.timestamp
+        self.estimator = estimator or EC2CostEstimator()
+        # One detector per run: history is indexed and the model loaded (or retrained) once
+        self.detector = detector or InstanceAnomalyDetector()
+        self.history_lock = history_lock or nullcontext()
+        self.db = db
+        self.bot = bot
+        self.instances: List[Dict[str, Any]] = []
+        self.anomalies: List[Dict[str, Any]] = []
+        self.oldest_persisted: Optional[str] = None  # rollups are refreshed from here once persist drains
+        self._lock = threading.Lock()
+
+    def _account(self, unit: str) -> Optional[Account]:
+        account_id, _ = split_unit(unit)
+        return self.accounts.get(account_id) if account_id else None
+
+    def _scan_pages(self, unit: str) -> Iterable[List[Dict[str, Any]]]:
+        account_id, region = split_unit(unit)
+        account = self._account(unit)
+        if account is not None and self.scan_pool is not None:
+            # A worker process returns the unit's pages once the whole region is scanned
+            return self.scan_pool.scan(region, account.account_id, account.max_concurrency, self.page_size,
+                                       self.credentials.credentials(account))
+        session = self.credentials.session(account) if account is not None else None
+        scanner = EC2Scanner(region, page_size=self.page_size, session=session,
+                             account_id=account_id or self.default_account_id)
+        return scanner.iter_instance_pages()
+
+    def scan(self, unit: str) -> Iterator[Dict[str, Any]]:
+        checkpoint = self.checkpoint
+        if checkpoint is not None:
+            if checkpoint.unit_done(unit, "scan"):
+                batches = checkpoint.load_pages(unit)
+                logger.info(f"[+] Replaying {len(batches)} checkpointed page(s) for {unit}")
+                yield from batches
+                return
+            checkpoint.discard_region(unit)  # a partial scan is redone from the first page
+
+        region = split_unit(unit)[1]
+        pages = 0
+        try:
+            for page in self._scan_pages(unit):
+                for inst in page:
+                    inst.setdefault("timestamp", self.timestamp)
+                logger.info(f"[+] Scanned {len(page)} instance(s) in {unit}")
+                batch = {"unit": unit, "region": region, "page": pages, "stage": "scan",
+                         "instances": page, "anomalies": []}
+                pages += 1
+                if checkpoint is not None:
+                    checkpoint.save_page(batch)
+                yield batch
+        except Exception as e:
+            if checkpoint is not None:
+                checkpoint.unit_failed(unit, "scan", str(e))
+            raise
+        if checkpoint is not None:
+            checkpoint.scan_finished(unit, pages)
+
+    def enrich(self, batch: Dict[str, Any]):
+        # CloudWatch data lives in the instance's own account
+        account = self._account(batch.get("unit", batch["region"]))
+        session = self.credentials.session(account) if account is not None else None
+        self.estimator.enrich_cpu(batch["instances"], session)
+
+    def price(self, batch: Dict[str, Any]):
+        batch["instances"] = self.estimator.price_instances(batch["instances"])
 
-    all_instances = []
+    def detect(self, batch: Dict[str, Any]):
+        with self.history_lock:
+            batch["anomalies"] = self.detector.flag_underutilized_instances(batch["instances"])
 
-    with ThreadPoolExecutor(max_workers=20) as executor:
-        futures = []
-        for region in regions:
-            scanner = EC2Scanner(region)
-            futures.append(executor.submit(scanner.scan_instances))
+    def persist(self, batch: Dict[str, Any]):
+        if self.db is None:
+            return
+        # Refreshing per batch would recompute the same buckets over and over, concurrently
+        if self.db.bulk_save_ec2_instances(batch["instances"], refresh=False):
+            oldest = min(str(inst.get("timestamp") or self.timestamp) for inst in batch["instances"])
+            with self._lock:
+                if self.oldest_persisted is None or oldest < self.oldest_persisted:
+                    self.oldest_persisted = oldest
 
-        for future in futures:
-            instances = future.result()
-            all_instances.extend(instances)
-            logger.info(f"[+] Scanned {len(instances)} instance(s) in region")
+    def refresh_rollups(self):
+        """Recompute the rollups once for everything persisted so far"""
+        with self._lock:
+            oldest, self.oldest_persisted = self.oldest_persisted, None
+        if self.db is not None and oldest:
+            self.db.refresh_rollups(datetime.fromisoformat(oldest[:26]))
 
-    # Save raw scan results
-    filename = f"/app/data/output/ec2/ec2_scan_{generate_timestamp().replace(':', '-').split('.')[0]}.json"
+    def alert(self, batch: Dict[str, Any]):
+        if self.bot is None:
+            return
+        for anomaly in batch["anomalies"]:
+            self.bot.send_alert(format_alert(anomaly))
+
+    def _collect(self, batch: Dict[str, Any]):
+        with self._lock:
+            self.instances.extend(batch["instances"])
+            self.anomalies.extend(batch["anomalies"])
+
+    def _stage(self, name: str):
+        """Wrap a stage: skip it for batches that already passed it, checkpoint the batch after it"""
+        index = STAGES.index(name)
+        fn = getattr(self, name)
+
+        def run(batch: Dict[str, Any]) -> Dict[str, Any]:
+            if STAGES.index(batch["stage"]) < index:
+                unit = batch.get("unit", batch["region"])
+                try:
+                    fn(batch)
+                except Exception as e:
+                    logger.error(f"[!] Stage '{name}' failed for {unit} page {batch['page']}: {e}")
+                    if self.checkpoint is not None:
+                        self.checkpoint.unit_failed(unit, name, str(e))
+                    raise
+                batch["stage"] = name
+                if self.checkpoint is not None:
+                    self.checkpoint.save_page(batch)
+            if name == "persist":
+                self._collect(batch)
+            return batch
+        return run
+
+    def pipeline(self) -> Pipeline:
+        stages = [Stage("scan", self.scan, expand=True)] + [Stage(name, self._stage(name)) for name in STAGES[1:]]
+        for stage in stages:
+            stage.workers = STAGE_WORKERS[stage.name]
+            stage.queue_size = PIPELINE_QUEUE_SIZE
+        return Pipeline(stages)
+
+    def run(self, units: List[str]):
+        checkpoint = self.checkpoint
+        if checkpoint is not None:
+            if checkpoint.get("regions_planned"):
+                units = checkpoint.get("regions_planned")  # a resumed run covers the same units
+            else:
+                checkpoint.set("timestamp", self.timestamp)
+                checkpoint.set("regions_planned", list(units))
+
+        if not self.accounts:
+            self.default_account_id = self.credentials.default_account_id()
+        if any(self._account(unit) is not None for unit in units):
+            self.scan_pool = AccountScanPool()
+        try:
+            self.pipeline().run(units)
+        finally:
+            if self.scan_pool is not None:
+                self.scan_pool.shutdown()
+                self.scan_pool = None
+            self.refresh_rollups()
+
+        if checkpoint is not None:
+            incomplete = [f"{unit}/{stage}" for unit in units for stage in STAGES
+                          if not checkpoint.unit_done(unit, stage)]
+            if incomplete:
+                logger.warning(f"[!] Scan run {checkpoint.run_id} is incomplete ({', '.join(incomplete)}); "
+                               f"resume it with: python -m src.cli scan --resume {checkpoint.run_id}")
+                return self.instances, self.anomalies
+
+        # Save raw scan results
+        try:
+            save_scan(self.instances, scan_filename(self.timestamp))
+            logger.info("[+] Saved EC2 scan data")
+        except Exception as e:
+            logger.error(f"[!] Failed to save scan data: {e}")
+        if checkpoint is not None:
+            checkpoint.complete()
+        return self.instances, self.anomalies
+
+def connect_db() -> Optional[PostgresHandler]:
     try:
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        with open(filename, 'w') as f:
-            json.dump({
-                "timestamp": generate_timestamp(),
-                "data": all_instances
-            }, f, indent=4)
-        logger.info(f"[+] Saved EC2 scan data to {filename}")
+        db = PostgresHandler()
+        db.create_tables()
+        return db
     except Exception as e:
-        logger.error(f"[!] Failed to save scan data: {e}")
+        logger.error(f"[!] PostgreSQL unavailable, scan data will not be stored: {e}")
+        return None
 
-    return all_instances
+def open_checkpoint(resume: Optional[str] = None, max_age_hours: float = RESUME_MAX_AGE_HOURS) -> RunCheckpoint:
+    """
+    Checkpoint for this run: `resume` names a run_id to continue, "latest"
+    picks the most recent unfinished run younger than `max_age_hours`
+    (SCAN_RESUME_MAX_AGE_HOURS), and None starts a new run.
+    """
+    run_id = None
+    if resume == "latest":
+        run_id = RunCheckpoint.latest_unfinished()
+        if run_id:
+            started = datetime.strptime(run_id, "%Y%m%dT%H%M%S")
+            if datetime.utcnow() - started > timedelta(hours=max_age_hours):
+                logger.info(f"[*] Unfinished scan run {run_id} is too old to resume, starting a new one")
+                run_id = None
+    elif resume:
+        run_id = resume
+    return RunCheckpoint(run_id or RunCheckpoint.new_run_id(), list(STAGES))
 
-def run_anomaly_detection(instances):
-    detector = InstanceAnomalyDetector()
-    anomalies = detector.flag_underutilized_instances(instances)
+def plan_units(accounts: List[Account], credentials: CredentialCache) -> List[str]:
+    """Scan units for this run: every (account, region) pair, or the default account's regions"""
+    if not accounts:
+        regions = get_all_regions(credentials.base_session)
+        logger.info(f"[+] Found {len(regions)} active AWS regions")
+        return regions
 
-    if anomalies:
-        logger.info(f"[+] Detected {len(anomalies)} underutilized instances")
-    else:
-        logger.info("[+] No underutilized instances detected")
+    units = []
+    for account in accounts:
+        try:
+            regions = account.regions or get_all_regions(credentials.session(account))
+        except Exception as e:
+            logger.error(f"[!] Skipping account {account.name}, could not assume its role or list regions: {e}")
+            continue
+        units.extend(unit_label(account.account_id, region) for region in regions)
+    logger.info(f"[+] Planned {len(units)} (account, region) unit(s) across {len(accounts)} account(s)")
+    return units
 
-    return anomalies
+def run_scanner(bot: Optional[SlackBot] = None, resume: Optional[str] = None):
+    logger.info("[*] Starting EC2 scanner")
+    accounts = load_accounts()
+    credentials = CredentialCache()
+    units = plan_units(accounts, credentials)
+    return ScanRun(db=connect_db(), bot=bot, checkpoint=open_checkpoint(resume),
+                   accounts=accounts, credentials=credentials).run(units)
 
-def main():
+def main(resume: Optional[str] = None):
     logger.info("[*] Starting Tephron AI Engine")
 
-    # Step 1: Scan EC2 instances across all regions
-    instances = run_scanner()
+    # Scan, enrich, price, detect, store and alert as one pipelined pass over all regions
+    instances, anomalies = run_scanner(bot=SlackBot(), resume=resume)
     if not instances:
         logger.warning("[!] No EC2 instances found during scan")
         return
 
-    # Step 2: Detect underutilized instances
-    anomalies = run_anomaly_detection(instances)
-
-    # Step 3: Send alerts via Slack
     if anomalies:
-        logger.info("[+] Sending alerts to Slack")
-        bot = SlackBot()
-        for anomaly in anomalies:
-            msg = (
-                f"⚠️ Underutilized Instance: `{anomaly['InstanceId']}` in `{anomaly['Region']}`\n"
-                f"• CPU Utilization: {anomaly.get('CPUUtilization', 0):.2f}%\n"
-                f"• Monthly Forecast: ${anomaly.get('monthly_forecast', 0):.2f}\n"
-                f"Type `/tephron confirm {anomaly['InstanceId']}` to validate"
-            )
-            bot.send_alert(msg)
+        logger.info(f"[+] Detected and alerted on {len(anomalies)} underutilized instances")
+    else:
+        logger.info("[+] No underutilized instances detected")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,12 +1,12 @@
 # src/slack/bot.py
 
 import os
-import boto3
 import logging
 from slack_sdk import WebClient
 from slack_sdk.socket_mode import SocketModeClient
 from slack_sdk.socket_mode.request import SocketModeRequest
 from slack_sdk.socket_mode.response import SocketModeResponse
+from src.core.aws_clients import get_session
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +46,18 @@ class SlackBot:
         except Exception as e:
             logger.error(f"[!] Failed to start Slack bot: {e}")
 
+    def send_alert(self, message: str) -> bool:
+        """Post a message to the alert channel"""
+        if not self.bot_token:
+            logger.warning("[!] Missing SLACK_BOT_TOKEN, alert not sent")
+            return False
+        try:
+            self.client.chat_postMessage(channel=self.alert_channel, text=message)
+            return True
+        except Exception as e:
+            logger.error(f"[!] Failed to send Slack alert: {e}")
+            return False
+
     def _handle_command(self, command: str) -> str:
         command = command.lower().strip()
         logger.info(f"[+] Processing command: {command}")
@@ -57,7 +69,7 @@ class SlackBot:
 
         elif command == "cost report":
             from src.aws.cost.cost_estimator import EC2CostEstimator
-            estimator = EC2CostEstimator(boto3.Session())
+            estimator = EC2CostEstimator(get_session())
             costs = estimator.get_daily_cost_per_instance()
     
             lines = "\n".join([f"• {k}: ${v:.2f}" for k, v in costs.items()])
@@ -65,6 +77,9 @@ class SlackBot:
 
         elif command.startswith("confirm "):
             instance_id = command.split(" ")[1]
+            from src.core.db_handler import PostgresHandler
+            if not PostgresHandler().record_confirmation(instance_id):
+                return f"[!] Could not record confirmation for `{instance_id}`."
             return f"[✓] Confirmation recorded for `{instance_id}`."
 
         elif command == "help":
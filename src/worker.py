@@ -0,0 +1,213 @@
+# src/worker.py
+
+"""
+Distributed scan worker.
+
+Claims (unit, stage) jobs from the PostgreSQL job queue (src.core.job_queue)
+and runs the matching ScanRun stage on them, so any number of worker
+containers on any number of nodes share one run. Runs are queued with
+`python -m src.cli queue enqueue`, or every scan interval by the daemon with
+DAEMON_SCAN_MODE=queue.
+
+On SIGTERM a worker stops claiming. Jobs it is working on are handed back
+to the queue at the next batch boundary without using up an attempt, so
+another worker picks them up right away instead of after the lease
+expires. The alert stage is the exception: it runs to completion so that no
+alert is sent twice.
+
+Configuration (environment):
+  WORKER_CONCURRENCY          jobs this process works on at once (2)
+  WORKER_POLL_INTERVAL        seconds to wait when no job is open (5)
+  WORKER_STAGES               comma-separated stages to take (default: all)
+  JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RETRY_BASE (see src.core.job_queue)
+"""
+
+import os
+import signal
+import socket
+import threading
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
+from src.core.logger import logger
+from src.core.accounts import split_unit
+from src.core.job_queue import Job, JobQueue, LeaseLostError
+from src.daemon import WarmResources
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "5"))
+
+class JobInterrupted(Exception):
+    """The worker is shutting down and hands the job back unfinished"""
+
+def open_queue(resources: WarmResources) -> JobQueue:
+    """Queue on the shared PostgreSQL pool; resources.db applies pending migrations first"""
+    from src.main import STAGES
+    return JobQueue(STAGES, resources.db.pool)
+
+def enqueue_scan(resources: WarmResources, run_id: Optional[str] = None) -> str:
+    """Queue the scan stage of every (account, region) unit as a new run; returns its run_id"""
+    from src.main import generate_timestamp, plan_units
+    from src.core.checkpoint import RunCheckpoint
+    run_id = run_id or RunCheckpoint.new_run_id()
+    units = plan_units(resources.accounts(), resources.credentials)
+    # One timestamp for the whole run, so rows from every worker belong to the same scan
+    open_queue(resources).enqueue_run(run_id, units, {"timestamp": generate_timestamp()})
+    return run_id
+
+class ScanWorker:
+    def __init__(self, resources: Optional[WarmResources] = None, stages: Optional[List[str]] = None,
+                 concurrency: int = WORKER_CONCURRENCY, poll_interval: float = WORKER_POLL_INTERVAL,
+                 worker_id: Optional[str] = None, drain: bool = False):
+        self.resources = resources or WarmResources()
+        self.stages = stages or [s.strip() for s in os.getenv("WORKER_STAGES", "").split(",") if s.strip()] or None
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.drain = drain  # exit once no job is queued or running anywhere instead of polling
+        self.queue = open_queue(self.resources)
+        self.accounts = self.resources.accounts()
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def _scan_run(self, job: Job):
+        from src.main import ScanRun
+        resources = self.resources
+        run = ScanRun(estimator=resources.estimator, detector=resources.detector, db=resources.db,
+                      bot=resources.bot, accounts=self.accounts, credentials=resources.credentials)
+        run.timestamp = job.payload.get("timestamp") or run.timestamp
+        if split_unit(job.unit)[0] is None:
+            run.default_account_id = resources.credentials.default_account_id()
+        return run
+
+    def execute(self, job: Job) -> Dict[str, Any]:
+        """Run one stage over the unit's batches and return the output for the next stage"""
+        from src.main import STAGES, scan_filename
+        from src.core.scan_store import save_scan
+        run = self._scan_run(job)
+        if job.stage == STAGES[0]:
+            batches = list(run.scan(job.unit))
+        else:
+            batches = self.queue.stage_input(job)["batches"]
+            step = getattr(run, job.stage)
+            # The detector's model and history index are shared by every job in this process
+            with self.resources.history_lock if job.stage == "detect" else nullcontext():
+                if job.stage == "detect":
+                    self.resources.detector.refresh_history()
+                for batch in batches:
+                    if self._stop.is_set() and job.stage != STAGES[-1]:
+                        raise JobInterrupted(f"{job} interrupted by shutdown")
+                    step(batch)
+                    batch["stage"] = job.stage
+
+        if job.stage == "persist":
+            run.refresh_rollups()
+            instances = [inst for batch in batches for inst in batch["instances"]]
+            save_scan(instances, scan_filename(run.timestamp, job.unit))
+        if job.stage == STAGES[-1]:
+            # Nothing runs after the last stage, so keep a summary instead of every record
+            return {"pages": len(batches),
+                    "instances": sum(len(batch["instances"]) for batch in batches),
+                    "anomalies": sum(len(batch["anomalies"]) for batch in batches)}
+        return {"batches": batches}
+
+    def process(self, job: Job):
+        """Execute a claimed job while heartbeating its lease, then complete, fail or release it"""
+        if self._stop.is_set():  # claimed while the shutdown signal arrived
+            self.release(job)
+            return
+        finished, lost = threading.Event(), threading.Event()
+
+        def heartbeat():
+            while not finished.wait(self.queue.lease_seconds / 3):
+                try:
+                    if not self.queue.heartbeat(job):
+                        logger.warning(f"[!] {job} lost its lease, its result will be discarded")
+                        lost.set()
+                        return
+                except Exception as e:
+                    logger.warning(f"[!] Heartbeat for {job} failed: {e}")
+
+        beat = threading.Thread(target=heartbeat, name=f"heartbeat-{job.id}", daemon=True)
+        beat.start()
+        interrupted = False
+        try:
+            result = self.execute(job)
+            error = None
+        except JobInterrupted:
+            result, error, interrupted = None, None, True
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+        finally:
+            finished.set()
+            beat.join()
+
+        if lost.is_set():
+            return
+        if interrupted:
+            self.release(job)
+            return
+        try:
+            if error is None:
+                self.queue.complete(job, result)
+            else:
+                self.queue.fail(job, error)
+        except LeaseLostError as e:
+            logger.warning(f"[!] {e}")
+
+    def release(self, job: Job):
+        try:
+            self.queue.release(job)
+            logger.info(f"[*] Handed {job} back to the queue")
+        except Exception as e:
+            logger.warning(f"[!] Could not release {job}, it will be retried once its lease expires: {e}")
+
+    def _idle(self) -> bool:
+        """True when draining and no job of any run is queued or running"""
+        try:
+            return self.drain and self.queue.open_jobs() == 0
+        except Exception as e:
+            logger.error(f"[!] Could not count open jobs: {e}")
+            return False
+
+    def _loop(self, slot: int):
+        worker_id = f"{self.worker_id}/{slot}"
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(worker_id, self.stages)
+                if job is None:
+                    self.queue.reap()
+            except Exception as e:
+                logger.error(f"[!] {worker_id} could not claim a job: {e}")
+                self._stop.wait(self.poll_interval)
+                continue
+            if job is None:
+                # Running jobs queue their next stage and failed ones come back after a delay,
+                # so a draining worker only leaves once nothing is open at all
+                if self._idle():
+                    return
+                self._stop.wait(self.poll_interval)
+                continue
+            self.process(job)
+
+    def run(self):
+        def handle_signal(signum, _frame):
+            logger.info(f"[*] Received {signal.Signals(signum).name}, handing claimed jobs back")
+            self.stop()
+
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, handle_signal)
+            signal.signal(signal.SIGINT, handle_signal)
+        logger.info(f"[*] Worker {self.worker_id} started with {self.concurrency} slot(s), "
+                    f"stages: {', '.join(self.stages) if self.stages else 'all'}")
+        threads = [threading.Thread(target=self._loop, args=(slot,), name=f"worker-{slot}")
+                   for slot in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        finally:
+            self.resources.close()
+            logger.info(f"[+] Worker {self.worker_id} stopped")
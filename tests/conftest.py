@@ -0,0 +1,40 @@
+# tests/conftest.py
+
+import os
+import sys
+import uuid
+import pytest
+
+# Tests import the application as `src.*`, like `python -m src.cli` does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+@pytest.fixture
+def pg_pool():
+    """
+    ConnectionPool on a scratch database, dropped afterwards.
+
+    Needs a PostgreSQL named by TEPHRON_TEST_DB_HOST (plus optional
+    TEPHRON_TEST_DB_USER / TEPHRON_TEST_DB_PASSWORD); skipped without one.
+    """
+    host = os.getenv("TEPHRON_TEST_DB_HOST")
+    if not host:
+        pytest.skip("TEPHRON_TEST_DB_HOST is not set")
+    psycopg2 = pytest.importorskip("psycopg2")
+    from src.core.db_handler import ConnectionPool
+
+    server = {"host": host, "user": os.getenv("TEPHRON_TEST_DB_USER", "postgres"),
+              "password": os.getenv("TEPHRON_TEST_DB_PASSWORD", "postgres")}
+    name = f"tephron_test_{uuid.uuid4().hex[:12]}"
+    admin = psycopg2.connect(database="postgres", **server)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE DATABASE {name};")
+    pool = ConnectionPool(1, 8, database=name, **server)
+    try:
+        yield pool
+    finally:
+        pool.close()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS {name} WITH (FORCE);")
+        admin.close()
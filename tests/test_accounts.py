@@ -0,0 +1,69 @@
+# tests/test_accounts.py
+
+import threading
+import time
+import boto3
+from src.core.accounts import Account, CredentialCache
+from src.core.aws_clients import AWSClientRegistry
+from src.core.rate_limiter import AWSCallGuard
+
+def keys(n):
+    return {"aws_access_key_id": f"AKIAEXAMPLE{n:09d}", "aws_secret_access_key": "secret", "aws_session_token": "token"}
+
+def test_renewed_credentials_replace_the_session_and_drop_its_clients():
+    registry = AWSClientRegistry(guard=AWSCallGuard(quotas={}))
+    session = registry.scoped_session("111122223333", keys(1), "us-east-1", "111122223333")
+    assert registry.scoped_session("111122223333", keys(1), "us-east-1", "111122223333") is session
+    client = registry.get_client("ec2", "us-east-1", session)
+    assert registry.get_client("ec2", "us-east-1", session) is client
+    other = registry.get_client("ec2", "us-east-1", registry.scoped_session("444455556666", keys(2), "us-east-1"))
+
+    renewed = registry.scoped_session("111122223333", keys(3), "us-east-1", "111122223333")
+    assert renewed is not session
+    assert registry.get_client("ec2", "us-east-1", renewed) is not client
+    assert set(registry._clients.values()) == {other, registry.get_client("ec2", "us-east-1", renewed)}
+    assert len(registry._sessions) == 2
+
+def test_each_account_gets_its_own_token_buckets():
+    guard = AWSCallGuard(quotas={})
+    registry = AWSClientRegistry(guard=guard)
+    clients = [registry.get_client("sts", "us-east-1", boto3.Session(region_name="us-east-1", **keys(9)))]
+    for account_id in ("111122223333", "444455556666"):
+        session = registry.scoped_session(account_id, keys(int(account_id[:3])), "us-east-1", account_id)
+        clients.append(registry.get_client("sts", "us-east-1", session))
+    for client in clients:
+        client.meta.events.emit("before-send.sts.GetCallerIdentity", request=None)  # as botocore does per attempt
+    assert sorted(guard.status()["buckets"]) == [
+        "111122223333/sts/us-east-1/sts", "444455556666/sts/us-east-1/sts", "default/sts/us-east-1/sts"]
+
+def test_assume_role_runs_once_per_role_without_blocking_other_roles():
+    cache = CredentialCache(boto3.Session(region_name="us-east-1", **keys(0)))
+    slow, fast = Account("111122223333", role_arn="arn:aws:iam::111122223333:role/Slow"), \
+        Account("444455556666", role_arn="arn:aws:iam::444455556666:role/Fast")
+    release, calls = threading.Event(), []
+
+    def assume(account):
+        calls.append(account.account_id)
+        if account is slow:
+            release.wait(5)
+        return keys(len(calls)), time.time() + 3600, None
+
+    cache._assume = assume
+    waiters = [threading.Thread(target=cache.credentials, args=(slow,)) for _ in range(3)]
+    for thread in waiters:
+        thread.start()
+    time.sleep(0.1)
+    assert cache.credentials(fast) is not None  # not held up by the slow role's STS call
+    release.set()
+    for thread in waiters:
+        thread.join(5)
+    assert sorted(calls) == ["111122223333", "444455556666"]
+
+def test_credentials_are_renewed_near_expiry():
+    cache = CredentialCache(boto3.Session(region_name="us-east-1", **keys(0)), refresh_margin=900)
+    account = Account("111122223333", role_arn="arn:aws:iam::111122223333:role/Scan")
+    expiries = iter([time.time() + 600, time.time() + 3600])
+    cache._assume = lambda account: (keys(len(cache._entries)), next(expiries), None)
+    first = cache.credentials(account)
+    assert cache.credentials(account) is not first  # 600s left is inside the refresh margin
+    assert cache.credentials(account) is cache.credentials(account)
@@ -0,0 +1,94 @@
+# tests/test_anomaly_detector.py
+
+from src.ai.ml import anomaly_detector
+from src.ai.ml.anomaly_detector import InstanceAnomalyDetector
+from src.ai.ml.history_index import InstanceHistoryIndex
+from src.core.serialization import save_records
+
+NOW = 1791158400.0  # 2026-10-05T00:00:00Z
+
+def write_scan(directory, day, instance_ids, cpu=5.0):
+    timestamp = f"2026-10-0{day}T00:00:00"
+    records = [{"InstanceId": instance_id, "timestamp": timestamp, "CPUUtilization": cpu + i}
+               for i, instance_id in enumerate(instance_ids)]
+    save_records(records, str(directory / f"ec2_scan_{timestamp.replace(':', '-')}.json"), timestamp)
+
+def detector_for(tmp_path):
+    history = InstanceHistoryIndex(str(tmp_path) + "/", str(tmp_path / "cache" / "index.pkl"))
+    detector = InstanceAnomalyDetector(history, model_path=str(tmp_path / "models" / "model.joblib"))
+    calls = []
+    train = detector.train
+    detector.train = lambda now=None: calls.append(now) or train(now)
+    return detector, calls
+
+def test_failed_training_is_not_retried_until_history_changes(tmp_path):
+    for day in (1, 2, 3):
+        write_scan(tmp_path, day, ["i-1", "i-2"])
+    detector, calls = detector_for(tmp_path)
+
+    for _ in range(5):
+        [flagged] = detector.flag_underutilized_instances([{"InstanceId": "i-1"}], now=NOW)
+        assert flagged["AnomalyScore"] is None  # no model, flagged by the CPU threshold alone
+    assert len(calls) == 1
+
+    write_scan(tmp_path, 4, ["i-1", "i-2"])
+    detector.refresh_history()
+    detector.flag_underutilized_instances([{"InstanceId": "i-1"}], now=NOW)
+    assert len(calls) == 2
+
+def test_model_is_trained_once_there_is_enough_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(anomaly_detector, "MIN_TRAINING_ROWS", 3)
+    instance_ids = [f"i-{n}" for n in range(4)]
+    for day in (1, 2, 3):
+        write_scan(tmp_path, day, instance_ids)
+    detector, calls = detector_for(tmp_path)
+
+    assert detector.ensure_model(NOW)
+    assert detector.ensure_model(NOW)
+    assert len(calls) == 1
+
+def test_small_fleet_without_a_model_is_flagged_by_cpu_threshold(tmp_path):
+    for day in (1, 2, 3):
+        write_scan(tmp_path, day, ["i-idle", "i-off"] + ["i-pad"] * 55, cpu=4.0)  # i-pad averages well above 10%
+    detector, _ = detector_for(tmp_path)
+
+    instances = [{"InstanceId": "i-idle", "Region": "us-east-1", "MonthlyForecast": 12.5},
+                 {"InstanceId": "i-pad"}, {"InstanceId": "i-new"},
+                 {"InstanceId": "i-off", "State": "stopped"}]
+    [flagged] = detector.flag_underutilized_instances(instances, now=NOW)
+    assert flagged["InstanceId"] == "i-idle" and flagged["CPUUtilization"] == 4.0
+    assert flagged["Region"] == "us-east-1" and flagged["monthly_forecast"] == 12.5
+    assert flagged["AnomalyScore"] is None and detector.model is None
+
+def test_all_idle_fleet_is_flagged_with_scores_as_context(tmp_path, monkeypatch):
+    monkeypatch.setattr(anomaly_detector, "MIN_TRAINING_ROWS", 5)
+    instance_ids = [f"i-{n}" for n in range(8)]
+    for day in (1, 2, 3, 4):
+        write_scan(tmp_path, day, instance_ids, cpu=1.0)  # every instance idle: all of them are inliers
+    detector, _ = detector_for(tmp_path)
+
+    flagged = detector.flag_underutilized_instances([{"InstanceId": i} for i in instance_ids], now=NOW)
+    assert [f["InstanceId"] for f in flagged] == instance_ids
+    assert detector.model is not None
+    assert all(isinstance(f["AnomalyScore"], float) for f in flagged)
+
+def test_streaming_detector_tracks_its_position(tmp_path):
+    detector = anomaly_detector.StreamingInstanceDetector(str(tmp_path / "stream.json"))
+    assert detector.last_timestamp("i-1") is None
+    detector.observe("i-1", "CPUUtilization", [(NOW + 300, 5.0), (NOW, 4.0)])
+    detector.observe("i-1", "CPUUtilization", [(NOW, 90.0)])  # replayed datapoints are ignored
+    assert detector.last_timestamp("i-1") == NOW + 300
+    assert detector.states["i-1"].count == 2
+
+def test_streaming_state_of_idle_instances_is_evicted(tmp_path):
+    path = str(tmp_path / "stream.json")
+    detector = anomaly_detector.StreamingInstanceDetector(path, idle_days=2)
+    detector.observe("i-gone", "CPUUtilization", [(NOW - 3 * 86400, 5.0)], region="us-east-1")
+    detector.observe("i-live", "CPUUtilization", [(NOW - 3600, 5.0)], region="us-east-1")
+    detector.observe("i-empty", "CPUUtilization", [(NOW, None)])  # state without any datapoint
+
+    detector.checkpoint(now=NOW)
+    assert set(detector.states) == {"i-live"} and set(detector.regions) == {"i-live"}
+
+    restored = anomaly_detector.StreamingInstanceDetector(path, idle_days=2)
+    assert restored.load() and set(restored.states) == {"i-live"}
@@ -0,0 +1,52 @@
+# tests/test_aws_clients.py
+
+import threading
+import boto3
+from src.core import aws_clients
+from src.core.aws_clients import AWSClientRegistry
+from src.core.rate_limiter import AWSCallGuard
+
+def registry_with_default_session(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "AKIAEXAMPLEEXAMPLE")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "secret")
+    return AWSClientRegistry(max_pool_connections=7, guard=AWSCallGuard(quotas={}))
+
+def test_clients_are_shared_per_service_region_and_session(monkeypatch):
+    registry = registry_with_default_session(monkeypatch)
+    session = registry.get_session()
+    assert registry.get_session() is session
+
+    client = registry.get_client("ec2", "us-east-1")
+    assert registry.get_client("ec2", "us-east-1", session) is client
+    assert registry.get_client("ec2", "eu-west-1") is not client
+    assert registry.get_client("cloudwatch", "us-east-1") is not client
+    other_session = boto3.Session(aws_access_key_id="AKIAOTHEREXAMPLE", aws_secret_access_key="secret")
+    assert registry.get_client("ec2", "us-east-1", other_session) is not client
+
+    assert client.meta.config.max_pool_connections == 7
+    assert client.meta.config.retries["mode"] == aws_clients.RETRY_MODE
+
+def test_concurrent_callers_get_one_client(monkeypatch):
+    registry = registry_with_default_session(monkeypatch)
+    barrier = threading.Barrier(8)
+    clients = []
+
+    def get():
+        barrier.wait()
+        clients.append(registry.get_client("ec2", "us-east-1"))
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(clients) == 8 and len({id(client) for client in clients}) == 1
+    assert len(registry._clients) == 1
+
+def test_clear_drops_clients_and_the_default_session(monkeypatch):
+    registry = registry_with_default_session(monkeypatch)
+    session = registry.get_session()
+    client = registry.get_client("ec2", "us-east-1")
+    registry.clear()
+    assert registry.get_session() is not session
+    assert registry.get_client("ec2", "us-east-1") is not client
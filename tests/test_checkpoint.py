@@ -0,0 +1,68 @@
+# tests/test_checkpoint.py
+
+from datetime import datetime, timedelta
+import pytest
+from src.core.checkpoint import RunCheckpoint
+
+STAGES = ["scan", "enrich", "persist"]
+
+def batch(unit, page, stage):
+    return {"unit": unit, "region": unit, "page": page, "stage": stage,
+            "instances": [{"InstanceId": f"i-{unit}-{page}"}], "anomalies": []}
+
+def test_resumed_run_keeps_done_units_and_replays_pages(tmp_path):
+    checkpoint = RunCheckpoint("20261001T060000", STAGES, str(tmp_path))
+    assert not checkpoint.resumed
+    checkpoint.set("timestamp", "2026-10-01T06:00:00")
+    for page in range(2):
+        checkpoint.save_page(batch("us-east-1", page, "scan"))
+    checkpoint.scan_finished("us-east-1", 2)
+    checkpoint.save_page(batch("us-east-1", 0, "enrich"))
+    checkpoint.unit_failed("us-east-1", "enrich", "throttled")
+    assert checkpoint.unit_done("us-east-1", "scan") and not checkpoint.unit_done("us-east-1", "enrich")
+
+    resumed = RunCheckpoint("20261001T060000", STAGES, str(tmp_path))
+    assert resumed.resumed and resumed.get("timestamp") == "2026-10-01T06:00:00"
+    assert resumed.unit_done("us-east-1", "scan") and not resumed.unit_done("us-east-1", "enrich")
+    pages = resumed.load_pages("us-east-1")
+    assert [(b["page"], b["stage"]) for b in pages] == [(0, "enrich"), (1, "scan")]
+
+    resumed.save_page({**pages[1], "stage": "enrich"})  # only the page that missed enrich is redone
+    assert resumed.unit_done("us-east-1", "enrich") and not resumed.unit_done("us-east-1", "persist")
+
+def test_unfinished_scan_is_discarded(tmp_path):
+    checkpoint = RunCheckpoint("20261001T060000", STAGES, str(tmp_path))
+    checkpoint.save_page(batch("us-east-1", 0, "scan"))  # the scan never finished
+    checkpoint.discard_region("us-east-1")
+    assert RunCheckpoint("20261001T060000", STAGES, str(tmp_path)).load_pages("us-east-1") == []
+
+def test_latest_unfinished_skips_completed_runs(tmp_path):
+    RunCheckpoint("20261001T050000", STAGES, str(tmp_path)).set("timestamp", "a")
+    completed = RunCheckpoint("20261001T060000", STAGES, str(tmp_path))
+    completed.complete()
+    assert RunCheckpoint.latest_unfinished(str(tmp_path)) == "20261001T050000"
+
+@pytest.fixture
+def checkpoints(tmp_path, monkeypatch):
+    """src.main's checkpoints, kept under tmp_path"""
+    pytest.importorskip("slack_sdk")
+    import src.main as main
+
+    class TmpCheckpoint(RunCheckpoint):
+        def __init__(self, run_id, stages, directory=str(tmp_path)):
+            super().__init__(run_id, stages, directory)
+
+        @staticmethod
+        def latest_unfinished(directory=str(tmp_path)):
+            return RunCheckpoint.latest_unfinished(directory)
+
+    monkeypatch.setattr(main, "RunCheckpoint", TmpCheckpoint)
+    return main
+
+def test_latest_resumes_only_runs_younger_than_max_age(checkpoints):
+    run_id = (datetime.utcnow() - timedelta(hours=2)).strftime("%Y%m%dT%H%M%S")
+    checkpoints.RunCheckpoint(run_id, STAGES).set("timestamp", "a")
+
+    assert checkpoints.open_checkpoint("latest", max_age_hours=6).run_id == run_id
+    fresh = checkpoints.open_checkpoint("latest", max_age_hours=1)  # e.g. the daemon's hourly scan
+    assert fresh.run_id != run_id and not fresh.resumed
@@ -0,0 +1,69 @@
+# tests/test_cost_estimator.py
+
+from decimal import Decimal
+import pytest
+from botocore.exceptions import ClientError
+from src.aws.cost.engine import FleetCostEngine
+from src.aws.ec2.cost_estimator import EC2CostEstimator
+
+class FakeSpotPrices:
+    def prefetch(self, region, instance_types):
+        pass
+
+    def get_spot_hourly_rate(self, region, instance_type):
+        return Decimal(0)
+
+class FakePricing:
+    def __init__(self, rates, error=None):
+        self.rates = rates
+        self.error = error
+        self.calls = 0
+
+    def get_on_demand_hourly_rate(self, instance_type, region):
+        self.calls += 1
+        if instance_type not in self.rates:
+            raise self.error or ValueError(f"no price for {instance_type}")
+        return self.rates[instance_type]
+
+def estimator(pricing):
+    est = EC2CostEstimator.__new__(EC2CostEstimator)
+    est.pricing = pricing
+    est.spot_prices = FakeSpotPrices()
+    est.cost_engine = FleetCostEngine()
+    return est
+
+def instance(instance_id, instance_type, cpu=5.0):
+    return {"InstanceId": instance_id, "Region": "us-east-1", "InstanceType": instance_type, "CPUUtilization": cpu}
+
+def test_unpriceable_instances_stay_in_the_batch():
+    pricing = FakePricing({"m5.large": Decimal("0.096")})
+    batch = [instance("i-1", "m5.large"), instance("i-2", "x9.huge"), instance("i-3", "x9.huge")]
+    priced = estimator(pricing).price_instances(batch)
+
+    assert [inst["InstanceId"] for inst in priced] == ["i-1", "i-2", "i-3"]
+    assert priced[0]["HourlyRate"] == Decimal("0.096") and "PricingError" not in priced[0]
+    assert priced[0]["Underutilized"] is True
+    for inst in priced[1:]:
+        assert inst["HourlyRate"] == 0 and inst["MonthlyCostEstimate"] == Decimal("0.00")
+        assert inst["Underutilized"] is False
+        assert "no price for x9.huge" in inst["PricingError"]
+    assert pricing.calls == 2  # the failed (region, type) is not looked up again
+
+def test_throttled_lookup_fails_the_batch():
+    throttled = ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "GetProducts")
+    with pytest.raises(ClientError):
+        estimator(FakePricing({}, throttled)).price_instances([instance("i-1", "m5.large")])
+
+def test_both_estimators_agree_on_monthly_cost_and_forecast():
+    from src.aws.cost.cost_estimator import EC2CostEstimator as FleetCostEstimator
+
+    priced = estimator(FakePricing({"m5.large": Decimal("0.096")})).price_instances([instance("i-1", "m5.large")])
+    fleet = FleetCostEstimator.__new__(FleetCostEstimator)
+    fleet.cost_engine = FleetCostEngine()
+    fleet.instance_cost_cache = {"us-east-1:m5.large": 0.096}
+    [costed] = fleet.get_fleet_costs([instance("i-1", "m5.large")])
+
+    # Undiscounted 730-hour cost vs the 40% utilization-band forecast of an idle instance
+    assert priced[0]["MonthlyCostEstimate"] == Decimal("70.08") and costed["MonthlyCostEstimate"] == 70.08
+    assert priced[0]["MonthlyForecast"] == Decimal("28.03") and costed["MonthlyForecast"] == 28.03
+    assert priced[0]["CostImpactRank"] == "medium"
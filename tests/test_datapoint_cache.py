@@ -0,0 +1,51 @@
+# tests/test_datapoint_cache.py
+
+from array import array
+from src.aws.cloudwatch.datapoint_cache import DatapointCache
+
+DAY = 86400
+NOW = 1791158400
+
+def cache_for(tmp_path, retention_days=90):
+    return DatapointCache(str(tmp_path), retention_days)
+
+def test_merge_orders_points_and_newer_fetches_win(tmp_path):
+    cache = cache_for(tmp_path)
+    cache.merge("us-east-1", "i-1", "CPUUtilization", 3600, [(NOW - 3600, 5.0), (NOW - 7200, 4.0)], NOW)
+    timestamps, values = cache.merge("us-east-1", "i-1", "CPUUtilization", 3600,
+                                     [(NOW - 3600, 7.5), (NOW, 9.0)], NOW)  # the partial hour was revised
+
+    assert list(timestamps) == [NOW - 7200, NOW - 3600, NOW] and list(values) == [4.0, 7.5, 9.0]
+    assert cache.load("us-east-1", "i-1", "CPUUtilization", 3600) == (timestamps, values)
+    assert cache.last_timestamp("us-east-1", "i-1", "CPUUtilization", 3600) == NOW
+    assert cache.last_timestamp("us-east-1", "i-1", "NetworkIn", 3600) is None
+
+def test_merge_drops_points_older_than_retention(tmp_path):
+    cache = cache_for(tmp_path, retention_days=2)
+    timestamps, _ = cache.merge("us-east-1", "i-1", "CPUUtilization", 3600,
+                                [(NOW - 3 * DAY, 1.0), (NOW - DAY, 2.0)], NOW)
+    assert list(timestamps) == [NOW - DAY]
+
+    timestamps, values = cache.merge("us-east-1", "i-1", "CPUUtilization", 3600, [(NOW + DAY, 3.0)], NOW + 2 * DAY)
+    assert list(timestamps) == [NOW + DAY] and list(values) == [3.0]
+
+def test_merge_without_points_leaves_the_file_alone(tmp_path):
+    cache = cache_for(tmp_path)
+    assert cache.merge("us-east-1", "i-1", "CPUUtilization", 3600, [], NOW) == (array("q"), array("d"))
+    assert not list(tmp_path.iterdir())
+
+def test_merge_uses_the_series_the_caller_loaded(tmp_path, monkeypatch):
+    cache = cache_for(tmp_path)
+    cache.merge("us-east-1", "i-1", "CPUUtilization", 3600, [(NOW - 3600, 5.0)], NOW)
+    cached = cache.load("us-east-1", "i-1", "CPUUtilization", 3600)
+
+    monkeypatch.setattr(cache, "load", lambda *args: (_ for _ in ()).throw(AssertionError("re-read")))
+    timestamps, values = cache.merge("us-east-1", "i-1", "CPUUtilization", 3600, [(NOW, 6.0)], NOW, cached)
+    assert list(values) == [5.0, 6.0]
+
+def test_unreadable_file_is_discarded(tmp_path):
+    cache = cache_for(tmp_path)
+    path = tmp_path / "us-east-1" / "i-1" / "CPUUtilization_3600.bin"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"garbage")
+    assert cache.load("us-east-1", "i-1", "CPUUtilization", 3600) == (array("q"), array("d"))
@@ -0,0 +1,83 @@
+# tests/test_db_pool.py
+
+import threading
+import time
+import pytest
+from src.core import db_handler
+from src.core.db_handler import ConnectionPool
+
+def pool_like(pg_pool, size, timeout):
+    return ConnectionPool(1, size, timeout=timeout, **pg_pool._pool._kwargs)
+
+def test_checkout_waits_for_a_free_connection_then_times_out(pg_pool):
+    pool = pool_like(pg_pool, 1, 0.2)
+    try:
+        held, released = threading.Event(), threading.Event()
+
+        def hold():
+            with pool.connection():
+                held.set()
+                released.wait(5)
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        assert held.wait(5)
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            pool._checkout()
+        assert time.monotonic() - started >= 0.2
+
+        threading.Timer(0.05, released.set).start()
+        with pool.cursor() as cur:  # waits for the holder instead of failing
+            cur.execute("SELECT 1")
+            assert cur.fetchone() == (1,)
+        holder.join()
+    finally:
+        pool.close()
+
+def test_idle_dead_connection_is_replaced(pg_pool, monkeypatch):
+    pool = pool_like(pg_pool, 2, 1)
+    try:
+        with pool.cursor() as cur:
+            cur.execute("SELECT pg_backend_pid()")
+            [pid] = cur.fetchone()
+        with pg_pool.cursor() as cur:
+            cur.execute("SELECT pg_terminate_backend(%s)", (pid,))
+        monkeypatch.setattr(db_handler, "HEALTH_CHECK_IDLE_SECONDS", 0)  # every checkout is pinged
+
+        with pool.cursor() as cur:
+            cur.execute("SELECT pg_backend_pid()")
+            assert cur.fetchone()[0] != pid
+    finally:
+        pool.close()
+
+def test_only_idle_connections_are_pinged(monkeypatch):
+    class FakeConnection:
+        closed = 0
+
+        def __init__(self):
+            self.pings = 0
+
+        def cursor(self):
+            self.pings += 1
+            raise OSError("server closed the connection unexpectedly")
+
+    pool = ConnectionPool.__new__(ConnectionPool)
+    pool._last_used = {}
+    conn = FakeConnection()
+    pool._last_used[id(conn)] = time.monotonic()
+    assert pool._is_healthy(conn) and conn.pings == 0
+
+    monkeypatch.setattr(db_handler, "HEALTH_CHECK_IDLE_SECONDS", 0)
+    assert not pool._is_healthy(conn) and conn.pings == 1
+
+def test_failed_transaction_is_rolled_back_and_the_connection_reused(pg_pool):
+    with pg_pool.cursor() as cur:
+        cur.execute("CREATE TABLE pool_probe (id INTEGER)")
+    with pytest.raises(RuntimeError):
+        with pg_pool.cursor() as cur:
+            cur.execute("INSERT INTO pool_probe VALUES (1)")
+            raise RuntimeError("boom")
+    with pg_pool.cursor() as cur:
+        cur.execute("SELECT count(*) FROM pool_probe")
+        assert cur.fetchone() == (0,)
@@ -0,0 +1,49 @@
+# tests/test_db_schema.py
+
+from datetime import date, datetime
+from src.core.db_schema import DEFAULT_PARTITION, MIGRATIONS, detach_partitions_before, ensure_partitions, migrate
+
+def insert_instance(pool, instance_id, timestamp):
+    with pool.cursor() as cur:
+        cur.execute("INSERT INTO ec2_instances (instance_id, timestamp, cpu_utilization) VALUES (%s, %s, 5);",
+                    (instance_id, timestamp))
+
+def rows_in(pool, table):
+    with pool.cursor() as cur:
+        cur.execute(f"SELECT instance_id FROM {table} ORDER BY instance_id;")
+        return [row[0] for row in cur.fetchall()]
+
+def partition_of(pool, instance_id):
+    with pool.cursor() as cur:
+        cur.execute("SELECT tableoid::regclass::text FROM ec2_instances WHERE instance_id = %s;", (instance_id,))
+        return cur.fetchone()[0]
+
+def test_migrate_is_idempotent(pg_pool):
+    assert migrate(pg_pool) == [version for version, _, _ in MIGRATIONS]
+    assert migrate(pg_pool) == []
+
+def test_new_partition_takes_over_rows_from_the_default_partition(pg_pool):
+    migrate(pg_pool)
+    insert_instance(pg_pool, "i-backfilled", datetime(2020, 1, 15))
+    insert_instance(pg_pool, "i-other-month", datetime(2020, 2, 1))
+    assert rows_in(pg_pool, DEFAULT_PARTITION) == ["i-backfilled", "i-other-month"]
+
+    with pg_pool.cursor() as cur:
+        ensure_partitions(cur, date(2020, 1, 1), date(2020, 1, 31))
+    assert partition_of(pg_pool, "i-backfilled") == "ec2_instances_p202001"
+    assert rows_in(pg_pool, DEFAULT_PARTITION) == ["i-other-month"]
+
+    # Later runs find the partition and leave it alone
+    with pg_pool.cursor() as cur:
+        ensure_partitions(cur, date(2020, 1, 1), date(2020, 1, 31))
+    assert rows_in(pg_pool, "ec2_instances") == ["i-backfilled", "i-other-month"]
+
+def test_retention_covers_rows_in_the_default_partition(pg_pool):
+    migrate(pg_pool)
+    insert_instance(pg_pool, "i-expired", datetime(2019, 3, 10))
+    insert_instance(pg_pool, "i-kept", datetime(2019, 12, 20))
+
+    dropped = detach_partitions_before(pg_pool, date(2019, 12, 1), drop=True)
+    assert dropped == ["ec2_instances_p201903"]
+    assert rows_in(pg_pool, "ec2_instances") == ["i-kept"]
+    assert partition_of(pg_pool, "i-kept") == DEFAULT_PARTITION
@@ -0,0 +1,59 @@
+# tests/test_history_index.py
+
+import math
+from src.ai.ml.history_index import InstanceHistoryIndex, parse_timestamp
+from src.core.serialization import save_records
+
+def write_scan(directory, name, timestamp, cpu_by_instance):
+    records = [{"InstanceId": instance_id, "timestamp": timestamp, "CPUUtilization": cpu, "NetworkIn": 1.0}
+               for instance_id, cpu in cpu_by_instance.items()]
+    save_records(records, str(directory / name), timestamp)
+
+def index_for(tmp_path):
+    return InstanceHistoryIndex(str(tmp_path) + "/", str(tmp_path / "cache" / "index.pkl"))
+
+def test_new_scans_are_appended_in_place(tmp_path):
+    write_scan(tmp_path, "ec2_scan_2026-10-01T00-00-00.json", "2026-10-01T00:00:00", {"i-1": 10.0, "i-2": 20.0})
+    index = index_for(tmp_path)
+    assert index.update() == 1
+    timestamps, cpus = index.get_series("i-1")
+    untouched = index.get_series("i-2")
+
+    write_scan(tmp_path, "ec2_scan_2026-10-02T00-00-00.json", "2026-10-02T00:00:00", {"i-1": 30.0, "i-3": 5.0})
+    assert index.update() == 1
+    assert index.get_series("i-1")[0] is timestamps  # extended, not rebuilt
+    assert list(cpus) == [10.0, 30.0]
+    assert index.get_series("i-2") is untouched
+    assert list(index.get_series("i-3")[1]) == [5.0]
+    network_in, network_out = index.get_network("i-1")
+    assert list(network_in) == [1.0, 1.0] and all(math.isnan(v) for v in network_out)
+
+def test_back_filled_scans_are_merged_in_order(tmp_path):
+    write_scan(tmp_path, "ec2_scan_2026-10-02T00-00-00.json", "2026-10-02T00:00:00", {"i-1": 30.0})
+    index = index_for(tmp_path)
+    index.update()
+    write_scan(tmp_path, "ec2_scan_2026-10-01T00-00-00.json", "2026-10-01T00:00:00", {"i-1": 10.0})
+    index.update()
+    timestamps, cpus = index.get_series("i-1")
+    assert list(timestamps) == [parse_timestamp("2026-10-01T00:00:00"), parse_timestamp("2026-10-02T00:00:00")]
+    assert list(cpus) == [10.0, 30.0]
+
+def test_append_while_a_view_is_held(tmp_path):
+    write_scan(tmp_path, "ec2_scan_2026-10-01T00-00-00.json", "2026-10-01T00:00:00", {"i-1": 10.0})
+    index = index_for(tmp_path)
+    index.update()
+    view = memoryview(index.get_series("i-1")[1])  # e.g. np.frombuffer in to_columns
+    write_scan(tmp_path, "ec2_scan_2026-10-02T00-00-00.json", "2026-10-02T00:00:00", {"i-1": 30.0})
+    index.update()
+    assert list(index.get_series("i-1")[1]) == [10.0, 30.0]
+    assert len(index.get_network("i-1")[0]) == 2
+    view.release()
+
+def test_index_round_trips_through_save_and_load(tmp_path):
+    write_scan(tmp_path, "ec2_scan_2026-10-01T00-00-00.json", "2026-10-01T00:00:00", {"i-1": 10.0})
+    index = index_for(tmp_path)
+    index.refresh()
+    reloaded = index_for(tmp_path)
+    assert reloaded.load()
+    assert list(reloaded.get_series("i-1")[1]) == [10.0]
+    assert reloaded.update() == 0
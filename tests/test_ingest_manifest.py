@@ -0,0 +1,72 @@
+# tests/test_ingest_manifest.py
+
+from datetime import datetime
+import pytest
+from scripts import ingest_json_to_postgres as ingester
+from src.core.db_handler import PostgresHandler
+from src.core.db_schema import migrate
+from src.core.scan_archive import ScanCompactor
+from src.core.serialization import save_records
+
+def write_scan(directory, timestamp, instance_ids):
+    records = [{"InstanceId": instance_id, "Region": "us-east-1", "timestamp": timestamp, "CPUUtilization": 3.5}
+               for instance_id in instance_ids]
+    save_records(records, str(directory / f"ec2_scan_{timestamp.replace(':', '-')}.json"), timestamp)
+
+@pytest.fixture
+def pg(pg_pool):
+    migrate(pg_pool)
+    return PostgresHandler(pg_pool)
+
+def stored(pg):
+    with pg.pool.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM ec2_instances;")
+        return cur.fetchone()[0]
+
+def test_current_schema_costs_no_migration_transactions(pg, monkeypatch):
+    checkouts = []
+    cursor = pg.pool.cursor
+    monkeypatch.setattr(pg.pool, "cursor", lambda: checkouts.append(1) or cursor())
+    assert migrate(pg.pool) == []
+    assert len(checkouts) == 2  # read the applied versions, keep partitions ahead
+
+def test_archive_of_ingested_files_is_not_parsed_again(pg, tmp_path, monkeypatch):
+    write_scan(tmp_path, "2026-10-01T00:00:00", ["i-1", "i-2"])
+    write_scan(tmp_path, "2026-10-01T06:00:00", ["i-1", "i-2"])
+    assert ingester.ingest(pg, str(tmp_path) + "/") == 4
+
+    ScanCompactor(str(tmp_path) + "/").run(now=datetime(2026, 10, 3))
+    parsed = []
+    load_records = ingester.load_records
+    monkeypatch.setattr(ingester, "load_records", lambda path: parsed.append(path) or load_records(path))
+    assert ingester.ingest(pg, str(tmp_path) + "/") == 0
+    assert parsed == []
+
+    manifest = pg.get_ingest_manifest()
+    archive = str(tmp_path / "ec2_archive_2026-10-01.1.ndjson")
+    assert list(manifest) == [archive]  # raw entries pruned, the archive lists them as sources
+    assert sorted(manifest[archive][3]) == [str(tmp_path / "ec2_scan_2026-10-01T00-00-00.json"),
+                                            str(tmp_path / "ec2_scan_2026-10-01T06-00-00.json")]
+    assert stored(pg) == 4
+
+def test_archive_with_unseen_sources_is_ingested(pg, tmp_path):
+    write_scan(tmp_path, "2026-10-01T00:00:00", ["i-1"])
+    ingester.ingest(pg, str(tmp_path) + "/")
+    write_scan(tmp_path, "2026-10-01T06:00:00", ["i-1", "i-2"])  # compacted before it was ingested
+
+    ScanCompactor(str(tmp_path) + "/").run(now=datetime(2026, 10, 3))
+    assert ingester.ingest(pg, str(tmp_path) + "/") == 3
+    assert stored(pg) == 3
+    assert list(pg.get_ingest_manifest()) == [str(tmp_path / "ec2_archive_2026-10-01.1.ndjson")]
+
+def test_downsampled_generation_is_recorded_without_parsing(pg, tmp_path, monkeypatch):
+    write_scan(tmp_path, "2026-08-01T00:00:00", ["i-1"])
+    write_scan(tmp_path, "2026-08-01T06:00:00", ["i-1"])
+    ScanCompactor(str(tmp_path) + "/").run(now=datetime(2026, 8, 3))
+    assert ingester.ingest(pg, str(tmp_path) + "/") == 2
+
+    ScanCompactor(str(tmp_path) + "/").run(now=datetime(2026, 10, 3))  # past raw retention: generation 2
+    monkeypatch.setattr(ingester, "load_records", lambda path: pytest.fail(f"{path} was parsed"))
+    assert ingester.ingest(pg, str(tmp_path) + "/") == 0
+    assert list(pg.get_ingest_manifest()) == [str(tmp_path / "ec2_archive_2026-08-01.2.ndjson")]
+    assert stored(pg) == 2
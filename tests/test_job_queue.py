@@ -0,0 +1,84 @@
+# tests/test_job_queue.py
+
+import pytest
+from src.core import job_queue
+from src.core.db_schema import migrate
+from src.core.job_queue import JobQueue, LeaseLostError
+
+STAGES = ("scan", "enrich", "alert")
+
+@pytest.fixture
+def queue(pg_pool, monkeypatch):
+    migrate(pg_pool)
+    monkeypatch.setattr(job_queue, "JOB_RETRY_BASE", 0.0)  # retries are due right away
+    return JobQueue(STAGES, pg_pool, lease_seconds=60, max_attempts=2)
+
+def expire_leases(queue):
+    with queue.pool.cursor() as cur:
+        cur.execute("UPDATE scan_jobs SET lease_expires_at = NOW() - INTERVAL '1 second' WHERE status = 'running';")
+
+def test_completed_stage_queues_the_next_one(queue):
+    assert queue.enqueue_run("run-1", ["us-east-1"], {"timestamp": "2026-10-01T06:00:00"}) == 1
+    job = queue.claim("worker-a")
+    assert (job.unit, job.stage, job.attempts, job.payload) == ("us-east-1", "scan", 1, {"timestamp": "2026-10-01T06:00:00"})
+    assert queue.claim("worker-b") is None  # leased, nobody else gets it
+
+    queue.complete(job, {"batches": [1, 2]})
+    enrich = queue.claim("worker-b")
+    assert enrich.stage == "enrich" and enrich.payload == job.payload
+    assert queue.stage_input(enrich) == {"batches": [1, 2]}
+    queue.complete(enrich, {"batches": []})
+    assert queue.status("run-1") == {"scan": {"done": 1}, "enrich": {"done": 1}, "alert": {"queued": 1}}
+
+def test_worker_that_lost_its_lease_is_fenced_out(queue):
+    queue.enqueue_run("run-1", ["us-east-1"])
+    stale = queue.claim("worker-a")
+    expire_leases(queue)
+    current = queue.claim("worker-b")
+    assert current.id == stale.id and current.attempts == 2
+
+    assert not queue.heartbeat(stale)
+    with pytest.raises(LeaseLostError):
+        queue.complete(stale, {"batches": []})
+    with pytest.raises(LeaseLostError):
+        queue.fail(stale, "boom")
+    queue.release(stale)  # a no-op for the stale worker
+    assert queue.heartbeat(current)
+    queue.complete(current, {"batches": []})
+    assert queue.status("run-1")["scan"] == {"done": 1}
+
+def test_failures_are_retried_until_attempts_run_out(queue):
+    queue.enqueue_run("run-1", ["us-east-1"])
+    assert queue.fail(queue.claim("worker-a"), "throttled") == "queued"
+    job = queue.claim("worker-a")
+    assert job.attempts == 2
+    assert queue.fail(job, "throttled again") == "failed"
+    assert queue.claim("worker-a") is None
+
+    assert queue.retry_failed("run-1") == 1
+    assert queue.claim("worker-a").attempts == 1
+
+def test_expired_last_attempt_is_reaped(queue):
+    queue.enqueue_run("run-1", ["us-east-1"])
+    queue.claim("worker-a")
+    expire_leases(queue)
+    queue.claim("worker-b")
+    expire_leases(queue)
+    assert queue.claim("worker-c") is None and queue.reap() == 1
+    assert queue.status("run-1")["scan"] == {"failed": 1}
+
+def test_release_hands_the_job_back_without_an_attempt(queue):
+    queue.enqueue_run("run-1", ["us-east-1"])
+    job = queue.claim("worker-a")
+    queue.release(job)
+    again = queue.claim("worker-b")
+    assert again.id == job.id and again.attempts == 1
+
+def test_open_jobs_counts_queued_and_running_jobs(queue):
+    assert queue.open_jobs() == 0
+    queue.enqueue_run("run-1", ["us-east-1", "eu-west-1"])
+    job = queue.claim("worker-a")
+    assert queue.open_jobs() == 2
+    queue.fail(queue.claim("worker-a"), "boom")  # a pending retry is still open
+    queue.complete(job, {"batches": []})
+    assert queue.open_jobs() == 2  # the next stage of us-east-1, the retry of eu-west-1
@@ -0,0 +1,102 @@
+# tests/test_metrics_collector.py
+
+import os
+from datetime import datetime, timezone
+import boto3
+from botocore.stub import ANY, Stubber
+from src.aws.cloudwatch.datapoint_cache import DatapointCache
+from src.aws.cloudwatch import metrics_collector
+from src.aws.cloudwatch.metrics_collector import CloudWatchMetrics
+
+PERIOD = 300
+
+def collector(tmp_path):
+    session = boto3.Session(aws_access_key_id="AKIAEXAMPLEEXAMPLE", aws_secret_access_key="secret",
+                            region_name="us-east-1")
+    metrics = CloudWatchMetrics(session, "us-east-1", DatapointCache(str(tmp_path / "cache")))
+    return metrics, Stubber(metrics.cloudwatch)
+
+def utc(epoch):
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+def result(query_id, points):
+    return {"Id": query_id, "Label": "CPUUtilization", "StatusCode": "Complete",
+            "Timestamps": [utc(ts) for ts, _ in points], "Values": [value for _, value in points]}
+
+def test_streaming_fetches_only_new_datapoints_and_skips_the_cache(tmp_path):
+    metrics, stubber = collector(tmp_path)
+    start, end = metrics._window(1, PERIOD)
+    last = end - 3 * PERIOD
+    stubber.add_response("get_metric_data", {"MetricDataResults": [
+        result("m0", [(end - 20 * PERIOD, 1.0)]),  # the new instance starts a day back
+        result("m1", [(last, 9.0), (last + PERIOD, 40.0), (last + 2 * PERIOD, 50.0)]),
+    ]}, {"MetricDataQueries": ANY, "StartTime": utc(start), "EndTime": utc(end)})
+
+    received = {}
+    with stubber:
+        delivered = metrics.fetch_new_datapoints({"i-new": None, "i-old": last},
+                                                 lambda i, m, points: received.setdefault(i, points),
+                                                 period=PERIOD)
+    stubber.assert_no_pending_responses()
+    assert received == {"i-new": [(end - 20 * PERIOD, 1.0)],
+                        "i-old": [(last + PERIOD, 40.0), (last + 2 * PERIOD, 50.0)]}
+    assert delivered == 3
+    assert not os.path.exists(tmp_path / "cache")
+
+def test_fleet_metrics_fetch_from_the_last_cached_datapoint(tmp_path):
+    metrics, stubber = collector(tmp_path)
+    start, end = metrics._window(7, 3600)
+    metrics.cache.merge("us-east-1", "i-1", "CPUUtilization", 3600, [(end - 7200, 10.0)], end)
+    stubber.add_response("get_metric_data", {"MetricDataResults": [result("m0", [(end - 3600, 20.0)])]},
+                         {"MetricDataQueries": ANY, "StartTime": utc(end - 7200), "EndTime": utc(end)})
+    with stubber:
+        fleet = metrics.get_fleet_metrics(["i-1"], ("CPUUtilization",))
+    assert fleet == {"i-1": {"CPUUtilization": 15.0}}
+
+def test_failed_batch_reports_missing_data(tmp_path):
+    metrics, stubber = collector(tmp_path)
+    stubber.add_client_error("get_metric_data", "InternalFailure", http_status_code=400)
+    with stubber:
+        fleet = metrics.get_fleet_metrics(["i-1"], ("CPUUtilization",))
+    assert fleet == {"i-1": {"CPUUtilization": None}}
+
+def test_metric_series_reads_the_cache_file_once(tmp_path, monkeypatch):
+    metrics, stubber = collector(tmp_path)
+    start, end = metrics._window(7, 3600)
+    metrics.cache.merge("us-east-1", "i-1", "CPUUtilization", 3600, [(end - 7200, 10.0)], end)
+    stubber.add_response("get_metric_statistics", {"Datapoints": [{"Timestamp": utc(end - 3600), "Average": 20.0}]})
+
+    loads = []
+    load = metrics.cache.load
+    monkeypatch.setattr(metrics.cache, "load", lambda *args: loads.append(args) or load(*args))
+    with stubber:
+        series = metrics.get_metric_series("i-1", "CPUUtilization")
+    assert series == [(end - 7200, 10.0), (end - 3600, 20.0)]
+    assert len(loads) == 1
+
+def test_queries_are_split_into_requests_by_start_and_follow_next_token(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics_collector, "MAX_QUERIES_PER_REQUEST", 2)
+    metrics, stubber = collector(tmp_path)
+    start, end = metrics._window(1, PERIOD)
+    recent = end - 4 * PERIOD
+    queries = [(recent, "i-recent", "CPUUtilization"), (start, "i-a", "CPUUtilization"),
+               (start, "i-b", "CPUUtilization")]
+
+    def ids(*metric_ids):
+        return [{"Id": metric_id, "MetricStat": ANY, "ReturnData": True} for metric_id in metric_ids]
+
+    # The two queries starting a day back share a request; the recent one gets its own window
+    stubber.add_response("get_metric_data", {"MetricDataResults": [result("m0", [(start, 1.0)])], "NextToken": "t"},
+                         {"MetricDataQueries": ids("m0", "m1"), "StartTime": utc(start), "EndTime": utc(end)})
+    stubber.add_response("get_metric_data", {"MetricDataResults": [result("m1", [(start, 2.0)])]},
+                         {"MetricDataQueries": ids("m0", "m1"), "StartTime": utc(start), "EndTime": utc(end),
+                          "NextToken": "t"})
+    stubber.add_response("get_metric_data", {"MetricDataResults": [
+        result("m0", [(recent - PERIOD, 8.0), (recent, 9.0)])  # older than the query start: dropped
+    ]}, {"MetricDataQueries": ids("m0"), "StartTime": utc(recent), "EndTime": utc(end)})
+
+    with stubber:
+        batches = list(metrics._fetch_metric_data(queries, PERIOD, end))
+    stubber.assert_no_pending_responses()
+    assert batches == [{("i-a", "CPUUtilization"): [(start, 1.0)], ("i-b", "CPUUtilization"): [(start, 2.0)]},
+                       {("i-recent", "CPUUtilization"): [(recent, 9.0)]}]
@@ -0,0 +1,97 @@
+# tests/test_pipeline.py
+
+import threading
+import pytest
+from src.core import pipeline
+from src.core.pipeline import Pipeline, PipelineStopped, Stage
+
+@pytest.fixture(autouse=True)
+def fast_stop(monkeypatch):
+    monkeypatch.setattr(pipeline, "STOP_POLL_INTERVAL", 0.05)
+
+def run_in_thread(target, timeout=10):
+    """Run `target` and return its exception; fails the test if it hangs"""
+    outcome = {}
+
+    def call():
+        try:
+            target()
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=call, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "pipeline deadlocked"
+    return outcome.get("error")
+
+def test_items_flow_through_every_stage():
+    seen = []
+    stages = [
+        Stage("expand", lambda n: iter(range(n)), expand=True),
+        Stage("double", lambda x: x * 2, workers=3, queue_size=2),
+        Stage("collect", seen.append),
+    ]
+    stats = Pipeline(stages, report_interval=0).run([3, 4])
+    assert sorted(seen) == [0, 0, 2, 2, 4, 4, 6]
+    assert stats["double"].items_in == 7
+
+def test_failing_item_is_dropped_and_counted():
+    seen = []
+
+    def fail_on_odd(x):
+        if x % 2:
+            raise ValueError("odd")
+        return x
+
+    stats = Pipeline([Stage("filter", fail_on_odd), Stage("collect", seen.append)], report_interval=0).run(range(6))
+    assert sorted(seen) == [0, 2, 4]
+    assert stats["filter"].errors == 3
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_dead_consumer_releases_blocked_producers():
+    closed = threading.Event()
+
+    def produce(_):
+        try:
+            for i in range(100):
+                yield i
+        finally:
+            closed.set()
+
+    def consume(_):
+        raise KeyboardInterrupt  # not an Exception: kills the worker instead of dropping the item
+
+    stages = [Stage("produce", produce, expand=True, queue_size=1), Stage("consume", consume, queue_size=1)]
+    error = run_in_thread(lambda: Pipeline(stages, report_interval=0).run([None]))
+    assert isinstance(error, PipelineStopped)
+    assert closed.is_set()
+
+def test_failing_source_stops_the_pipeline():
+    def source():
+        yield 1
+        raise KeyboardInterrupt
+
+    stages = [Stage("slow", lambda x: x, queue_size=1)]
+    error = run_in_thread(lambda: Pipeline(stages, report_interval=0).run(source()))
+    assert isinstance(error, KeyboardInterrupt)
+
+def test_stop_abandons_the_run():
+    started = threading.Event()
+    release = threading.Event()
+
+    def block(x):
+        started.set()
+        release.wait(5)
+        return x
+
+    runner = Pipeline([Stage("block", block, queue_size=1), Stage("sink", lambda x: None)], report_interval=0)
+
+    def stop_when_blocked():
+        started.wait(5)
+        runner.stop()
+        release.set()
+
+    threading.Thread(target=stop_when_blocked, daemon=True).start()
+    error = run_in_thread(lambda: runner.run(range(50)))
+    assert isinstance(error, PipelineStopped)
@@ -0,0 +1,55 @@
+# tests/test_policy_evaluator.py
+
+import random
+from src.ai.ml.anomaly_detector import InstancePolicyEvaluator
+from src.ai.ml.history_index import InstanceHistoryIndex
+from src.core.serialization import save_records
+
+NOW = 1791158400.0  # 2026-10-05T00:00:00Z
+
+def write_fleet_history(directory, instance_ids, rng):
+    # Hourly scans over the last 4 days; each instance shows up in a random subset of them
+    for hour in range(96):
+        timestamp = f"2026-10-0{1 + hour // 24}T{hour % 24:02d}:00:00"
+        records = []
+        for instance_id in instance_ids:
+            if rng.random() < 0.5:
+                continue
+            cpu = None if rng.random() < 0.1 else round(rng.uniform(0, 20) + (70 if rng.random() < 0.05 else 0), 2)
+            records.append({"InstanceId": instance_id, "timestamp": timestamp, "CPUUtilization": cpu})
+        save_records(records, str(directory / f"ec2_scan_{timestamp.replace(':', '-')}.json"), timestamp)
+
+def without_timestamp(result):
+    return {key: value for key, value in result.items() if key != "EvaluationTimestamp"}
+
+def test_vectorized_fleet_evaluation_matches_the_per_instance_path(tmp_path):
+    rng = random.Random(7)
+    instance_ids = [f"i-{n:03d}" for n in range(60)]
+    write_fleet_history(tmp_path, instance_ids, rng)
+    # A short history (below min_days_to_flag) and a spike inside the lookback window
+    save_records([{"InstanceId": "i-short", "timestamp": "2026-10-04T12:00:00", "CPUUtilization": 1.0},
+                  {"InstanceId": "i-spike", "timestamp": "2026-10-04T12:00:00", "CPUUtilization": 2.0}],
+                 str(tmp_path / "ec2_scan_2026-10-04T12-00-00-extra.json"), "2026-10-04T12:00:00")
+    save_records([{"InstanceId": "i-spike", "timestamp": f"2026-10-04T{hour}:00:00", "CPUUtilization": cpu}
+                  for hour, cpu in (("13", 3.0), ("20", 95.0))],
+                 str(tmp_path / "ec2_scan_2026-10-04T20-00-00-extra.json"), "2026-10-04T20:00:00")
+
+    evaluator = InstancePolicyEvaluator(InstanceHistoryIndex(str(tmp_path) + "/", str(tmp_path / "index.pkl")))
+    evaluator.refresh_history()
+    fleet = [{"InstanceId": instance_id, "Region": "us-east-1", "InstanceType": "m5.large", "State": "running"}
+             for instance_id in instance_ids + ["i-short", "i-spike", "i-unknown"]]
+    fleet += [{"InstanceId": "i-000", "State": "stopped"}, {"InstanceId": "i-001"}]  # ignored state, duplicate id
+
+    vectorized = evaluator.evaluate_fleet(fleet, now=NOW)
+    scalar = [result for result in (evaluator.evaluate_underutilization(inst, now=NOW) for inst in fleet) if result]
+
+    assert [without_timestamp(r) for r in vectorized] == [without_timestamp(r) for r in scalar]
+    assert {r["InstanceId"] for r in vectorized if r["SpikeDetected"]} >= {"i-spike"}
+    assert any(r["Underutilized"] for r in vectorized) and not all(r["Underutilized"] for r in vectorized)
+    assert "i-short" not in {r["InstanceId"] for r in vectorized}
+
+def test_empty_and_ignored_fleets_evaluate_to_nothing(tmp_path):
+    evaluator = InstancePolicyEvaluator(InstanceHistoryIndex(str(tmp_path) + "/", str(tmp_path / "index.pkl")))
+    assert evaluator.evaluate_fleet([], now=NOW) == []
+    assert evaluator.evaluate_fleet([{"InstanceId": "i-1", "State": "terminated"}], now=NOW) == []
+    assert evaluator.evaluate_fleet([{"InstanceId": "i-1"}], now=NOW) == []
@@ -0,0 +1,63 @@
+# tests/test_price_index.py
+
+import os
+import time
+from decimal import Decimal
+import pytest
+from src.aws.cost import price_index
+
+HEADER = (
+    '"FormatVersion","v1.0"\n'
+    '"Publication Date","2026-10-01T00:00:00Z"\n'
+    '"SKU","TermType","Unit","Currency","PricePerUnit","Product Family","Pre Installed S/W","License Model",'
+    '"Region Code","Instance Type","Operating System","Tenancy","Capacity Status"\n'
+)
+
+def write_offer(path, instance_type, price):
+    with open(path, "w") as f:
+        f.write(HEADER)
+        f.write(f'"SKU1","OnDemand","Hrs","USD","{price}","Compute Instance","NA","No License required",'
+                f'"us-east-1","{instance_type}","Linux","Shared","Used"\n')
+
+@pytest.fixture
+def shared_index(tmp_path, monkeypatch):
+    offer_dir = tmp_path / "pricing"
+    offer_dir.mkdir()
+    monkeypatch.setattr(price_index, "OFFER_DIR", str(offer_dir))
+    monkeypatch.setattr(price_index, "INDEX_PATH", str(tmp_path / "index.sqlite"))
+    monkeypatch.setattr(price_index, "CHECK_INTERVAL", 0)
+    monkeypatch.setattr(price_index, "_shared_index", None)
+    monkeypatch.setattr(price_index, "_shared_signature", None)
+    return offer_dir
+
+def test_offer_files_dropped_later_are_picked_up(shared_index):
+    write_offer(shared_index / "us-east-1.csv", "t3.micro", "0.0104")
+    index = price_index.get_price_index()
+    assert index.get_on_demand_rate("us-east-1", "t3.micro") == Decimal("0.0104")
+    assert index.get_on_demand_rate("us-east-1", "m5.large") is None
+
+    write_offer(shared_index / "us-east-1-m5.csv", "m5.large", "0.096")
+    assert price_index.get_price_index() is index
+    assert index.get_on_demand_rate("us-east-1", "m5.large") == Decimal("0.096")
+
+def test_replaced_and_removed_offer_files(shared_index):
+    path = shared_index / "us-east-1.csv"
+    write_offer(path, "t3.micro", "0.0104")
+    index = price_index.get_price_index()
+    assert index.get_on_demand_rate("us-east-1", "t3.micro") == Decimal("0.0104")
+
+    write_offer(path, "t3.micro", "0.0110")
+    os.utime(path, (time.time() + 10, time.time() + 10))
+    price_index.get_price_index()
+    assert index.get_on_demand_rate("us-east-1", "t3.micro") == Decimal("0.0110")
+
+    os.remove(path)
+    price_index.get_price_index()
+    assert index.get_on_demand_rate("us-east-1", "t3.micro") is None
+
+def test_directory_is_not_rechecked_within_the_interval(shared_index, monkeypatch):
+    monkeypatch.setattr(price_index, "CHECK_INTERVAL", 3600)
+    index = price_index.get_price_index()
+    write_offer(shared_index / "us-east-1.csv", "t3.micro", "0.0104")
+    assert price_index.get_price_index() is index
+    assert index.get_on_demand_rate("us-east-1", "t3.micro") is None
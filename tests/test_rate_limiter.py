@@ -0,0 +1,97 @@
+# tests/test_rate_limiter.py
+
+import pickle
+import pytest
+from src.core import rate_limiter
+from src.core.rate_limiter import AWSCallGuard, CircuitBreaker, CircuitOpenError, RateLimitTimeout, TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda low, high: high)
+    return clock
+
+def test_bucket_spends_its_burst_then_paces_callers(clock):
+    bucket = TokenBucket(rate=2.0, burst=2)
+    assert bucket.acquire() == 0 and bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire(max_wait=0.1) == pytest.approx(-0.5)  # refused, no token taken
+    clock.now += 0.5
+    assert bucket.acquire() == 0
+
+def test_throttling_halves_the_rate_and_success_restores_it(clock):
+    bucket = TokenBucket(rate=10.0, burst=10)
+    pause = bucket.throttled()
+    assert bucket.rate == 5.0 and pause == pytest.approx(1.0)  # BACKOFF_BASE * 2 ** 1
+    assert bucket.throttled() == pytest.approx(2.0) and bucket.rate == 2.5
+    for _ in range(3):
+        bucket.throttled()
+    assert bucket.rate == pytest.approx(0.5)  # floored at MIN_RATE_FRACTION of the quota
+    assert bucket.acquire() >= 16  # waits out the pause before sending again
+
+    bucket.succeeded()
+    assert bucket.throttle_streak == 0 and bucket.rate == pytest.approx(1.0)
+    for _ in range(100):
+        bucket.succeeded()
+    assert bucket.rate == 10.0
+
+def test_breaker_opens_half_opens_and_closes(clock):
+    breaker = CircuitBreaker("ec2", "us-east-1", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert (error.value.service, error.value.region) == ("ec2", "us-east-1")
+
+    clock.now += 60
+    breaker.before_call()  # the trial call
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # everyone else waits for the trial
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+    breaker.before_call()
+
+def test_failed_trial_reopens_the_circuit(clock):
+    breaker = CircuitBreaker("ec2", "us-east-1", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    clock.now += 60
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_guard_keeps_separate_breakers_per_service(clock):
+    guard = AWSCallGuard(quotas={})
+    assert guard.breaker("ec2", "us-east-1") is guard.breaker("ec2", "us-east-1")
+    cloudwatch = guard.breaker("cloudwatch", "us-east-1")
+    cloudwatch.failure_threshold = 1
+    cloudwatch.record_failure()
+    guard.breaker("ec2", "us-east-1").before_call()  # EC2 in the same region is unaffected
+    assert guard.status()["circuits"] == {"ec2/us-east-1": "closed", "cloudwatch/us-east-1": "open"}
+
+def test_guard_rejects_calls_that_would_wait_too_long(clock):
+    guard = AWSCallGuard(quotas={"ce": (1.0, 1)}, scale=1.0, max_wait=0.5)
+    guard.acquire("ce", "us-east-1", "GetCostAndUsage")
+    with pytest.raises(RateLimitTimeout):
+        guard.acquire("ce", "us-east-1", "GetCostAndUsage")
+
+def test_rejections_survive_pickling():
+    error = pickle.loads(pickle.dumps(CircuitOpenError("ec2", "eu-west-1", 30)))
+    assert (error.service, error.region, error.retry_after) == ("ec2", "eu-west-1", 30)
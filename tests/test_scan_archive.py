@@ -0,0 +1,82 @@
+# tests/test_scan_archive.py
+
+import os
+import threading
+from datetime import datetime
+from src.core.scan_archive import ScanCompactor, downsample, read_indexes, read_lock, visible_files
+from src.core.scan_loader import ScanLoader
+from src.core.serialization import save_records
+
+def write_scan(directory, timestamp, cpu=10.0):
+    name = f"ec2_scan_{timestamp.replace(':', '-')}.json"
+    save_records([{"InstanceId": "i-1", "timestamp": timestamp, "CPUUtilization": cpu}],
+                 os.path.join(directory, name), timestamp)
+    return name
+
+def test_commit_swaps_the_index_in_and_keeps_files_until_collected(tmp_path):
+    directory = str(tmp_path) + "/"
+    sources = [write_scan(directory, "2026-10-01T00:00:00"), write_scan(directory, "2026-10-01T06:00:00")]
+    compactor = ScanCompactor(directory)
+    records = [{"InstanceId": "i-1", "timestamp": "2026-10-01T00:00:00", "CPUUtilization": 10.0}]
+    index = compactor._commit("2026-10-01", records, sources, None, False)
+
+    assert index["generation"] == 1 and index["sources"] == sources
+    assert visible_files(directory) == ["ec2_archive_2026-10-01.1.ndjson"]
+    assert all(os.path.exists(os.path.join(directory, name)) for name in sources)  # a reader may still hold them
+
+    second = compactor._commit("2026-10-01", records, [], index, True)
+    assert second["generation"] == 2 and second["sources"] == sources
+    assert visible_files(directory) == ["ec2_archive_2026-10-01.2.ndjson"]
+    assert compactor.collect_garbage(read_indexes(directory)) == 3  # both sources and generation 1
+    assert sorted(n for n in os.listdir(directory) if not n.startswith(".")) == [
+        "ec2_archive_2026-10-01.2.ndjson", "ec2_archive_2026-10-01.index.json"]
+
+def test_compactor_waits_for_readers_before_deleting(tmp_path):
+    directory = str(tmp_path) + "/"
+    sources = [write_scan(directory, "2026-10-01T00:00:00"), write_scan(directory, "2026-10-01T06:00:00")]
+    loader = ScanLoader(directory, workers=1)
+    records = loader.iter_records()
+    first = next(records)  # the reader has listed the raw files and is part way through
+
+    compaction = threading.Thread(target=ScanCompactor(directory).run, kwargs={"now": datetime(2026, 10, 3)})
+    compaction.start()
+    compaction.join(timeout=0.5)
+    assert compaction.is_alive()  # committed, blocked on the reader before deleting
+    assert visible_files(directory) == ["ec2_archive_2026-10-01.1.ndjson"]
+    assert [first] + list(records) == [
+        {"InstanceId": "i-1", "timestamp": "2026-10-01T00:00:00", "CPUUtilization": 10.0},
+        {"InstanceId": "i-1", "timestamp": "2026-10-01T06:00:00", "CPUUtilization": 10.0}]
+
+    compaction.join(timeout=5)
+    assert not compaction.is_alive()
+    assert not any(os.path.exists(os.path.join(directory, name)) for name in sources)
+    with read_lock(directory):
+        assert len(list(ScanLoader(directory, workers=1).iter_records())) == 2
+
+def test_run_collects_files_left_by_an_interrupted_run(tmp_path):
+    directory = str(tmp_path) + "/"
+    source = write_scan(directory, "2026-10-01T00:00:00")
+    ScanCompactor(directory)._commit("2026-10-01", [], [source], None, False)  # crashed before cleanup
+
+    stats = ScanCompactor(directory).run(now=datetime(2026, 10, 3))
+    assert stats["compacted_days"] == 0 and stats["removed_files"] == 1
+    assert not os.path.exists(os.path.join(directory, source))
+
+def test_expired_archives_are_removed(tmp_path):
+    directory = str(tmp_path) + "/"
+    write_scan(directory, "2025-01-01T00:00:00")
+    ScanCompactor(directory, max_retention_days=365).run(now=datetime(2025, 1, 2))
+    stats = ScanCompactor(directory, max_retention_days=365).run(now=datetime(2026, 10, 3))
+    assert stats["expired_days"] == 1
+    assert read_indexes(directory) == {} and visible_files(directory) == []
+
+def test_downsample_averages_and_skips_records_without_timestamp():
+    records = [
+        {"InstanceId": "i-1", "timestamp": "2026-10-01T00:00:00", "CPUUtilization": 10.0},
+        {"InstanceId": "i-1", "timestamp": "2026-10-01T12:00:00", "CPUUtilization": 20.0},
+        {"InstanceId": "i-1", "CPUUtilization": 90.0},
+        {"InstanceId": "i-1", "timestamp": "not a time", "CPUUtilization": 90.0},
+    ]
+    [bucket] = downsample(records, hours=24)
+    assert bucket["CPUUtilization"] == 15.0 and bucket["SampleCount"] == 2
+    assert bucket["timestamp"] == "2026-10-01T12:00:00"
@@ -0,0 +1,51 @@
+# tests/test_scan_loader.py
+
+from datetime import datetime
+from src.core import scan_loader
+from src.core.scan_loader import ScanLoader, save_ndjson
+from src.core.serialization import save_records
+
+def write_archive(directory):
+    """Two raw JSON scans and one NDJSON file big enough to split into several byte ranges"""
+    expected = []
+    for hour in (0, 6):
+        timestamp = f"2026-10-01T{hour:02d}:00:00"
+        records = [{"InstanceId": f"i-{n}", "CPUUtilization": float(n + hour)} for n in range(3)]
+        save_records(records, str(directory / f"ec2_scan_{timestamp.replace(':', '-')}.json"), timestamp)
+        expected += [{**record, "timestamp": timestamp} for record in records]
+    ndjson = [{"InstanceId": f"i-{n % 3}", "timestamp": f"2026-10-02T{n // 60:02d}:{n % 60:02d}:00",
+               "CPUUtilization": float(n)} for n in range(200)]
+    save_ndjson(ndjson, str(directory / "ec2_scan_2026-10-02T00-00-00.ndjson"))
+    return expected + ndjson
+
+def test_process_pool_yields_the_sequential_records_in_order(tmp_path):
+    expected = write_archive(tmp_path)
+    sequential = list(ScanLoader(str(tmp_path), workers=1).iter_records())
+    loader = ScanLoader(str(tmp_path), workers=2, chunk_bytes=1024)
+    assert len([task for task in loader.tasks() if task[0].endswith(".ndjson")]) > 3
+
+    assert sequential == expected
+    assert list(loader.iter_records()) == expected
+    unordered = list(ScanLoader(str(tmp_path), workers=2, ordered=False, chunk_bytes=1024).iter_records())
+    assert sorted(map(repr, unordered)) == sorted(map(repr, expected))
+
+def test_filters_are_applied_inside_the_workers(tmp_path):
+    expected = write_archive(tmp_path)
+    since, until = datetime(2026, 10, 1, 3), datetime(2026, 10, 2, 1)
+    loader = ScanLoader(str(tmp_path), workers=2, chunk_bytes=1024, since=since, until=until, instance_ids=["i-1"])
+    assert list(loader.iter_records()) == [
+        record for record in expected
+        if record["InstanceId"] == "i-1" and since <= datetime.fromisoformat(record["timestamp"]) < until]
+
+def test_workers_are_spawned_not_forked(tmp_path, monkeypatch):
+    write_archive(tmp_path)
+    contexts = []
+    executor = scan_loader.ProcessPoolExecutor
+
+    def recording_executor(*args, mp_context=None, **kwargs):
+        contexts.append(mp_context)
+        return executor(*args, mp_context=mp_context, **kwargs)
+
+    monkeypatch.setattr(scan_loader, "ProcessPoolExecutor", recording_executor)
+    list(ScanLoader(str(tmp_path), workers=2).iter_records())
+    assert [context.get_start_method() for context in contexts] == ["spawn"]
@@ -0,0 +1,103 @@
+# tests/test_scan_run.py
+
+import threading
+from datetime import datetime
+import pytest
+
+pytest.importorskip("slack_sdk")
+import src.main as main
+from src.main import ScanRun
+
+class FakeEstimator:
+    def enrich_cpu(self, instances, session=None):
+        pass
+
+    def price_instances(self, instances):
+        return instances
+
+class FakeDetector:
+    def flag_underutilized_instances(self, instances):
+        return []
+
+class FakeCredentials:
+    def default_account_id(self):
+        return "111122223333"
+
+class FakeDB:
+    def __init__(self):
+        self.saved, self.refreshed = [], []
+
+    def bulk_save_ec2_instances(self, instances, refresh=True):
+        self.saved.append((len(instances), refresh))
+        return len(instances)
+
+    def refresh_rollups(self, since):
+        self.refreshed.append(since)
+
+def test_rollups_are_refreshed_once_after_persist_drains(monkeypatch):
+    monkeypatch.setattr(main, "save_scan", lambda instances, filename: None)
+    db = FakeDB()
+    run = ScanRun(estimator=FakeEstimator(), detector=FakeDetector(), db=db, credentials=FakeCredentials())
+    pages = {
+        "us-east-1": [[{"InstanceId": "i-1", "timestamp": "2026-10-01T06:00:00"}],
+                      [{"InstanceId": "i-2", "timestamp": "2026-10-01T05:00:00"}]],
+        "eu-west-1": [[{"InstanceId": "i-3"}]],  # stamped with the run's timestamp
+    }
+    monkeypatch.setattr(run, "_scan_pages", lambda unit: iter(pages[unit]))
+
+    instances, _ = run.run(["us-east-1", "eu-west-1"])
+    assert len(instances) == 3
+    assert sorted(db.saved) == [(1, False)] * 3
+    assert db.refreshed == [datetime(2026, 10, 1, 5)]
+    assert run.oldest_persisted is None
+
+def test_nothing_persisted_means_no_refresh():
+    db = FakeDB()
+    run = ScanRun(estimator=FakeEstimator(), detector=FakeDetector(), db=db, credentials=FakeCredentials())
+    run.refresh_rollups()
+    assert db.refreshed == []
+
+def test_detect_holds_the_shared_history_lock(monkeypatch):
+    monkeypatch.setattr(main, "save_scan", lambda instances, filename: None)
+    history_lock = threading.Lock()
+    held = []
+
+    class LockCheckingDetector(FakeDetector):
+        def flag_underutilized_instances(self, instances):
+            held.append(history_lock.locked())
+            return []
+
+    run = ScanRun(estimator=FakeEstimator(), detector=LockCheckingDetector(), credentials=FakeCredentials(),
+                  history_lock=history_lock)
+    monkeypatch.setattr(run, "_scan_pages", lambda unit: iter([[{"InstanceId": "i-1"}], [{"InstanceId": "i-2"}]]))
+    run.run(["us-east-1"])
+    assert held == [True, True] and not history_lock.locked()
+
+def test_resumed_run_only_redoes_failed_units(monkeypatch, tmp_path):
+    from src.core.checkpoint import RunCheckpoint
+    monkeypatch.setattr(main, "save_scan", lambda instances, filename: None)
+    pages = {"us-east-1": [[{"InstanceId": "i-1"}]], "eu-west-1": [[{"InstanceId": "i-2"}]]}
+
+    class FlakyDB(FakeDB):
+        fail = True
+
+        def bulk_save_ec2_instances(self, instances, refresh=True):
+            if self.fail and instances[0]["InstanceId"] == "i-2":
+                raise RuntimeError("connection reset")
+            return super().bulk_save_ec2_instances(instances, refresh)
+
+    db = FlakyDB()
+    first = ScanRun(estimator=FakeEstimator(), detector=FakeDetector(), db=db, credentials=FakeCredentials(),
+                    checkpoint=RunCheckpoint("20261001T060000", main.STAGES, str(tmp_path)))
+    monkeypatch.setattr(first, "_scan_pages", lambda unit: iter(pages[unit]))
+    first.run(["us-east-1", "eu-west-1"])
+    assert first.checkpoint.get("status") == "running" and db.saved == [(1, False)]
+
+    db.fail = False
+    resumed = ScanRun(estimator=FakeEstimator(), detector=FakeDetector(), db=db, credentials=FakeCredentials(),
+                      checkpoint=RunCheckpoint("20261001T060000", main.STAGES, str(tmp_path)))
+    monkeypatch.setattr(resumed, "_scan_pages", lambda unit: pytest.fail(f"{unit} scanned again"))
+    resumed.run(["us-east-1", "eu-west-1"])
+    assert resumed.timestamp == first.timestamp
+    assert db.saved == [(1, False), (1, False)]  # only eu-west-1's page was persisted again
+    assert resumed.checkpoint.get("status") == "completed"
@@ -0,0 +1,52 @@
+# tests/test_scan_store.py
+
+import os
+from datetime import datetime
+from decimal import Decimal
+import pytest
+
+pytest.importorskip("pyarrow")
+from src.core.scan_store import ParquetScanStore
+
+def scan(region, *instance_ids):
+    return [{"InstanceId": instance_id, "Region": region, "timestamp": "2026-10-01T06:00:00",
+             "CPUUtilization": 4.0, "HourlyRate": "0.0104", "Tags": {"team": "ops"}, "Owner": "ci"}
+            for instance_id in instance_ids]
+
+def test_records_round_trip_batch_by_batch(tmp_path, monkeypatch):
+    store = ParquetScanStore(str(tmp_path))
+    store.write(scan("us-east-1", "i-1", "i-2") + scan("eu-west-1", "i-3"), datetime(2026, 10, 1, 6))
+
+    monkeypatch.setattr(store, "read", lambda **filters: pytest.fail("materialized the whole table"))
+    records = sorted(store.iter_records(regions=["us-east-1"]), key=lambda r: r["InstanceId"])
+    assert [r["InstanceId"] for r in records] == ["i-1", "i-2"]
+    assert records[0]["HourlyRate"] == Decimal("0.010400")
+    assert records[0]["Tags"] == {"team": "ops"} and records[0]["Owner"] == "ci"
+    assert records[0]["Region"] == "us-east-1"
+
+def test_nested_metrics_round_trip(tmp_path):
+    store = ParquetScanStore(str(tmp_path))
+    metrics = {"CPUUtilization": {"value": 3.5, "unit": "Percent"}, "NetworkIn": {"value": 120.0, "unit": "Bytes"}}
+    store.write([{"InstanceId": "i-1", "Region": "us-east-1", "timestamp": "2026-10-01T06:00:00",
+                  "Metrics": metrics}], datetime(2026, 10, 1, 6))
+
+    [record] = store.iter_records()
+    assert record["Metrics"] == metrics
+    assert record["CPUUtilization"] == 3.5 and record["NetworkIn"] == 120.0
+    assert store.read(columns=["cpu_utilization"]).column(0).to_pylist() == [3.5]
+
+def test_temporary_segments_are_invisible_to_readers(tmp_path):
+    store = ParquetScanStore(str(tmp_path))
+    [path] = store.write(scan("us-east-1", "i-1"), datetime(2026, 10, 1, 6))
+    directory = os.path.dirname(path)
+    assert os.listdir(directory) == [os.path.basename(path)]
+    with open(os.path.join(directory, ".scan_partial.parquet.123.tmp"), "wb") as f:
+        f.write(b"PAR1 half written")  # a segment another writer has not renamed yet
+
+    assert [r["InstanceId"] for r in store.iter_records()] == ["i-1"]
+    assert store.read(columns=["instance_id"]).num_rows == 1
+
+def test_missing_root_reads_empty(tmp_path):
+    store = ParquetScanStore(str(tmp_path / "absent"))
+    assert list(store.iter_records()) == []
+    assert store.read().num_rows == 0
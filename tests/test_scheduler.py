@@ -0,0 +1,75 @@
+# tests/test_scheduler.py
+
+import threading
+from src.core.scheduler import Job, Scheduler, job_lock
+
+def blocking_job(name="scan", interval=60):
+    started, release = threading.Event(), threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(5)
+
+    return Job(name, fn, interval=interval), started, release
+
+def test_job_lock_excludes_a_second_holder_until_released(tmp_path):
+    with job_lock("scan", str(tmp_path)) as first:
+        assert first
+        with job_lock("scan", str(tmp_path)) as second:
+            assert not second  # another open file description, as in another process
+        with job_lock("cost", str(tmp_path)) as other:
+            assert other
+    with job_lock("scan", str(tmp_path)) as again:
+        assert again
+
+def test_job_lock_runs_unlocked_when_the_lock_dir_is_unusable(tmp_path):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    with job_lock("scan", str(blocker / "locks")) as acquired:
+        assert acquired
+
+def test_due_tick_is_skipped_while_the_previous_run_is_going(tmp_path):
+    job, started, release = blocking_job()
+    scheduler = Scheduler([job], lock_dir=str(tmp_path))
+    scheduler._launch(job, 0.0)
+    assert started.wait(5)
+    first_thread = job.thread
+
+    scheduler._launch(job, 60.0)
+    assert job.skipped == 1 and job.thread is first_thread
+    assert 60.0 + 54 <= job.next_run <= 60.0 + 66  # rescheduled one interval (+/- jitter) out
+
+    release.set()
+    first_thread.join(5)
+    assert job.runs == 1 and not job.running
+
+def test_run_is_skipped_when_another_process_holds_the_job_lock(tmp_path):
+    calls = []
+    job = Job("scan", lambda: calls.append(1), interval=60)
+    scheduler = Scheduler([job], lock_dir=str(tmp_path))
+    with job_lock("scan", str(tmp_path)):
+        scheduler._run_job(job)
+    assert calls == [] and job.skipped == 1
+    scheduler._run_job(job)
+    assert calls == [1] and job.runs == 1
+
+def test_failures_are_counted_and_do_not_stop_the_job(tmp_path):
+    job = Job("scan", lambda: 1 / 0, interval=60)
+    scheduler = Scheduler([job], lock_dir=str(tmp_path))
+    scheduler._run_job(job)
+    scheduler._run_job(job)
+    assert job.failures == 2 and job.runs == 0 and job.last_duration is not None
+
+def test_stop_waits_for_running_jobs_up_to_the_timeout(tmp_path):
+    job, started, release = blocking_job(interval=1)
+    scheduler = Scheduler([job], lock_dir=str(tmp_path), shutdown_timeout=0.1)
+    runner = threading.Thread(target=scheduler.run)
+    runner.start()
+    assert started.wait(5)  # run_on_start fires within the first jitter window
+
+    scheduler.stop()
+    runner.join(5)
+    assert not runner.is_alive() and job.running  # gave up waiting after the timeout
+    release.set()
+    job.thread.join(5)
+    assert scheduler.join() and scheduler.status()["scan"]["runs"] == 1
@@ -0,0 +1,60 @@
+# tests/test_serialization.py
+
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+import numpy as np
+import pytest
+from src.core import serialization
+
+DOCUMENT = {
+    "InstanceId": "i-0abc",
+    "timestamp": datetime(2026, 10, 1, 6, 30),
+    "HourlyRate": Decimal("0.0104"),
+    "CPUUtilization": float("nan"),
+    "Peak": float("inf"),
+    "Series": np.array([1.5, np.nan]),
+    "Mean": np.float64("nan"),
+    "Count": np.int64(3),
+    "Regions": ("us-east-1",),
+    "Run": UUID("12345678-1234-5678-1234-567812345678"),
+    "Tags": {"Name": "café", "empty": None},
+    "Nested": [{"score": -0.25, "ok": True}, []],
+}
+
+@pytest.fixture
+def stdlib(monkeypatch):
+    pytest.importorskip("orjson")
+    monkeypatch.setattr(serialization, "orjson", None)
+
+def encodings():
+    return serialization.dumps(DOCUMENT), serialization.dumps(DOCUMENT, pretty=True), serialization.dumps_bytes(DOCUMENT)
+
+def test_backends_write_identical_documents(request):
+    pytest.importorskip("orjson")
+    with_orjson = encodings()
+    request.getfixturevalue("stdlib")
+    assert encodings() == with_orjson
+
+def test_stdlib_writes_non_finite_floats_as_null(stdlib):
+    encoded = serialization.dumps(DOCUMENT)
+    assert "NaN" not in encoded and "Infinity" not in encoded
+    decoded = serialization.loads(encoded)
+    assert decoded["CPUUtilization"] is None and decoded["Peak"] is None and decoded["Mean"] is None
+    assert decoded["Series"] == [1.5, None]
+    assert decoded["HourlyRate"] == "0.0104" and decoded["timestamp"] == "2026-10-01T06:30:00"
+
+def test_loads_round_trips_on_both_backends(request):
+    with_orjson = serialization.loads(serialization.dumps_bytes(DOCUMENT))
+    request.getfixturevalue("stdlib")
+    assert serialization.loads(serialization.dumps_bytes(DOCUMENT)) == with_orjson
+    assert serialization.loads(serialization.dumps(DOCUMENT)) == with_orjson
+
+def test_envelope_matches_across_backends(request, tmp_path):
+    def envelope(name):
+        path = tmp_path / name
+        serialization.save_records([DOCUMENT, {"InstanceId": "i-2"}], str(path), "2026-10-01T06:30:00")
+        return path.read_bytes()
+    with_orjson = envelope("orjson.json")
+    request.getfixturevalue("stdlib")
+    assert envelope("stdlib.json") == with_orjson
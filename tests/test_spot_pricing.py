@@ -0,0 +1,88 @@
+# tests/test_spot_pricing.py
+
+from datetime import datetime
+from decimal import Decimal
+import pytest
+from botocore.exceptions import ClientError
+from src.aws.cost import spot_pricing
+from src.aws.cost.spot_pricing import SpotPriceService
+
+class FakeClock:
+    def __init__(self, now=1791158400.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+class FakePaginator:
+    def __init__(self, prices, failures):
+        self.prices = prices
+        self.failures = failures
+        self.requests = []
+
+    def paginate(self, InstanceTypes, ProductDescriptions, StartTime):
+        self.requests.append(list(InstanceTypes))
+        failure = self.failures.get(len(self.requests))
+        if failure:
+            raise failure
+        return [{"SpotPriceHistory": [
+            {"InstanceType": instance_type, "AvailabilityZone": zone, "SpotPrice": price,
+             "Timestamp": datetime(2026, 10, 5, hour)}
+            for instance_type in InstanceTypes
+            for zone, hour, price in self.prices.get(instance_type, [])
+        ]}]
+
+def service(monkeypatch, prices, failures=None, ttl=900):
+    paginator = FakePaginator(prices, failures or {})
+    client = type("FakeEC2", (), {"get_paginator": lambda self, name: paginator})()
+    monkeypatch.setattr(spot_pricing, "get_client", lambda service, region, session: client)
+    clock = FakeClock()
+    monkeypatch.setattr(spot_pricing, "time", clock)
+    return SpotPriceService(session=object(), ttl=ttl), paginator, clock
+
+def error(code):
+    return ClientError({"Error": {"Code": code, "Message": code}}, "DescribeSpotPriceHistory")
+
+def test_prices_are_the_latest_per_zone_averaged_across_zones(monkeypatch):
+    prices = {"m5.large": [("us-east-1a", 1, "0.0400"), ("us-east-1a", 3, "0.0300"), ("us-east-1b", 2, "0.0500")]}
+    spot, _, _ = service(monkeypatch, prices)
+    assert spot.get_price_stats("us-east-1", "m5.large") == {
+        "min": Decimal("0.0300"), "avg": Decimal("0.040000"), "zones": Decimal(2)}
+    assert spot.get_spot_hourly_rate("us-east-1", "t9.none") == 0
+
+def test_prefetch_memoizes_until_the_ttl_expires(monkeypatch):
+    spot, paginator, clock = service(monkeypatch, {"m5.large": [("us-east-1a", 1, "0.04")]}, ttl=60)
+    spot.prefetch("us-east-1", ["m5.large", "c5.large"])
+    spot.prefetch("us-east-1", ["c5.large", "m5.large"])
+    assert spot.get_spot_hourly_rate("us-east-1", "m5.large") == Decimal("0.040000")
+    assert spot.get_spot_hourly_rate("us-east-1", "c5.large") == 0  # the miss is remembered too
+    assert paginator.requests == [["c5.large", "m5.large"]]
+
+    clock.now += 61
+    spot.prefetch("us-east-1", ["m5.large"])
+    assert paginator.requests[-1] == ["m5.large"] and len(paginator.requests) == 2
+
+def test_failed_chunk_keeps_the_chunks_already_fetched(monkeypatch):
+    monkeypatch.setattr(spot_pricing, "TYPES_PER_REQUEST", 1)
+    prices = {"a.large": [("us-east-1a", 1, "0.01")], "b.large": [("us-east-1a", 1, "0.02")],
+              "c.large": [("us-east-1a", 1, "0.03")]}
+    spot, paginator, _ = service(monkeypatch, prices, failures={2: error("UnauthorizedOperation")})
+    spot.prefetch("us-east-1", prices)
+
+    assert paginator.requests == [["a.large"], ["b.large"], ["c.large"]]
+    assert spot.get_spot_hourly_rate("us-east-1", "a.large") == Decimal("0.010000")
+    assert spot.get_spot_hourly_rate("us-east-1", "b.large") == 0
+    assert spot.get_spot_hourly_rate("us-east-1", "c.large") == Decimal("0.030000")
+    assert len(paginator.requests) == 3  # the failed type falls back to on-demand without a retry
+
+def test_throttled_chunk_raises_but_keeps_earlier_chunks(monkeypatch):
+    monkeypatch.setattr(spot_pricing, "TYPES_PER_REQUEST", 1)
+    prices = {"a.large": [("us-east-1a", 1, "0.01")], "b.large": [("us-east-1a", 1, "0.02")]}
+    spot, paginator, _ = service(monkeypatch, prices, failures={2: error("RequestLimitExceeded")})
+    with pytest.raises(ClientError):
+        spot.prefetch("us-east-1", prices)
+
+    paginator.failures.clear()
+    spot.prefetch("us-east-1", prices)
+    assert paginator.requests == [["a.large"], ["b.large"], ["b.large"]]
+    assert spot.get_spot_hourly_rate("us-east-1", "b.large") == Decimal("0.020000")
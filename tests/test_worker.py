@@ -0,0 +1,85 @@
+# tests/test_worker.py
+
+import threading
+import pytest
+
+pytest.importorskip("slack_sdk")
+from src.core.db_schema import migrate
+from src.worker import JobInterrupted, ScanWorker
+
+class FakeDB:
+    def __init__(self, pool):
+        self.pool = pool
+
+class FakeResources:
+    def __init__(self, pool):
+        self.db = FakeDB(pool)
+
+    def accounts(self):
+        return []
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def worker(pg_pool):
+    migrate(pg_pool)
+    return ScanWorker(FakeResources(pg_pool), concurrency=1, poll_interval=0.05, worker_id="test", drain=True)
+
+def test_draining_worker_waits_for_running_jobs(worker, monkeypatch):
+    worker.queue.enqueue_run("run-1", ["us-east-1"])
+    elsewhere = worker.queue.claim("other-worker")  # in flight on another node
+    done = []
+    monkeypatch.setattr(worker, "execute", lambda job: done.append(job.stage) or {"batches": []})
+
+    loop = threading.Thread(target=worker._loop, args=(0,))
+    loop.start()
+    loop.join(0.3)
+    assert loop.is_alive()  # nothing claimable, but the scan job will queue its next stage
+
+    worker.queue.complete(elsewhere, {"batches": []})
+    loop.join(10)
+    assert not loop.is_alive()
+    assert done == ["enrich", "price", "detect", "persist", "alert"]
+    assert worker.queue.open_jobs() == 0
+
+def test_shutdown_hands_interrupted_jobs_back(worker, monkeypatch):
+    worker.queue.enqueue_run("run-1", ["us-east-1"])
+    job = worker.queue.claim(worker.worker_id)
+
+    def execute(job):
+        worker.stop()  # SIGTERM arrives mid-job
+        raise JobInterrupted(f"{job} interrupted by shutdown")
+
+    monkeypatch.setattr(worker, "execute", execute)
+    worker.process(job)
+    again = worker.queue.claim("other-worker")
+    assert again.id == job.id and again.attempts == 1
+
+def test_job_claimed_during_shutdown_is_released_unstarted(worker, monkeypatch):
+    worker.queue.enqueue_run("run-1", ["us-east-1"])
+    job = worker.queue.claim(worker.worker_id)
+    monkeypatch.setattr(worker, "execute", lambda job: pytest.fail("started after shutdown"))
+    worker.stop()
+    worker.process(job)
+    assert worker.queue.claim("other-worker").attempts == 1
+
+def test_interrupt_between_batches(worker, monkeypatch):
+    worker.queue.enqueue_run("run-1", ["us-east-1"])
+    worker.queue.complete(worker.queue.claim("w"), {"batches": [
+        {"unit": "us-east-1", "region": "us-east-1", "page": page, "stage": "scan",
+         "instances": [], "anomalies": []} for page in range(2)]})
+    job = worker.queue.claim(worker.worker_id)
+    enriched = []
+
+    class Run:
+        timestamp = "2026-10-01T06:00:00"
+
+        def enrich(self, batch):
+            enriched.append(batch["page"])
+            worker.stop()
+
+    monkeypatch.setattr(worker, "_scan_run", lambda job: Run())
+    with pytest.raises(JobInterrupted):
+        worker.execute(job)
+    assert enriched == [0]